@@ -2,14 +2,24 @@
 import json
 import logging
 import os
-import sqlite3
 import sys
+import threading
+import time
 import uuid
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from dotenv import load_dotenv
-from langsmith import traceable
-from openai import OpenAI
+
+import db_pool
+import metrics
+from b_check_availibility import speculate_availability
+from history import history_messages
+from llm_cache import make_key as make_cache_key, response_cache
+from log_writer import log_writer, utc_timestamp
+from prompts import system_message
+from pydantic_schemas import CLEAR_ENTITIES, Entities, ReservationState
+from rule_extractor import stats as fast_path_stats, try_fast_path
+from tracing import traceable
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -17,211 +27,400 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 load_dotenv()
 groq_api_key = os.getenv("GROQ_API_KEY")
 
-client = OpenAI(
-    api_key=groq_api_key,
-    base_url="https://api.groq.com/openai/v1"
-)
-
-DB_PATH = "app/database/restaurant.db"
+# Any OpenAI-compatible endpoint works, e.g. a local stub server for tests.
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "meta-llama/llama-4-maverick-17b-128e-instruct")
+
+# Answer simple turns (an email, a party size, "yes") with rules instead of the LLM.
+RULE_FAST_PATH = os.getenv("RULE_FAST_PATH", "1") != "0"
+
+_clients: Dict[bool, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(use_async: bool = False):
+    """
+    The OpenAI-compatible client (AsyncOpenAI with use_async=True), created
+    on first use so that importing this module does not load openai.
+    """
+    llm_client = _clients.get(use_async)
+    if llm_client is None:
+        with _clients_lock:
+            llm_client = _clients.get(use_async)
+            if llm_client is None:
+                from openai import AsyncOpenAI, OpenAI
+                llm_client = (AsyncOpenAI if use_async else OpenAI)(api_key=groq_api_key, base_url=LLM_BASE_URL)
+                _clients[use_async] = llm_client
+    return llm_client
+
+
+def __getattr__(name: str):
+    # The old module-level `client` / `async_client` names, now created on access.
+    if name == "client":
+        return get_client()
+    if name == "async_client":
+        return get_client(use_async=True)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 logger = logging.getLogger("intent_node")
 logger.setLevel(logging.INFO)
 
+# log_writer counts dropped rows; a full queue is reported at most this often.
+DROPPED_LOG_WARNING_INTERVAL = 60.0
+_dropped_log_warned_at = float("-inf")
+_dropped_log_lock = threading.Lock()
+
+
 def log_to_db(user_input, llm_response=None, missing_fields=None, fallback_triggered=False):
-    conn = None
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+    """Queues the turn for the background log writer; the insert happens off the request path."""
+    global _dropped_log_warned_at
+    log_id = str(uuid.uuid4())
+    row = (log_id, user_input, llm_response or "N/A", missing_fields or "", bool(fallback_triggered), utc_timestamp())
+    if not log_writer.submit(row):
+        with _dropped_log_lock:
+            now = time.monotonic()
+            if now - _dropped_log_warned_at < DROPPED_LOG_WARNING_INTERVAL:
+                return
+            _dropped_log_warned_at = now
+        logger.warning("[intent_node] Log queue full, %d interaction logs dropped so far", log_writer.dropped)
 
-        log_id = str(uuid.uuid4())
-        llm_response = llm_response or "N/A"
-        missing_fields = missing_fields or ""
-        fallback_triggered = bool(fallback_triggered)
 
-        cursor.execute(
-            """
-            INSERT INTO interaction_logs (log_id, user_input, llm_response, missing_fields, fallback_triggered)
-            VALUES (?, ?, ?, ?, ?)
-            """,
-            (log_id, user_input, llm_response, missing_fields, fallback_triggered)
-        )
+@traceable(name="Extract Intent Node")
+def extract_intent(state: Dict[str, Any]) -> Dict[str, Any]:
+    user_input = state.user_input
+    chat_history = state.chat_history
 
-        conn.commit()
-        print(f"[intent_node] Log inserted: {log_id}")
+    try:
+        fast = _fast_path(state)
+        if fast is not None:
+            return _handle_rule_reply(user_input, fast)
+
+        _speculate(state)
+        request = _completion_request(user_input, chat_history, state.entities, state.intent, state.max_turns)
+        writer = _token_writer()
+        cache_key, content = _cache_lookup(request, state)
+        if content is not None:
+            _replay_cached(content, writer)
+        else:
+            started, usage = time.perf_counter(), None
+            if writer is None:
+                response = get_client().chat.completions.create(**request)
+                content, usage = response.choices[0].message.content, response.usage
+            else:
+                content = _stream_completion(get_client().chat.completions.create(**{**request, "stream": True}), writer)
+            _record_llm(time.perf_counter() - started, usage)
+            _cache_store(cache_key, content)
+        return _start_new_booking(state, _handle_llm_reply(user_input, content))
 
     except Exception as e:
-        print(f"[intent_node] DB Logging Error: {e}")
-
-    finally:
-        if conn:
-            conn.close()
+        return _handle_llm_error(user_input, e)
 
 
-@traceable(name="Extract Intent Node")
-def extract_intent(state: Dict[str, Any]) -> Dict[str, Any]:
+@traceable(name="Extract Intent Node (async)")
+async def aextract_intent(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Same as extract_intent, but awaits the LLM and keeps cache I/O off the event loop."""
     user_input = state.user_input
     chat_history = state.chat_history
 
     try:
-        system_prompt = """
-You are a highly intelligent and helpful restaurant reservation assistant.
-
-Your job is to interact with users in a professional, friendly tone and help them make, modify, confirm, or cancel table reservations by collecting all required details step-by-step.
-
-## Behavior Instructions:
-
-1. **Talk Like a Human Assistant:**
-   - Always Welcome User when strart responding
-   - Respond in warm, polite, conversational language.
-   - Guide the user naturally and clearly.
-
-2. **Detect the User’s Intent:**
-   - Such as: make_reservation, cancel_reservation, modify_reservation, check_availability
-
-3. **Extract These Entities:**
-   - `user_name`
-   - `email_id`
-   - `num_persons`
-   - `res_date` — convert "tomorrow", "next Friday" into proper date format: YYYY-MM-DD
-   - `res_time` — convert "evening", "8PM", "after Maghrib" into 24-hour format: HH:00:00 ! if user say 19:10 then make it 19:00 or 20:00 let user know that we have fixed time slots.
-   - `reservation_type` — e.g., party, meeting, dinner supper etc
-
-4. **If Any Entity Is Missing:**
-   - Ask one question at a time to collect it.
-   - Do not ask for multiple fields in a single message.
-   - Continue the conversation until ALL REQUIRED ENTITY is collected.
-   - If user give all entities in one message then you dont need to repeat question unless you need clarification.
-   - Always  ask for reservation_type whether user joining for dinner, brthday party meeting etc.
-   
-
-5. **Let Users Update Info Freely:**
-   - If they change something (e.g., “Make it 3 guests instead”), update your entity values.
-   - Confirm the final details with the user.
-
-6. **Handle Off-topic Gracefully:**
-   - If the user says something irrelevant like “tell me a joke,” politely guide them back to the reservation process.
-
-7. **Respond in Natural Language AND Include Structured Output:**
-
-8. ** Handling Intent:**
-   - if user making reservation for first time then intent = make_reservation
-   - if user is cancelling already reserved reservation then intent = cancel_reservation
-   - if user is modifying already reserved reservation then intent = modify_reservation
-
-9. ** Intent responses **
-   - for cancel_reservation ask for reservation_id and email_id in entity after success greet user and close chat
-   - for modify_reservation ask for reservation_id only,  and ask which entity to change. after success greet user and close chat
-   - for make_reservation extract all entities.
-
-10. ** Calling Agent Nodes **:
-   - if intent is make_reservation then NEVER proceed to check_availability_node until ALL fields are provided.
-   - if intent is modify_reservation then NEVER proceed to modify_reservation_node until ALL required fields are provided. (KEEP RESERVATION_ID as STRING i.e 24 > "24")
-   - if intent is cancel_reservation then NEVER proceed to cancel_reservation_node until ALL required fields are provided. (KEEP RESERVATION_ID as STRING i.e 24 > "24")
-
-✅ STRICTLY YOUR RESPONSE SHOULD CONTAIN 2 PARTS:
-1. `assistant_response` – What you would say to the user (human-style, friendly)
-2. `intent` and `entities` – Structured data for backend use
-3. DON'T OUTPUT ANYTHING ELSE
-## 🔄 Final Output Format (must be valid JSON):
-{
-  "assistant_response": "Got it! For how many people should I reserve the table?",
-  "intent": "make_reservation", (cancel_reservation, modify_reservation)
-  "entities": {
-    "user_name": null, !ask for it
-    "email_id": null, !ask for it
-    "num_persons": 2, !ask for it
-    "res_date": "2025-07-25", !ask for it
-    "res_time": null, !ask for it
-    "reservation_type": null !ask for it
-  }
-}
-
-SAMPLE for any INTENT (MAKE_RESERVATION, CANCEL_RESERVATION or MODIFY_RESERVATION):
-
-Got it! I see you'd like to cancel reservation ID "2".  
-
-{
-  "assistant_response": "Got it! I see you'd like to cancel reservation ID \"2\".",
-  "intent": "cancel_reservation",
-  "entities": {
-    "user_name": null,
-    "email_id": "hira.k@example.com",
-    "num_persons": null,
-    "res_date": null,
-    "res_time": null,
-    "reservation_type": null, < always ask for reservation type whether dinner, party meeting etc
-    "reservation_id": "2" < make it string.
-  }
-}
-"""
-        messages = [{"role": "system", "content": system_prompt}]
-
-        for msg in chat_history:
-            if "user" in msg:
-                messages.append({"role": "user", "content": msg["user"]})
-            elif "assistant" in msg:
-                messages.append({"role": "assistant", "content": msg["assistant"]})
-
-        messages.append({"role": "user", "content": user_input})
-
-        response = client.chat.completions.create(
-            #model="gemma2-9b-it",
-            model="meta-llama/llama-4-maverick-17b-128e-instruct",
-            messages=messages,
-            temperature=0.3,
-            max_tokens=300,
-            stream=False
-        )
-
-        llm_json = response.choices[0].message.content.strip()
-        try:
-            parsed = json.loads(llm_json)
-        except json.JSONDecodeError:
-            try:
-                start = llm_json.find('{')
-                end = llm_json.rfind('}') + 1
-                if start != -1 and end != -1:
-                    parsed = json.loads(llm_json[start:end])
-                else:
-                    return {
-                        "user_input": user_input,
-                        "intent": "make_reservation",
-                        "assistant_response": llm_json.strip(),
-                        "chat_history": chat_history + [
-                            {"user": user_input},
-                            {"assistant": llm_json.strip()}
-                        ]
-                    }
-            except Exception:
-                parsed = {"assistant_response": llm_json.strip()}
-
-        assistant_response = parsed.get("assistant_response") or llm_json.strip()
-        log_to_db(user_input=user_input, llm_response=llm_json)
-
-        return {
-            "user_input": user_input,
-            "intent": parsed.get("intent", "unknown"),
-            "entities": parsed.get("entities", {}), 
-            "assistant_response": assistant_response,
-            "chat_history": chat_history + [
-                {"user": user_input},
-                {"assistant": assistant_response}
-            ]
-        }
+        fast = _fast_path(state)
+        if fast is not None:
+            return _handle_rule_reply(user_input, fast)
+
+        _speculate(state)
+        request = _completion_request(user_input, chat_history, state.entities, state.intent, state.max_turns)
+        writer = _token_writer()
+        if response_cache is not None and response_cache.persistent:
+            cache_key, content = await db_pool.run_in_db_executor(_cache_lookup, request, state)
+        else:
+            cache_key, content = _cache_lookup(request, state)
+        if content is not None:
+            _replay_cached(content, writer)
+        else:
+            started, usage = time.perf_counter(), None
+            if writer is None:
+                response = await get_client(use_async=True).chat.completions.create(**request)
+                content, usage = response.choices[0].message.content, response.usage
+            else:
+                chunks = await get_client(use_async=True).chat.completions.create(**{**request, "stream": True})
+                content = await _astream_completion(chunks, writer)
+            _record_llm(time.perf_counter() - started, usage)
+            if response_cache is not None and response_cache.persistent:
+                await db_pool.run_in_db_executor(_cache_store, cache_key, content)
+            else:
+                _cache_store(cache_key, content)
+        return _start_new_booking(state, _handle_llm_reply(user_input, content))
 
     except Exception as e:
-        error_msg = f"[intent_node] Error: {str(e)}"
-        logger.error(error_msg)
-        log_to_db(user_input, llm_response=str(e), fallback_triggered=True)
+        return _handle_llm_error(user_input, e)
+
+
+def _fast_path(state: ReservationState) -> Optional[Dict[str, Any]]:
+    """Runs the rule-based extractor first; None means the turn needs the LLM."""
+    if not RULE_FAST_PATH:
+        return None
+    started = time.perf_counter()
+    result = try_fast_path(state)
+    fast_path_stats.record(result is not None, time.perf_counter() - started)
+    return result
+
+
+def _speculate(state: ReservationState) -> None:
+    """
+    While the LLM is working, looks up availability for the date and time
+    already known, so a turn that only adds a name or says "yes" does not
+    wait on the database afterwards (see b_check_availibility).
+    """
+    if state.intent == "make_reservation":
+        try:
+            speculate_availability(state.entities)
+        except Exception as e:
+            print(f"[intent_node] Speculative availability check not started: {e}")
+
+
+def _start_new_booking(state: ReservationState, update: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A make_reservation after the thread's booking was confirmed or cancelled
+    is a new booking: the old reservation_id and status are cleared, so the
+    graph books again instead of re-confirming the old reservation.
+    """
+    if update.get("intent") != "make_reservation" or state.entities.status not in ("confirmed", "cancelled"):
+        return update
+    entities = {key: value for key, value in (update.get("entities") or {}).items()
+                if key not in ("reservation_id", "status")}
+    entities[CLEAR_ENTITIES] = ["reservation_id", "status"]
+    return {**update, "entities": entities}
+
+
+def _record_llm(seconds: float, usage=None) -> None:
+    fast_path_stats.record_llm(seconds)
+    metrics.inc("intent_replies_total", source="llm")
+    metrics.inc("llm_requests_total")
+    metrics.observe("llm_request_duration_seconds", seconds)
+    if usage is not None:
+        metrics.inc("llm_tokens_total", usage.prompt_tokens or 0, kind="prompt")
+        metrics.inc("llm_tokens_total", usage.completion_tokens or 0, kind="completion")
+
+
+def _cache_lookup(request: Dict[str, Any], state: ReservationState):
+    """Returns (cache_key, cached reply or None); the key is None when caching is off."""
+    if response_cache is None:
+        return None, None
+    key = make_cache_key(request["model"], request["messages"], state.entities.model_dump())
+    return key, response_cache.get(key)
+
+
+def _cache_store(cache_key: Optional[str], content: str) -> None:
+    # Only structured replies are worth replaying; free text is usually a glitch.
+    if cache_key is not None and '"assistant_response"' in (content or ""):
+        response_cache.put(cache_key, content)
+
+
+def _replay_cached(content: str, writer) -> None:
+    metrics.inc("intent_replies_total", source="cache")
+    if writer is not None:
+        writer({"assistant_token": AssistantResponseStream().feed(content) or content})
+
+
+def _token_writer():
+    """
+    Returns the graph's custom stream writer when the caller asked for token
+    streaming with config={"configurable": {"stream_tokens": True}} and
+    stream_mode "custom"; None otherwise (including outside a graph run).
+    """
+    from langgraph.config import get_config, get_stream_writer
+
+    try:
+        if get_config().get("configurable", {}).get("stream_tokens"):
+            return get_stream_writer()
+    except RuntimeError:
+        pass
+    return None
+
+
+class AssistantResponseStream:
+    """
+    Incrementally decodes the "assistant_response" string out of a JSON reply
+    that arrives in pieces. feed() returns the newly decoded text, so tokens can
+    be shown while the rest of the JSON (intent, entities) is still streaming.
+    """
+
+    KEY = '"assistant_response"'
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.stage = "key"
+
+    def feed(self, delta: str) -> str:
+        self.buffer += delta
+        out = []
+        buf = self.buffer
+        while self.pos < len(buf) and self.stage != "done":
+            if self.stage == "key":
+                found = buf.find(self.KEY, self.pos)
+                if found == -1:
+                    self.pos = max(self.pos, len(buf) - len(self.KEY) + 1)
+                    break
+                self.pos = found + len(self.KEY)
+                self.stage = "colon"
+            elif self.stage == "colon":
+                char = buf[self.pos]
+                if char in " \t\r\n:":
+                    self.pos += 1
+                elif char == '"':
+                    self.pos += 1
+                    self.stage = "value"
+                else:
+                    self.stage = "key"
+            else:
+                char = buf[self.pos]
+                if char == '"':
+                    self.pos += 1
+                    self.stage = "done"
+                elif char == "\\":
+                    escape = self._escape_at(buf, self.pos)
+                    if escape is None:
+                        break
+                    out.append(json.loads(f'"{escape}"'))
+                    self.pos += len(escape)
+                else:
+                    end = self.pos
+                    while end < len(buf) and buf[end] not in '"\\':
+                        end += 1
+                    out.append(buf[self.pos:end])
+                    self.pos = end
+        return "".join(out)
+
+    @staticmethod
+    def _escape_at(buf: str, pos: int):
+        """The complete escape sequence at pos, or None if more input is needed."""
+        if pos + 1 >= len(buf):
+            return None
+        if buf[pos + 1] != "u":
+            return buf[pos:pos + 2]
+        if pos + 6 > len(buf):
+            return None
+        if 0xD800 <= int(buf[pos + 2:pos + 6], 16) <= 0xDBFF:
+            # High surrogate: decode together with the low half that follows.
+            if pos + 12 > len(buf):
+                return None
+            return buf[pos:pos + 12]
+        return buf[pos:pos + 6]
+
+
+def _stream_completion(chunks, writer) -> str:
+    parts, decoder = [], AssistantResponseStream()
+    for chunk in chunks:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            parts.append(delta)
+            text = decoder.feed(delta)
+            if text:
+                writer({"assistant_token": text})
+    return "".join(parts)
+
+
+async def _astream_completion(chunks, writer) -> str:
+    parts, decoder = [], AssistantResponseStream()
+    async for chunk in chunks:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            parts.append(delta)
+            text = decoder.feed(delta)
+            if text:
+                writer({"assistant_token": text})
+    return "".join(parts)
+
+
+def _completion_request(user_input: str, chat_history: list, entities: Optional[Entities] = None,
+                        intent: Optional[str] = None, max_turns: int = 10) -> Dict[str, Any]:
+    messages = [system_message()]
+    messages.extend(history_messages(chat_history, entities, intent, max_turns))
+    messages.append({"role": "user", "content": user_input})
+
+    return dict(
+        #model="gemma2-9b-it",
+        model=LLM_MODEL,
+        messages=messages,
+        temperature=0.3,
+        max_tokens=300,
+        stream=False
+    )
+
+
+def _handle_llm_reply(user_input: str, content: str) -> Dict[str, Any]:
+    llm_json = content.strip()
+    try:
+        parsed = json.loads(llm_json)
+    except json.JSONDecodeError:
+        try:
+            start = llm_json.find('{')
+            end = llm_json.rfind('}') + 1
+            if start != -1 and end != -1:
+                parsed = json.loads(llm_json[start:end])
+            else:
+                return {
+                    "user_input": user_input,
+                    "intent": "make_reservation",
+                    "assistant_response": llm_json.strip(),
+                    "chat_history": [
+                        {"user": user_input},
+                        {"assistant": llm_json.strip()}
+                    ]
+                }
+        except Exception:
+            parsed = {"assistant_response": llm_json.strip()}
+
+    assistant_response = parsed.get("assistant_response") or llm_json.strip()
+    log_to_db(user_input=user_input, llm_response=llm_json)
 
     return {
         "user_input": user_input,
         "intent": parsed.get("intent", "unknown"),
-        "entities": parsed.get("entities", {}),
+        "entities": parsed.get("entities", {}), 
+        "assistant_response": assistant_response,
+        "chat_history": [
+            {"user": user_input},
+            {"assistant": assistant_response}
+        ]
+    }
+
+
+def _handle_rule_reply(user_input: str, fast: Dict[str, Any]) -> Dict[str, Any]:
+    assistant_response = fast["assistant_response"]
+    metrics.inc("intent_replies_total", source="rule")
+    writer = _token_writer()
+    if writer is not None:
+        writer({"assistant_token": assistant_response})
+    log_to_db(user_input=user_input, llm_response=f"[rule_based] {json.dumps(fast)}")
+
+    return {
+        "user_input": user_input,
+        "intent": fast["intent"],
+        "entities": fast["entities"],
         "assistant_response": assistant_response,
-        "chat_history": chat_history + [
+        "chat_history": [
             {"user": user_input},
             {"assistant": assistant_response}
         ]
     }
 
+
+def _handle_llm_error(user_input: str, e: Exception) -> Dict[str, Any]:
+    error_msg = f"[intent_node] Error: {str(e)}"
+    metrics.inc("intent_replies_total", source="error")
+    logger.error(error_msg)
+    log_to_db(user_input, llm_response=str(e), fallback_triggered=True)
+
+    assistant_response = "Sorry, I couldn't process that just now. Could you please say it again?"
+    return {
+        "user_input": user_input,
+        "intent": "unknown",
+        "entities": {},
+        "assistant_response": assistant_response,
+        "chat_history": [
+            {"user": user_input},
+            {"assistant": assistant_response}
+        ]
+    }
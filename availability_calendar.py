@@ -0,0 +1,75 @@
+# availability_calendar.py
+import datetime as dt
+import os
+from typing import Dict, List, Optional, Tuple
+
+import db_pool
+from availability_index import get_index
+from table_inventory import SERVICE_SLOTS, SlotAllocation, slot_key
+
+# Longest range one calendar query may cover, and how far around the requested
+# date slot_search looks for alternatives.
+CALENDAR_MAX_DAYS = int(os.getenv("CALENDAR_MAX_DAYS", "31"))
+CALENDAR_SEARCH_DAYS = int(os.getenv("CALENDAR_SEARCH_DAYS", "7"))
+
+SUMMARY_RANGE_SQL = """
+    SELECT res_date, res_time, bookings, covers, held_covers
+        FROM slot_summaries
+        WHERE res_date BETWEEN ? AND ?
+"""
+
+
+def date_range(start_date: str, end_date: str, max_days: int = CALENDAR_MAX_DAYS) -> List[str]:
+    start = dt.date.fromisoformat(start_date)
+    end = dt.date.fromisoformat(end_date)
+    if end < start:
+        start, end = end, start
+    days = min((end - start).days + 1, max_days)
+    return [(start + dt.timedelta(days=offset)).isoformat() for offset in range(days)]
+
+
+def free_slots(start_date: str, end_date: str, num_persons: Optional[int] = 1,
+               slots: List[str] = SERVICE_SLOTS, now: Optional[dt.datetime] = None) -> Dict[str, List[str]]:
+    """
+    {date: [free slot times]} for every date in the range, for a party of
+    num_persons. The slot summaries (one range read) settle most slots: an
+    empty slot is free, and one whose confirmed covers leave no room is full.
+    Only the slots in between are checked against the table allocation, and
+    their dates are loaded together. Slots already past are left out.
+    """
+    dates = date_range(start_date, end_date)
+    now = now or dt.datetime.now()
+    persons = max(int(num_persons or 1), 1)
+    index = get_index()
+    capacity = sum(seats for _, seats in index.tables)
+    if index.cover_limit:
+        capacity = min(capacity, index.cover_limit)
+    fits_empty = SlotAllocation(index.tables, index.cover_limit).can_seat(persons)
+
+    with db_pool.connection() as conn:
+        rows = conn.execute(SUMMARY_RANGE_SQL, (dates[0], dates[-1])).fetchall()
+    summaries = {(res_date, res_time): (covers, held) for res_date, res_time, _, covers, held in rows}
+
+    candidates: List[Tuple[str, str, Optional[bool]]] = []
+    for res_date in dates:
+        for res_time in slots:
+            if dt.datetime.fromisoformat(f"{res_date}T{res_time}") < now:
+                continue
+            summary = summaries.get((res_date, slot_key(res_time)))
+            if summary is None:
+                candidates.append((res_date, res_time, fits_empty))
+                continue
+            covers, held = summary
+            if covers - held + persons > capacity:
+                continue  # full even if every pending hold lapses
+            candidates.append((res_date, res_time, None))
+
+    undecided = {res_date for res_date, _, free in candidates if free is None}
+    days = index.days(undecided) if undecided else {}
+    result: Dict[str, List[str]] = {res_date: [] for res_date in dates}
+    for res_date, res_time, free in candidates:
+        if free is None:
+            free = days[res_date].can_seat(res_time, persons)
+        if free:
+            result[res_date].append(res_time)
+    return result
@@ -0,0 +1,300 @@
+# availability_index.py
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+import db_pool
+import metrics
+from log_writer import utc_timestamp
+from tenancy import current_tenant
+from table_inventory import DayAllocation, SlotAllocation, SLOT_COVER_LIMIT, TABLES, slot_key
+
+# Every reservation that has not been cancelled holds its tables, unless it is
+# a pending hold whose hold_expires_at has passed.
+BOOKED_ROWS_SQL = """
+    SELECT reservation_id, res_time, num_persons, hold_expires_at
+        FROM reservations
+        WHERE res_date = ?
+        AND status != 'cancelled'
+        AND (hold_expires_at IS NULL OR hold_expires_at > ?)
+"""
+
+# The same rows for a range of dates, for loading several uncached dates at once.
+BOOKED_RANGE_SQL = """
+    SELECT res_date, reservation_id, res_time, num_persons, hold_expires_at
+        FROM reservations
+        WHERE res_date BETWEEN ? AND ?
+        AND status != 'cancelled'
+        AND (hold_expires_at IS NULL OR hold_expires_at > ?)
+"""
+
+Holds = Dict[str, Tuple[str, str]]
+
+# Number of dates kept in memory before the least recently used one is dropped.
+MAX_CACHED_DAYS = int(os.getenv("AVAILABILITY_CACHE_DAYS", "64"))
+
+
+class AvailabilityIndex:
+    """
+    In-memory table allocation per date, built from the reservations table with
+    one query per date and kept as an LRU cache of recently used dates.
+
+    Nodes that write reservations call record_booking / release_booking so the
+    cached dates stay current without re-reading the table. Writes replace the
+    affected slot with an updated copy, so readers never see a half-applied change.
+
+    Pending holds are tracked with their expiry per cached date and released
+    the first time the date is read after they lapse, so an abandoned hold
+    stops blocking tables even before the reaper deletes its row.
+    """
+
+    def __init__(self, tables: Iterable[Tuple[str, int]] = TABLES, cover_limit: int = SLOT_COVER_LIMIT,
+                 max_days: int = MAX_CACHED_DAYS):
+        self.tables = list(tables)
+        self.cover_limit = cover_limit
+        self.max_days = max_days
+        self._days: "OrderedDict[str, DayAllocation]" = OrderedDict()
+        # res_date -> {reservation_id: (res_time, hold_expires_at)} for pending holds in cached dates
+        self._holds: Dict[str, Holds] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired_holds = 0
+        self._write_seq = 0
+
+    def _fetch(self, res_date: str) -> Tuple[DayAllocation, Holds]:
+        with db_pool.connection() as conn:
+            rows = conn.execute(BOOKED_ROWS_SQL, (res_date, utc_timestamp())).fetchall()
+        return self._build(res_date, rows)
+
+    def _build(self, res_date: str, rows) -> Tuple[DayAllocation, Holds]:
+        """Allocation and pending holds from (reservation_id, res_time, num_persons, hold_expires_at) rows."""
+        day = DayAllocation.from_bookings(
+            res_date, [row[:3] for row in rows], tables=self.tables, cover_limit=self.cover_limit
+        )
+        return day, {str(row[0]): (row[1], row[3]) for row in rows if row[3]}
+
+    def _store(self, res_date: str, day: DayAllocation, holds: Holds) -> None:
+        with self._lock:
+            self._days[res_date] = day
+            self._days.move_to_end(res_date)
+            self._holds[res_date] = holds
+            while len(self._days) > self.max_days:
+                evicted, _ = self._days.popitem(last=False)
+                self._holds.pop(evicted, None)
+                self.evictions += 1
+
+    def _expire_holds(self, res_date: str, now: str) -> None:
+        """Releases the date's holds that lapsed before now. Called with the lock held."""
+        holds = self._holds.get(res_date)
+        expired = [rid for rid, (_, expires_at) in holds.items() if expires_at <= now]
+        if not expired:
+            return
+        day = self._days[res_date]
+        for rid in expired:
+            res_time, _ = holds.pop(rid)
+            key = slot_key(res_time)
+            current = day.slots.get(key)
+            if current is not None and rid in current.assignments:
+                allocation = current.copy()
+                allocation.release(rid)
+                day.slots[key] = allocation
+            self.expired_holds += 1
+
+    def load_day(self, res_date: str) -> DayAllocation:
+        """
+        (Re)builds the allocation for res_date from the database. If a write
+        lands while the rows are being read, the result is returned but not
+        cached, since it may already be out of date.
+        """
+        seq = self._write_seq
+        day, holds = self._fetch(res_date)
+        with self._lock:
+            if seq == self._write_seq:
+                self._store(res_date, day, holds)
+        return day
+
+    def day(self, res_date: str) -> DayAllocation:
+        with self._lock:
+            day = self._days.get(res_date)
+            if day is not None:
+                self._days.move_to_end(res_date)
+                self.hits += 1
+                if self._holds.get(res_date):
+                    self._expire_holds(res_date, utc_timestamp())
+                return day
+            self.misses += 1
+        return self.load_day(res_date)
+
+    def days(self, dates: Iterable[str]) -> Dict[str, DayAllocation]:
+        """Like day() for several dates; the ones not cached are read with a single range query."""
+        dates = sorted(set(dates))
+        result: Dict[str, DayAllocation] = {}
+        with self._lock:
+            missing = [res_date for res_date in dates if res_date not in self._days]
+        for res_date in dates:
+            if res_date not in missing:
+                result[res_date] = self.day(res_date)
+        if not missing:
+            return result
+
+        seq = self._write_seq
+        with db_pool.connection() as conn:
+            rows = conn.execute(BOOKED_RANGE_SQL, (missing[0], missing[-1], utc_timestamp())).fetchall()
+        by_date: Dict[str, list] = {res_date: [] for res_date in missing}
+        for row in rows:
+            if row[0] in by_date:
+                by_date[row[0]].append(row[1:])
+        with self._lock:
+            self.misses += len(missing)
+            for res_date, day_rows in by_date.items():
+                day, holds = self._build(res_date, day_rows)
+                if seq == self._write_seq:
+                    self._store(res_date, day, holds)
+                result[res_date] = day
+        return result
+
+    def is_available(self, res_date: str, res_time: str, num_persons: Optional[int] = None,
+                     exclude_reservation_id: Optional[str] = None) -> bool:
+        return self.day(res_date).can_seat(res_time, num_persons or 1, exclude_reservation_id)
+
+    def record_booking(self, reservation_id: str, res_date: str, res_time: str,
+                       num_persons: Optional[int], hold_expires_at: Optional[str] = None) -> None:
+        """
+        Applies a new or moved booking to the cached date, if that date is
+        cached. hold_expires_at marks it as a pending hold; recording it again
+        without one (on confirmation) makes it permanent.
+        """
+        with self._lock:
+            self._write_seq += 1
+            day = self._days.get(res_date)
+            if day is None:
+                return
+            holds = self._holds.setdefault(res_date, {})
+            holds.pop(str(reservation_id), None)
+            if hold_expires_at:
+                holds[str(reservation_id)] = (res_time, hold_expires_at)
+            key = slot_key(res_time)
+            current = day.slots.get(key)
+            allocation = current.copy() if current else SlotAllocation(day.tables, day.cover_limit)
+            allocation.release(str(reservation_id))
+            if allocation.allocate(str(reservation_id), num_persons) is None:
+                allocation.force(str(reservation_id), num_persons)
+            day.slots[key] = allocation
+
+    def release_booking(self, reservation_id: str, res_date: str, res_time: str) -> None:
+        """Frees a cancelled or moved booking's tables in the cached date."""
+        with self._lock:
+            self._write_seq += 1
+            day = self._days.get(res_date)
+            if day is None:
+                return
+            self._holds.get(res_date, {}).pop(str(reservation_id), None)
+            key = slot_key(res_time)
+            current = day.slots.get(key)
+            if current is None or str(reservation_id) not in current.assignments:
+                return
+            allocation = current.copy()
+            allocation.release(str(reservation_id))
+            day.slots[key] = allocation
+
+    def invalidate(self, res_date: Optional[str] = None) -> None:
+        """Drops one cached date, or all of them."""
+        with self._lock:
+            self._write_seq += 1
+            if res_date is None:
+                self._days.clear()
+                self._holds.clear()
+            else:
+                self._days.pop(res_date, None)
+                self._holds.pop(res_date, None)
+
+    def verify_day(self, res_date: str) -> bool:
+        """
+        Compares the cached date with a fresh read of the database. On a
+        mismatch the fresh allocation replaces the cached one and False is
+        returned; dates that are not cached are trivially consistent.
+        """
+        with self._lock:
+            cached = self._days.get(res_date)
+            if cached is not None and self._holds.get(res_date):
+                self._expire_holds(res_date, utc_timestamp())
+        if cached is None:
+            return True
+        fresh, holds = self._fetch(res_date)
+        consistent = _bookings(cached) == _bookings(fresh)
+        if not consistent:
+            self._store(res_date, fresh, holds)
+        return consistent
+
+    def verify_all(self) -> Dict[str, bool]:
+        with self._lock:
+            dates = list(self._days)
+        return {res_date: self.verify_day(res_date) for res_date in dates}
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "cached_days": len(self._days),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "holds": sum(len(holds) for holds in self._holds.values()),
+            "expired_holds": self.expired_holds,
+        }
+
+
+def _bookings(day: DayAllocation) -> Dict[str, Dict[str, int]]:
+    """{slot: {reservation_id: persons}}, ignoring which tables were picked."""
+    return {
+        key: {rid: persons for rid, (persons, _) in allocation.assignments.items()}
+        for key, allocation in day.slots.items()
+        if allocation.assignments
+    }
+
+
+_indexes: Dict[Optional[str], AvailabilityIndex] = {}
+_index_lock = threading.Lock()
+
+
+def get_index() -> AvailabilityIndex:
+    """The index of the current restaurant's shard; each restaurant caches its own dates."""
+    restaurant_id = current_tenant()
+    index = _indexes.get(restaurant_id)
+    if index is None:
+        with _index_lock:
+            index = _indexes.get(restaurant_id)
+            if index is None:
+                index = _indexes[restaurant_id] = AvailabilityIndex()
+    return index
+
+
+def _metrics() -> Dict[str, int]:
+    if not _indexes:
+        return {}
+    stats: Dict[str, int] = {}
+    for index in list(_indexes.values()):
+        for key, value in index.stats().items():
+            stats[key] = stats.get(key, 0) + value
+    return {
+        "availability_cache_hits_total": stats["hits"],
+        "availability_cache_misses_total": stats["misses"],
+        "availability_cache_evictions_total": stats["evictions"],
+        "availability_cached_days": stats["cached_days"],
+        "availability_holds": stats["holds"],
+        "availability_holds_expired_total": stats["expired_holds"],
+    }
+
+
+metrics.registry.add_collector(_metrics)
+
+
+def record_booking(reservation_id, res_date, res_time, num_persons, hold_expires_at=None) -> None:
+    if res_date and res_time:
+        get_index().record_booking(str(reservation_id), res_date, res_time, num_persons, hold_expires_at)
+
+
+def release_booking(reservation_id, res_date, res_time) -> None:
+    if res_date and res_time:
+        get_index().release_booking(str(reservation_id), res_date, res_time)
@@ -1,20 +1,23 @@
-import sqlite3
 import datetime as dt
-from typing import Dict, Any, Union
-from pydantic_schemas import ReservationState
-from langsmith import traceable
-
-DB_PATH = "app\\database\\restaurant.db"
+from typing import Dict, Any, Optional, Tuple, Union
+from pydantic_schemas import Entities, ReservationState
+from tracing import traceable
+import db_pool
+import metrics
+from availability_index import get_index
+from db_migrations import normalize_res_date, normalize_res_time
+from slot_search import search_slots
+from speculation import SPECULATION_ENABLED, speculative_results
+from tenancy import current_tenant
+from table_inventory import DayAllocation
 
 @traceable(name="Check Availability Node")
 def check_availability_node(state: Union[Dict[str, Any], ReservationState]) -> Dict[str, Any]:
     if isinstance(state, ReservationState):
         state_model = state
-        state_dict = state.model_dump()
     else:
         try:
             state_model = ReservationState(**state)
-            state_dict = state
         except Exception as e:
             return {
                 "assistant_response": f"Error processing reservation: {str(e)}",
@@ -23,22 +26,20 @@ def check_availability_node(state: Union[Dict[str, Any], ReservationState]) -> D
 
     entities = state_model.entities
     
-    res_date = entities.res_date
-    res_time = entities.res_time
+    # The stored form ("2025-07-05", "19:00") keys the index and the database alike.
+    res_date = normalize_res_date(entities.res_date)
+    res_time = normalize_res_time(entities.res_time)
     
-    is_available = False
-    alternative_slots = []
     assistant_response = ""
     
     rounded_time = _round_time_to_hour(res_time)
-    
-    is_available = check_slot_availability(res_date, rounded_time)
+    is_available, alternative_slots = _speculated_availability(entities) or _availability(
+        res_date, rounded_time, entities.num_persons, entities.reservation_id
+    )
     
     if is_available:
         assistant_response = f"Great! {rounded_time} on {res_date} is available. Shall I confirm your reservation?"
     else:
-        alternative_slots = _suggest_alternative_slots(res_date, rounded_time)
-        
         if alternative_slots:
             slots_str = ", ".join(alternative_slots)
             assistant_response = (
@@ -51,17 +52,67 @@ def check_availability_node(state: Union[Dict[str, Any], ReservationState]) -> D
                 "we couldn't find suitable alternatives. Please try another time."
             )
     
-    updated_state = state_model.model_copy(update={
+    return {
         "is_available": is_available,
         "alternative_slots": alternative_slots,
         "assistant_response": assistant_response,
         "chat_history": [
-            *state_model.chat_history,
             {"role": "assistant", "content": assistant_response}
         ]
-    })
-    
-    return updated_state
+    }
+
+@traceable(name="Check Availability Node (async)")
+async def acheck_availability_node(state: Union[Dict[str, Any], ReservationState]) -> Dict[str, Any]:
+    return await db_pool.run_in_db_executor(check_availability_node, state)
+
+def _availability(res_date: str, rounded_time: str, num_persons: Optional[int] = None,
+                  reservation_id: Optional[str] = None) -> Tuple[bool, list]:
+    """(is_available, alternative_slots) for the slot; alternatives are only looked up when it is taken."""
+    if check_slot_availability(res_date, rounded_time, None, num_persons, reservation_id):
+        return True, []
+    return False, _suggest_alternative_slots(res_date, rounded_time, num_persons=num_persons)
+
+
+def _speculation_key(entities: Entities) -> Optional[tuple]:
+    if not (entities.res_date and entities.res_time):
+        return None
+    return ("availability", current_tenant(), normalize_res_date(entities.res_date),
+            _round_time_to_hour(normalize_res_time(entities.res_time)), entities.num_persons, entities.reservation_id)
+
+
+def speculate_availability(entities: Entities) -> None:
+    """
+    Starts the availability lookup for the date and time already known, in
+    the background, so check_availability_node can reuse it when the LLM
+    turn that runs meanwhile leaves those entities unchanged.
+    """
+    key = _speculation_key(entities)
+    if key is None or not SPECULATION_ENABLED:
+        return
+    speculative_results.start(key, _availability, key[2], key[3], entities.num_persons,
+                              entities.reservation_id)
+
+
+def _speculated_availability(entities: Entities) -> Optional[Tuple[bool, list]]:
+    """
+    The speculative result for exactly these entities, if one was started.
+    The slot itself is re-checked against the live availability index (a
+    cache hit after the speculative load); if a booking changed the answer
+    meanwhile, the result is dropped and the check runs normally.
+    """
+    key = _speculation_key(entities)
+    if key is None or not SPECULATION_ENABLED:
+        return None
+    result = speculative_results.take(key)
+    if result is None:
+        return None
+    is_available = check_slot_availability(key[2], key[3], None, entities.num_persons,
+                                           entities.reservation_id)
+    if is_available != result[0]:
+        metrics.inc("speculation_total", outcome="stale")
+        return None
+    return result[0], list(result[1])
+
 
 def _round_time_to_hour(time_str: str) -> str:
     try:
@@ -71,46 +122,47 @@ def _round_time_to_hour(time_str: str) -> str:
     except ValueError:
         return time_str 
 
-def check_slot_availability(res_date: str, res_time: str) -> bool:
-    conn = None
+def get_day_occupancy(res_date: str) -> Optional[DayAllocation]:
+    """
+    Returns the table allocation for every booked slot on res_date from the
+    in-memory availability index, which loads a date with a single query on
+    first use and is kept current by the nodes that write reservations.
+    Returns None if the lookup fails.
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT COUNT(*)
-                FROM reservations
-                WHERE res_date = ?
-                AND res_time = ?
-                AND status != 'confirmed'
-        """, (res_date, res_time))
-
-        count = cursor.fetchone()[0]
-        return count == 0 
+        return get_index().day(normalize_res_date(res_date))
 
     except Exception as e:
-        print(f"[check_slot_availability] Error: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+        print(f"[get_day_occupancy] Error: {e}")
+        return None
 
+def check_slot_availability(res_date: str, res_time: str, occupancy: Optional[DayAllocation] = None,
+                            num_persons: Optional[int] = None,
+                            exclude_reservation_id: Optional[str] = None) -> bool:
+    """
+    A slot is free when the party can still be seated at a table (or joined
+    tables) in the day allocation. The allocation is fetched when not supplied,
+    so callers checking several slots should pass it in.
+    """
+    if occupancy is None:
+        occupancy = get_day_occupancy(res_date)
+        if occupancy is None:
+            return False
+    return occupancy.can_seat(res_time, num_persons or 1, exclude_reservation_id)
 
-def _suggest_alternative_slots(res_date: str, res_time: str, num_alternatives: int = 3) -> list:
 
+def _suggest_alternative_slots(res_date: str, res_time: str, num_alternatives: int = 3,
+                               num_persons: Optional[int] = None) -> list:
+    """
+    The best-ranked free slots around the request (see slot_search), as
+    "HH:MM" on the requested day and "YYYY-MM-DD HH:MM" on other days.
+    """
     try:
-        cleaned_time = res_time.split(":")[0] + ":" + res_time.split(":")[1]
-        base_time = dt.datetime.strptime(cleaned_time, "%H:%M")
-        
-        alternatives = []
-        for offset in [1, -1, 2, -2, 3, -3]: 
-            new_time = (base_time + dt.timedelta(hours=offset)).strftime("%H:%M")
-            if check_slot_availability(res_date, new_time):
-                alternatives.append(new_time)
-                if len(alternatives) >= num_alternatives:
-                    break
-        return alternatives
+        same_day = normalize_res_date(res_date)
+        return [
+            slot if day == same_day else f"{day} {slot}"
+            for day, slot in search_slots(res_date, res_time, num_persons, num_alternatives)
+        ]
     except Exception as e:
         print(f"[_suggest_alternative_slots] Error: {e}")
         return []
-    
\ No newline at end of file
@@ -0,0 +1,859 @@
+# benchmark.py
+"""
+Load test for the reservation graph against a local mock LLM.
+
+    python benchmark.py --sessions 50 --concurrency 10 --llm-latency 0.4
+    python benchmark.py --sessions 50 --baseline benchmark_results/previous.json
+    python benchmark.py --booking-stress 32
+    python benchmark.py --bulk-rows 10000,100000
+    python benchmark.py --import-time
+
+Every session books a table over three turns, then modifies and cancels it.
+The mock server answers each scripted user message with a canned JSON reply
+after a configurable delay, so the numbers reflect the app and database, not
+the LLM provider. Results (p50/p95/p99 per node, LLM and DB time per turn,
+throughput) are printed and written as JSON for comparison between runs.
+
+Runs use a throwaway database unless --db is given; restaurant.db is never touched.
+"""
+import argparse
+import asyncio
+import contextvars
+import csv
+import datetime as dt
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_REPLY = {
+    "intent": "unknown",
+    "entities": {},
+    "assistant_response": "Sorry, could you rephrase that?",
+}
+
+
+class MockLLMServer:
+    """
+    OpenAI-compatible /chat/completions endpoint on localhost. Replies are
+    looked up by the last user message (see register); unknown messages get
+    DEFAULT_REPLY. Each request sleeps latency +/- jitter seconds first.
+    """
+
+    def __init__(self, latency: float = 0.3, jitter: float = 0.1, port: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.replies: Dict[str, Dict[str, Any]] = {}
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                server.requests += 1
+                user_messages = [m["content"] for m in request.get("messages", []) if m.get("role") == "user"]
+                reply = server.replies.get(user_messages[-1] if user_messages else "", DEFAULT_REPLY)
+                time.sleep(max(server.latency + random.uniform(-server.jitter, server.jitter), 0))
+                content = json.dumps(reply)
+
+                if request.get("stream"):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.end_headers()
+                    for start in range(0, len(content), 8):
+                        chunk = _completion_body(content[start:start + 8], stream=True)
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    return
+
+                body = json.dumps(_completion_body(content)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_port}/v1"
+
+    def register(self, user_message: str, reply: Dict[str, Any]) -> None:
+        self.replies[user_message] = reply
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def _completion_body(content: str, stream: bool = False) -> Dict[str, Any]:
+    if stream:
+        return {
+            "id": "mock", "object": "chat.completion.chunk", "created": 0, "model": "mock",
+            "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}],
+        }
+    return {
+        "id": "mock", "object": "chat.completion", "created": 0, "model": "mock",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+    }
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile, q in [0, 100]."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(int(round(q / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3),
+    }
+
+
+class Recorder:
+    """Collects node, LLM and DB timings. LLM / DB time is attributed to the turn running in the current context."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.nodes: Dict[str, List[float]] = {}
+        self.turns: List[float] = []
+        self.turn_llm: List[float] = []
+        self.turn_db: List[float] = []
+        self.turns_by_kind: Dict[str, List[float]] = {}
+        self.errors: List[str] = []
+        self.outcomes: Dict[str, int] = {}
+        self.current_turn: contextvars.ContextVar = contextvars.ContextVar("benchmark_turn", default=None)
+
+    def record_node(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.nodes.setdefault(name, []).append(seconds)
+
+    def add_to_turn(self, field: str, seconds: float) -> None:
+        turn = self.current_turn.get()
+        if turn is not None:
+            with self._lock:
+                turn[field] += seconds
+
+    def finish_turn(self, kind: str, turn: Dict[str, float], seconds: float) -> None:
+        with self._lock:
+            self.turns.append(seconds)
+            self.turns_by_kind.setdefault(kind, []).append(seconds)
+            self.turn_llm.append(turn["llm"])
+            self.turn_db.append(turn["db"])
+
+    def count(self, outcome: str) -> None:
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def wrap_node(self, name: str, node: Callable) -> Callable:
+        # Plain wrappers on purpose: functools.wraps would expose the traced
+        # node's signature and LangGraph would start passing it config.
+        if asyncio.iscoroutinefunction(node):
+            async def timed_async(state):
+                started = time.perf_counter()
+                try:
+                    return await node(state)
+                finally:
+                    self.record_node(name, time.perf_counter() - started)
+            return timed_async
+
+        def timed(state):
+            started = time.perf_counter()
+            try:
+                return node(state)
+            finally:
+                self.record_node(name, time.perf_counter() - started)
+        return timed
+
+
+def instrument(recorder: Recorder) -> None:
+    """
+    Times LLM requests and DB connection use per turn by wrapping the client's
+    create() methods and db_pool.connection. Background work (the log writer)
+    runs outside any turn and is not counted.
+    """
+    import a_extract_intent
+    import db_pool
+
+    completions = a_extract_intent.get_client().chat.completions
+    create = completions.create
+
+    def timed_create(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return create(*args, **kwargs)
+        finally:
+            recorder.add_to_turn("llm", time.perf_counter() - started)
+
+    completions.create = timed_create
+
+    async_completions = a_extract_intent.get_client(use_async=True).chat.completions
+    acreate = async_completions.create
+
+    async def timed_acreate(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await acreate(*args, **kwargs)
+        finally:
+            recorder.add_to_turn("llm", time.perf_counter() - started)
+
+    async_completions.create = timed_acreate
+
+    connection = db_pool.connection
+
+    @contextmanager
+    def timed_connection():
+        started = time.perf_counter()
+        try:
+            with connection() as conn:
+                yield conn
+        finally:
+            recorder.add_to_turn("db", time.perf_counter() - started)
+
+    db_pool.connection = timed_connection
+
+
+class Session:
+    """One guest: book (three turns), then modify and cancel the booking."""
+
+    TIMES = ["12:00", "13:00", "18:00", "19:00", "20:00", "21:00"]
+
+    def __init__(self, number: int, server: MockLLMServer, today: dt.date):
+        self.number = number
+        self.server = server
+        self.name = f"Guest{number}"
+        self.email = f"guest{number}@bench.test"
+        self.persons = 2 + number % 5
+        self.res_date = (today + dt.timedelta(days=1 + number % 28)).isoformat()
+        self.res_time = self.TIMES[number % len(self.TIMES)]
+        self.new_time = self.TIMES[(number + 3) % len(self.TIMES)]
+
+    def booking_turns(self) -> List[tuple]:
+        """(kind, user message, LLM reply) for the booking conversation."""
+        known = {"user_name": self.name}
+        turns = [("make", f"Hi, I'd like to book a table. My name is {self.name} (session {self.number}).",
+                  _reply("make_reservation", known, "Nice to meet you! What's your email and party size?"))]
+        known = {**known, "email_id": self.email, "num_persons": self.persons}
+        turns.append(("make", f"It's {self.email} and we'll be {self.persons} people, thanks.",
+                      _reply("make_reservation", known, "Great. Which date and time?")))
+        known = {**known, "res_date": self.res_date, "res_time": self.res_time, "reservation_type": "dinner"}
+        turns.append(("book", f"{self.res_date} at {self.res_time} for dinner please, session {self.number}.",
+                      _reply("make_reservation", known, "Let me check availability for you.")))
+        return turns
+
+    def modify_turn(self, reservation_id: str) -> tuple:
+        text = f"Please move reservation {reservation_id} to {self.new_time}, session {self.number}."
+        entities = {"reservation_id": reservation_id, "res_time": self.new_time}
+        return "modify", text, _reply("modify_reservation", entities, "Let me update that for you.")
+
+    def cancel_turn(self, reservation_id: str) -> tuple:
+        text = f"Actually cancel reservation {reservation_id}, my email is {self.email}, session {self.number}."
+        entities = {"reservation_id": reservation_id, "email_id": self.email}
+        return "cancel", text, _reply("cancel_reservation", entities, "Let me cancel that for you.")
+
+
+def _reply(intent: str, entities: Dict[str, Any], assistant_response: str) -> Dict[str, Any]:
+    return {"intent": intent, "entities": entities, "assistant_response": assistant_response}
+
+
+def _next_state(state: Dict[str, Any], user_input: str) -> Dict[str, Any]:
+    entities = state.get("entities") or {}
+    if not isinstance(entities, dict):
+        entities = entities.model_dump()
+    return {**state, "entities": entities, "user_input": user_input, "assistant_response": None}
+
+
+def _reservation_id(state: Dict[str, Any]) -> Optional[str]:
+    entities = state.get("entities") or {}
+    if not isinstance(entities, dict):
+        entities = entities.model_dump()
+    return entities.get("reservation_id")
+
+
+def run_session_sync(graph, session: Session, recorder: Recorder) -> None:
+    from pydantic_schemas import ReservationState
+
+    state = ReservationState().model_dump()
+
+    def turn(kind: str, text: str, reply: Dict[str, Any]) -> Dict[str, Any]:
+        session.server.register(text, reply)
+        timings = {"llm": 0.0, "db": 0.0}
+        token = recorder.current_turn.set(timings)
+        started = time.perf_counter()
+        try:
+            return graph.invoke(_next_state(state, text))
+        finally:
+            recorder.finish_turn(kind, timings, time.perf_counter() - started)
+            recorder.current_turn.reset(token)
+
+    try:
+        for kind, text, reply in session.booking_turns():
+            state = turn(kind, text, reply)
+        reservation_id = _reservation_id(state)
+        if not reservation_id:
+            recorder.count("unavailable")
+            return
+        state = turn(*session.modify_turn(reservation_id))
+        state = turn(*session.cancel_turn(reservation_id))
+        recorder.count("completed")
+    except Exception as e:
+        recorder.count("error")
+        recorder.errors.append(f"session {session.number}: {e}")
+
+
+async def run_session_async(graph, session: Session, recorder: Recorder) -> None:
+    from pydantic_schemas import ReservationState
+
+    state = ReservationState().model_dump()
+
+    async def turn(kind: str, text: str, reply: Dict[str, Any]) -> Dict[str, Any]:
+        session.server.register(text, reply)
+        timings = {"llm": 0.0, "db": 0.0}
+        token = recorder.current_turn.set(timings)
+        started = time.perf_counter()
+        try:
+            return await graph.ainvoke(_next_state(state, text))
+        finally:
+            recorder.finish_turn(kind, timings, time.perf_counter() - started)
+            recorder.current_turn.reset(token)
+
+    try:
+        for kind, text, reply in session.booking_turns():
+            state = await turn(kind, text, reply)
+        reservation_id = _reservation_id(state)
+        if not reservation_id:
+            recorder.count("unavailable")
+            return
+        state = await turn(*session.modify_turn(reservation_id))
+        state = await turn(*session.cancel_turn(reservation_id))
+        recorder.count("completed")
+    except Exception as e:
+        recorder.count("error")
+        recorder.errors.append(f"session {session.number}: {e}")
+
+
+def _prepare_environment(server: MockLLMServer, db_path: Optional[str] = None) -> None:
+    os.environ["LLM_BASE_URL"] = server.base_url
+    os.environ.setdefault("GROQ_API_KEY", "mock")
+    os.environ.setdefault("LANGSMITH_TRACING", "false")
+    os.environ["RESTAURANT_DB_PATH"] = db_path or os.path.join(tempfile.mkdtemp(prefix="benchmark-"), "restaurant.db")
+
+    import db_init
+    db_init.initialize_database()
+
+
+def state_microbenchmark(history_lengths: List[int], repeats: int = 200) -> Dict[str, Any]:
+    """
+    Per-node cost as chat_history grows. Each sample is one graph turn the
+    rule fast path answers (extract_intent -> track_entities, no LLM) plus a
+    direct check_availability_node call; costs should stay flat with length.
+    """
+    server = MockLLMServer(latency=0, jitter=0).start()
+    _prepare_environment(server)
+
+    import d_reservation_flow
+    from b_check_availibility import check_availability_node
+    from pydantic_schemas import ReservationState
+
+    recorder = Recorder()
+    graph = d_reservation_flow.build_reservation_graph(wrap_node=recorder.wrap_node)
+    tomorrow = (dt.date.today() + dt.timedelta(days=1)).isoformat()
+    results: Dict[str, Any] = {}
+
+    for length in history_lengths:
+        history = [
+            {"user": f"message {i}"} if i % 2 == 0 else {"assistant": f"reply {i}"}
+            for i in range(length)
+        ]
+        turn = ReservationState(
+            user_input="guest@bench.test",
+            intent="make_reservation",
+            entities={"user_name": "Guest"},
+            chat_history=history,
+        ).model_dump()
+        complete = ReservationState(
+            intent="make_reservation",
+            entities={"user_name": "Guest", "email_id": "guest@bench.test", "num_persons": 2,
+                      "res_date": tomorrow, "res_time": "19:00", "reservation_type": "dinner"},
+            chat_history=history,
+        )
+
+        recorder.nodes.clear()
+        turn_samples, availability_samples = [], []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            graph.invoke(turn)
+            turn_samples.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            check_availability_node(complete)
+            availability_samples.append(time.perf_counter() - started)
+
+        results[str(length)] = {
+            "turn": summarize(turn_samples),
+            "nodes": {name: summarize(samples) for name, samples in sorted(recorder.nodes.items())},
+            "check_availability_direct": summarize(availability_samples),
+        }
+
+    server.stop()
+    return {"started_at": dt.datetime.now().isoformat(timespec="seconds"), "repeats": repeats, "history": results}
+
+
+def print_state_report(results: Dict[str, Any]) -> None:
+    print(f"\n{'history':>8}{'turn p50 us':>14}{'extract us':>13}{'track us':>11}{'availability us':>18}")
+    for length, stats in results["history"].items():
+        nodes = stats["nodes"]
+        print(f"{length:>8}{stats['turn']['p50_ms'] * 1000:>14.0f}"
+              f"{nodes.get('extract_intent', {}).get('p50_ms', 0) * 1000:>13.0f}"
+              f"{nodes.get('track_entities', {}).get('p50_ms', 0) * 1000:>11.0f}"
+              f"{stats['check_availability_direct']['p50_ms'] * 1000:>18.0f}")
+
+
+def booking_stress(threads: int = 32, attempts: int = 50, slots: int = 3, seed: int = 0,
+                   restaurants: int = 1) -> Dict[str, Any]:
+    """
+    Many threads race to book the same few slots through check_availability_node
+    and create_reservation_node, as the graph does. Afterwards every slot is
+    re-packed from the database; any booking that no longer fits a table is
+    an overbooking. With restaurants > 1 the threads are spread over that many
+    restaurant shards, each with its own slots.
+    """
+    server = MockLLMServer(latency=0, jitter=0).start()
+    _prepare_environment(server)
+
+    import db_pool
+    from availability_index import BOOKED_ROWS_SQL
+    from b_check_availibility import check_availability_node
+    from c_create_reservation import create_reservation_node
+    from log_writer import utc_timestamp
+    from pydantic_schemas import ReservationState
+    from table_inventory import DayAllocation
+    from tenancy import ensure_tenant, tenant_scope
+
+    shards = [f"bench-{number}" for number in range(restaurants)] if restaurants > 1 else [None]
+    for restaurant_id in shards:
+        ensure_tenant(restaurant_id)
+    res_date = (dt.date.today() + dt.timedelta(days=1)).isoformat()
+    times = [f"{18 + i:02d}:00" for i in range(slots)]
+    counts = {"booked": 0, "full_at_check": 0, "lost_race": 0, "errors": 0}
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def guest(number: int) -> None:
+        with tenant_scope(shards[number % len(shards)]):
+            book(number)
+
+    def book(number: int) -> None:
+        rng = random.Random(seed * 1000 + number)
+        for attempt in range(attempts):
+            state = ReservationState(intent="make_reservation", entities={
+                "user_name": f"Guest {number}", "email_id": f"guest{number}@bench.test",
+                "num_persons": rng.randint(1, 8), "res_date": res_date, "res_time": rng.choice(times),
+                "reservation_type": "dinner",
+            })
+            started = time.perf_counter()
+            outcome = "full_at_check"
+            try:
+                if check_availability_node(state)["is_available"]:
+                    created = create_reservation_node(state)
+                    if created.get("error"):
+                        outcome = "errors"
+                    else:
+                        outcome = "booked" if created.get("entities", {}).get("reservation_id") else "lost_race"
+            except Exception:
+                outcome = "errors"
+            with lock:
+                counts[outcome] += 1
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(guest, range(threads)))
+    elapsed = time.perf_counter() - started
+    server.stop()
+
+    rows, overbooked, covers = [], {}, {}
+    for restaurant_id in shards:
+        with tenant_scope(restaurant_id), db_pool.connection() as conn:
+            shard_rows = conn.execute(BOOKED_ROWS_SQL, (res_date, utc_timestamp())).fetchall()
+        day = DayAllocation.from_bookings(res_date, [row[:3] for row in shard_rows])
+        prefix = f"{restaurant_id}/" if restaurant_id else ""
+        overbooked.update({prefix + key: allocation.overflow for key, allocation in day.slots.items() if allocation.overflow})
+        covers.update({prefix + key: value for key, value in day.occupancy().items()})
+        rows.extend(shard_rows)
+
+    return {
+        "started_at": dt.datetime.now().isoformat(timespec="seconds"),
+        "threads": threads,
+        "restaurants": restaurants,
+        "attempts": threads * attempts,
+        **counts,
+        "rows": len(rows),
+        "overbooked_slots": overbooked,
+        "covers_by_slot": covers,
+        "elapsed_s": round(elapsed, 3),
+        "attempts_per_s": round(threads * attempts / elapsed, 1) if elapsed else 0.0,
+        "attempt": summarize(latencies),
+    }
+
+
+def print_booking_report(results: Dict[str, Any]) -> None:
+    print(f"\n{results['attempts']} booking attempts from {results['threads']} threads "
+          f"over {results.get('restaurants', 1)} restaurant(s) "
+          f"in {results['elapsed_s']:.2f}s ({results['attempts_per_s']:.0f}/s)")
+    print(f"  booked {results['booked']}, full at check {results['full_at_check']}, "
+          f"lost the race {results['lost_race']}, errors {results['errors']}")
+    print(f"  attempt p50 {results['attempt']['p50_ms']:.2f} ms, p95 {results['attempt']['p95_ms']:.2f} ms")
+    print(f"  covers by slot: {results['covers_by_slot']}")
+    print(f"  overbooked slots: {results['overbooked_slots'] or 'none'}")
+
+
+def bulk_benchmark(sizes: List[int], invalid_every: int = 100) -> Dict[str, Any]:
+    """
+    Imports and exports generated files of each size through bulk_io, CSV
+    and JSONL, and reports rows/s. Every invalid_every-th row is broken so the
+    error path is exercised. Peak RSS is read after each size (largest last):
+    with streaming it should stay flat as the files grow.
+    """
+    server = MockLLMServer(latency=0, jitter=0).start()
+    _prepare_environment(server)
+    server.stop()
+
+    import bulk_io
+    try:
+        import resource
+    except ImportError:  # Windows
+        resource = None
+
+    workdir = tempfile.mkdtemp(prefix="bulk-")
+    first_day = dt.date.today() + dt.timedelta(days=1)
+    results: Dict[str, Any] = {"started_at": dt.datetime.now().isoformat(timespec="seconds"), "sizes": {}}
+
+    def generated(count: int):
+        for i in range(count):
+            yield {
+                "user_name": f"Bulk Guest {i}",
+                "email_id": f"bulk{i}@bench.test",
+                "num_persons": "many" if invalid_every and i % invalid_every == invalid_every - 1 else 1 + i % 6,
+                "res_date": (first_day + dt.timedelta(days=i % 365)).isoformat(),
+                "res_time": f"{12 + i % 11:02d}:{(i * 15) % 60:02d}",
+                "reservation_type": "dinner",
+                "status": "confirmed",
+            }
+
+    for size in sorted(sizes):
+        entry: Dict[str, Any] = {}
+        for fmt in ("csv", "jsonl"):
+            path = os.path.join(workdir, f"import-{size}.{fmt}")
+            with open(path, "w", newline="" if fmt == "csv" else None, encoding="utf-8") as f:
+                if fmt == "csv":
+                    writer = csv.DictWriter(f, fieldnames=list(bulk_io.REQUIRED_FIELDS) + ["reservation_type", "status"])
+                    writer.writeheader()
+                    writer.writerows(generated(size))
+                else:
+                    for row in generated(size):
+                        f.write(json.dumps(row) + "\n")
+
+            report = bulk_io.import_file(path)
+            started = time.perf_counter()
+            exported = bulk_io.export_file(os.path.join(workdir, f"export-{size}.{fmt}"))
+            export_s = time.perf_counter() - started
+            entry[fmt] = {
+                "import": {key: value for key, value in report.as_dict().items() if key != "errors"},
+                "export": {
+                    "rows": exported,
+                    "seconds": round(export_s, 3),
+                    "rows_per_second": round(exported / export_s, 1) if export_s else 0.0,
+                },
+            }
+            os.remove(path)
+        if resource is not None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            entry["peak_rss_mb"] = round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+        results["sizes"][str(size)] = entry
+    return results
+
+
+def print_bulk_report(results: Dict[str, Any]) -> None:
+    print(f"\n{'rows':>9}{'format':>8}{'import rows/s':>15}{'rejected':>10}{'export rows/s':>15}{'peak RSS MB':>13}")
+    for size, entry in results["sizes"].items():
+        for fmt in ("csv", "jsonl"):
+            stats = entry[fmt]
+            print(f"{size:>9}{fmt:>8}{stats['import']['rows_per_second']:>15.0f}{stats['import']['rejected']:>10}"
+                  f"{stats['export']['rows_per_second']:>15.0f}{entry.get('peak_rss_mb', 0):>13.1f}")
+
+
+IMPORT_MODULES = ("d_reservation_flow", "a_extract_intent", "pydantic_schemas", "e_server")
+
+FIRST_GRAPH_SCRIPT = """
+import time
+started = time.perf_counter()
+import d_reservation_flow
+imported = time.perf_counter()
+d_reservation_flow.get_app()
+print(imported - started, time.perf_counter() - imported)
+"""
+
+
+def import_time_benchmark(modules=IMPORT_MODULES, repeats: int = 5) -> Dict[str, Any]:
+    """
+    Cold-start cost, each sample in a fresh interpreter: the cumulative time
+    python -X importtime reports for importing each module, the slowest
+    modules it pulled in, and for the graph module the import plus the first
+    get_app() call that compiles it.
+    """
+    env = {**os.environ, "LANGSMITH_TRACING": os.getenv("LANGSMITH_TRACING", "false"), "GROQ_API_KEY": "mock"}
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    results: Dict[str, Any] = {"started_at": dt.datetime.now().isoformat(timespec="seconds"), "modules": {}}
+
+    for module in modules:
+        samples, heaviest = [], {}
+        for _ in range(repeats):
+            completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                       cwd=cwd, env=env, capture_output=True, text=True)
+            cumulative = {}
+            for line in completed.stderr.splitlines():
+                if line.startswith("import time:") and "|" in line:
+                    _, total, name = line.split("|")
+                    if total.strip().isdigit():
+                        cumulative[name.strip()] = int(total) / 1e6
+            if module in cumulative:
+                samples.append(cumulative[module])
+                heaviest = cumulative
+        top = sorted(((seconds, name) for name, seconds in heaviest.items() if "." not in name and name != module),
+                     reverse=True)[:5]
+        results["modules"][module] = {
+            **summarize(samples),
+            "top_level_imports": {name: round(seconds, 4) for seconds, name in top},
+        }
+
+    imports, builds = [], []
+    for _ in range(repeats):
+        completed = subprocess.run([sys.executable, "-c", FIRST_GRAPH_SCRIPT], cwd=cwd, env=env,
+                                   capture_output=True, text=True)
+        if completed.returncode == 0:
+            imported, built = (float(value) for value in completed.stdout.split()[-2:])
+            imports.append(imported)
+            builds.append(built)
+    results["first_graph"] = {"import": summarize(imports), "get_app": summarize(builds)}
+    return results
+
+
+def print_import_report(results: Dict[str, Any]) -> None:
+    print(f"\n{'module':<22}{'p50 ms':>10}{'max ms':>10}  heaviest imports")
+    for module, stats in results["modules"].items():
+        if not stats.get("count"):
+            print(f"{module:<22}{'failed':>10}")
+            continue
+        heaviest = ", ".join(f"{name} {seconds * 1000:.0f}" for name, seconds in stats["top_level_imports"].items())
+        print(f"{module:<22}{stats['p50_ms']:>10.0f}{stats['max_ms']:>10.0f}  {heaviest}")
+    first = results["first_graph"]
+    if first["import"].get("count"):
+        print(f"\nimport d_reservation_flow {first['import']['p50_ms']:.0f} ms, "
+              f"first get_app() {first['get_app']['p50_ms']:.0f} ms (p50)")
+
+
+def run_benchmark(sessions: int = 20, concurrency: int = 5, llm_latency: float = 0.3, llm_jitter: float = 0.1,
+                  mode: str = "async", db_path: Optional[str] = None, seed: int = 0) -> Dict[str, Any]:
+    """
+    Runs the scripted sessions and returns the results dict. Environment
+    variables are set before the app modules are imported, so this must run
+    in a fresh process (as `python benchmark.py` does).
+    """
+    random.seed(seed)
+    server = MockLLMServer(latency=llm_latency, jitter=llm_jitter).start()
+    _prepare_environment(server, db_path)
+
+    import d_reservation_flow
+    from log_writer import log_writer
+    from rule_extractor import stats as fast_path_stats
+    import llm_cache
+
+    recorder = Recorder()
+    instrument(recorder)
+    graph = d_reservation_flow.build_reservation_graph(use_async=mode == "async", wrap_node=recorder.wrap_node)
+    today = dt.date.today()
+    guests = [Session(number, server, today) for number in range(sessions)]
+
+    started = time.perf_counter()
+    if mode == "async":
+        async def drive():
+            limit = asyncio.Semaphore(concurrency)
+
+            async def one(session):
+                async with limit:
+                    await run_session_async(graph, session, recorder)
+
+            await asyncio.gather(*(one(session) for session in guests))
+
+        asyncio.run(drive())
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda session: run_session_sync(graph, session, recorder), guests))
+    elapsed = time.perf_counter() - started
+    log_writer.flush()
+    server.stop()
+
+    return {
+        "started_at": dt.datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "sessions": sessions,
+            "concurrency": concurrency,
+            "mode": mode,
+            "llm_latency_s": llm_latency,
+            "llm_jitter_s": llm_jitter,
+            "python": sys.version.split()[0],
+        },
+        "duration_s": round(elapsed, 3),
+        "turns": len(recorder.turns),
+        "throughput_turns_per_s": round(len(recorder.turns) / elapsed, 3) if elapsed else 0.0,
+        "sessions_per_s": round(sessions / elapsed, 3) if elapsed else 0.0,
+        "outcomes": recorder.outcomes,
+        "errors": recorder.errors[:20],
+        "turn": summarize(recorder.turns),
+        "turn_by_kind": {kind: summarize(samples) for kind, samples in sorted(recorder.turns_by_kind.items())},
+        "llm_per_turn": summarize(recorder.turn_llm),
+        "db_per_turn": summarize(recorder.turn_db),
+        "nodes": {name: summarize(samples) for name, samples in sorted(recorder.nodes.items())},
+        "mock_llm_requests": server.requests,
+        "fast_path": fast_path_stats.snapshot(),
+        "llm_cache": llm_cache.response_cache.stats() if llm_cache.response_cache else None,
+        "log_writer": log_writer.stats(),
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.10) -> List[str]:
+    """Lines describing p95 changes against a previous run; regressions above threshold are flagged."""
+    lines = []
+
+    def check(label: str, now: Dict[str, Any], before: Dict[str, Any]) -> None:
+        if not now.get("count") or not before.get("count"):
+            return
+        old, new = before["p95_ms"], now["p95_ms"]
+        change = (new - old) / old if old else 0.0
+        flag = "  <-- regression" if change > threshold else ""
+        lines.append(f"{label:<28} p95 {old:>10.2f} -> {new:>10.2f} ms ({change:+.1%}){flag}")
+
+    check("turn", current["turn"], baseline.get("turn", {}))
+    check("llm per turn", current["llm_per_turn"], baseline.get("llm_per_turn", {}))
+    check("db per turn", current["db_per_turn"], baseline.get("db_per_turn", {}))
+    for name, stats in current["nodes"].items():
+        check(f"node {name}", stats, baseline.get("nodes", {}).get(name, {}))
+    old_rate, new_rate = baseline.get("throughput_turns_per_s"), current["throughput_turns_per_s"]
+    if old_rate:
+        lines.append(f"{'throughput':<28} {old_rate:>14.2f} -> {new_rate:>10.2f} turns/s ({(new_rate - old_rate) / old_rate:+.1%})")
+    return lines
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    config = results["config"]
+    print(f"\n{results['config']['sessions']} sessions, concurrency {config['concurrency']} ({config['mode']}), "
+          f"mock LLM {config['llm_latency_s']}s +/- {config['llm_jitter_s']}s")
+    print(f"{results['turns']} turns in {results['duration_s']}s: {results['throughput_turns_per_s']} turns/s, "
+          f"outcomes {results['outcomes']}")
+    print(f"\n{'':<28}{'count':>7}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'max ms':>11}")
+    rows = [("turn", results["turn"]), ("llm per turn", results["llm_per_turn"]), ("db per turn", results["db_per_turn"])]
+    rows += [(f"turn {kind}", stats) for kind, stats in results["turn_by_kind"].items()]
+    rows += [(f"node {name}", stats) for name, stats in results["nodes"].items()]
+    for label, stats in rows:
+        if stats.get("count"):
+            print(f"{label:<28}{stats['count']:>7}{stats['p50_ms']:>11.2f}{stats['p95_ms']:>11.2f}"
+                  f"{stats['p99_ms']:>11.2f}{stats['max_ms']:>11.2f}")
+    for error in results["errors"]:
+        print(f"[benchmark] {error}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the reservation graph against a mock LLM.")
+    parser.add_argument("--sessions", type=int, default=20, help="scripted guests to run (5 turns each)")
+    parser.add_argument("--concurrency", type=int, default=5, help="sessions running at the same time")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="mock LLM delay per request, seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.1, help="random +/- added to the delay, seconds")
+    parser.add_argument("--mode", choices=["async", "sync"], default="async",
+                        help="async: ainvoke on one event loop; sync: invoke from a thread pool")
+    parser.add_argument("--db", help="database file to use (default: a fresh temporary one)")
+    parser.add_argument("--state-history", metavar="N,N,...",
+                        help="instead of the load test, time nodes against these chat_history lengths")
+    parser.add_argument("--booking-stress", type=int, metavar="THREADS",
+                        help="instead of the load test, race THREADS threads booking the same slots")
+    parser.add_argument("--restaurants", type=int, default=1,
+                        help="with --booking-stress, spread the threads over this many restaurant shards")
+    parser.add_argument("--bulk-rows", metavar="N,N,...",
+                        help="instead of the load test, time bulk_io import/export of files with N rows")
+    parser.add_argument("--import-time", action="store_true",
+                        help="instead of the load test, measure cold import time of the app modules")
+    parser.add_argument("--output", help="where to write the JSON results (default: benchmark_results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--fail-on-regression", type=float, metavar="FRACTION",
+                        help="exit 1 if any p95 grew by more than FRACTION (e.g. 0.2) against --baseline")
+    args = parser.parse_args(argv)
+    status = 0
+
+    if args.state_history:
+        results = state_microbenchmark([int(n) for n in args.state_history.split(",")])
+        print_state_report(results)
+    elif args.booking_stress:
+        results = booking_stress(args.booking_stress, restaurants=args.restaurants)
+        print_booking_report(results)
+        if results["overbooked_slots"] or results["errors"]:
+            status = 1
+    elif args.import_time:
+        results = import_time_benchmark()
+        print_import_report(results)
+    elif args.bulk_rows:
+        results = bulk_benchmark([int(n) for n in args.bulk_rows.split(",")])
+        print_bulk_report(results)
+    else:
+        results = run_benchmark(args.sessions, args.concurrency, args.llm_latency, args.llm_jitter, args.mode, args.db)
+        print_report(results)
+
+    output = args.output or os.path.join("benchmark_results", f"{dt.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        threshold = args.fail_on_regression if args.fail_on_regression is not None else 0.10
+        lines = compare(results, baseline, threshold)
+        print(f"\nCompared with {args.baseline}:")
+        print("\n".join(lines))
+        if args.fail_on_regression is not None and any(line.endswith("regression") for line in lines):
+            return 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+# booking.py
+import atexit
+import datetime
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional, TypeVar
+
+import db_pool
+import metrics
+from tenancy import tenant_scope
+from availability_index import get_index, record_booking, release_booking
+from log_writer import utc_timestamp
+from db_migrations import normalize_res_date, normalize_res_time
+from table_inventory import DayAllocation, slot_key
+
+# Attempts for a write that keeps hitting SQLITE_BUSY after busy_timeout, and the first backoff delay.
+BOOKING_MAX_RETRIES = int(os.getenv("BOOKING_MAX_RETRIES", "5"))
+BOOKING_RETRY_DELAY = float(os.getenv("BOOKING_RETRY_DELAY", "0.05"))
+
+# How long a pending (unconfirmed) reservation keeps its tables, and how often
+# the reaper deletes lapsed holds (0 = only expire them lazily at read time).
+HOLD_TTL_SECONDS = float(os.getenv("RESERVATION_HOLD_TTL", "900"))
+HOLD_REAP_INTERVAL = float(os.getenv("RESERVATION_HOLD_REAP_INTERVAL", "60"))
+
+# Live bookings in one hourly slot ("19:00" covers 19:00-19:59), served by idx_reservations_slot.
+SLOT_ROWS_SQL = """
+    SELECT reservation_id, res_time, num_persons
+        FROM reservations
+        WHERE res_date = ?
+        AND res_time >= ? AND res_time < ?
+        AND status != 'cancelled'
+        AND (hold_expires_at IS NULL OR hold_expires_at > ?)
+"""
+
+INSERT_RESERVATION_SQL = """
+    INSERT INTO reservations (
+        user_name, email_id, num_persons,
+        res_date, res_time, reservation_type,
+        status, created_at, hold_expires_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+EXPIRED_HOLDS_SQL = """
+    SELECT reservation_id, res_date, res_time
+        FROM reservations
+        WHERE status = 'pending'
+        AND hold_expires_at <= ?
+        LIMIT ?
+"""
+
+T = TypeVar("T")
+
+
+def _is_busy(error: sqlite3.OperationalError) -> bool:
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def immediate_transaction(work: Callable[[sqlite3.Connection], T], retries: int = BOOKING_MAX_RETRIES,
+                          retry_delay: float = BOOKING_RETRY_DELAY) -> T:
+    """
+    Runs work(conn) in a BEGIN IMMEDIATE transaction and commits it. Taking
+    the write lock up front means nothing another writer commits can slip in
+    between work's reads and writes. SQLITE_BUSY (after the pool's
+    busy_timeout) rolls back and retries with jittered exponential backoff;
+    any other error rolls back and propagates.
+    """
+    for attempt in range(retries + 1):
+        with db_pool.connection() as conn:
+            if conn.in_transaction:
+                conn.commit()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                result = work(conn)
+                conn.commit()
+                return result
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                if not _is_busy(e) or attempt == retries:
+                    raise
+            except Exception:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+        metrics.inc("booking_retries_total")
+        time.sleep(retry_delay * (2 ** attempt) * (0.5 + random.random()))
+
+
+def slot_has_room(conn: sqlite3.Connection, res_date: str, res_time: str, num_persons: Optional[int],
+                  exclude_reservation_id: Optional[Any] = None) -> bool:
+    """
+    Whether every live booking in the slot plus this party can be seated,
+    read from the database inside the caller's transaction rather than from
+    the per-process availability cache. exclude_reservation_id leaves out a
+    booking that is being moved. A time that is not a valid HH:MM has no
+    slot to count it against, so it never has room.
+    """
+    start = slot_key(res_time)
+    try:
+        hour = datetime.datetime.strptime(start, "%H:%M").hour
+    except ValueError:
+        return False
+    end = f"{hour + 1:02d}:00"
+    rows = conn.execute(SLOT_ROWS_SQL, (res_date, start, end, utc_timestamp())).fetchall()
+    bookings = [row for row in rows if str(row[0]) != str(exclude_reservation_id)]
+    bookings.append(("new", res_time, num_persons))
+    day = DayAllocation.from_bookings(res_date, bookings, tables=get_index().tables,
+                                      cover_limit=get_index().cover_limit)
+    return day.slot(res_time).overflow == 0
+
+
+def hold_deadline(ttl_seconds: float = HOLD_TTL_SECONDS) -> str:
+    """hold_expires_at for a hold taken now, in the CURRENT_TIMESTAMP format it is compared with."""
+    expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=ttl_seconds)
+    return expires.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def reserve_slot(entities, status: str = "pending") -> Optional[str]:
+    """
+    Checks the slot and inserts the reservation in one transaction. Returns
+    the new reservation ID, or None when the slot filled up since the
+    availability check (the cached date is dropped so the next check sees it).
+    A pending reservation is a hold: it keeps its tables for HOLD_TTL_SECONDS
+    unless confirmed.
+    """
+    res_date = normalize_res_date(entities.res_date)
+    res_time = normalize_res_time(entities.res_time)
+    hold_expires_at = hold_deadline() if status == "pending" else None
+
+    def reserve(conn: sqlite3.Connection) -> Optional[str]:
+        if not slot_has_room(conn, res_date, res_time, entities.num_persons):
+            return None
+        cursor = conn.execute(INSERT_RESERVATION_SQL, (
+            entities.user_name,
+            entities.email_id,
+            entities.num_persons,
+            res_date,
+            res_time,
+            entities.reservation_type,
+            status,
+            datetime.datetime.now().isoformat(),
+            hold_expires_at,
+        ))
+        return str(cursor.lastrowid)
+
+    reservation_id = immediate_transaction(reserve)
+    if reservation_id is None:
+        metrics.inc("booking_conflicts_total")
+        get_index().invalidate(res_date)
+        return None
+    record_booking(reservation_id, res_date, res_time, entities.num_persons, hold_expires_at)
+    if hold_expires_at:
+        hold_reaper.ensure_started()
+    return reservation_id
+
+
+def confirm_hold(reservation_id: str) -> str:
+    """
+    Turns a pending hold into a confirmed reservation. A hold that already
+    lapsed is still confirmed if its slot has room; otherwise it is deleted.
+    Returns "confirmed", "expired", "not found", or "already confirmed" /
+    "already cancelled" when it was not pending.
+    """
+    def confirm(conn: sqlite3.Connection):
+        row = conn.execute(
+            "SELECT status, hold_expires_at, res_date, res_time, num_persons FROM reservations WHERE reservation_id = ?",
+            (reservation_id,),
+        ).fetchone()
+        if row is None:
+            return "not found", None
+        status, hold_expires_at, res_date, res_time, num_persons = row
+        if status != "pending":
+            return f"already {status}", None
+        if hold_expires_at and hold_expires_at <= utc_timestamp() and \
+                not slot_has_room(conn, res_date, res_time, num_persons, reservation_id):
+            conn.execute("DELETE FROM reservations WHERE reservation_id = ?", (reservation_id,))
+            return "expired", row
+        conn.execute("""
+            UPDATE reservations
+            SET status = 'confirmed',
+                hold_expires_at = NULL,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE reservation_id = ?
+        """, (reservation_id,))
+        return "confirmed", row
+
+    outcome, row = immediate_transaction(confirm)
+    if row is not None:
+        _, _, res_date, res_time, num_persons = row
+        if outcome == "confirmed":
+            record_booking(reservation_id, res_date, res_time, num_persons)
+        else:
+            release_booking(reservation_id, res_date, res_time)
+    return outcome
+
+
+def expire_holds(batch_size: int = 500) -> int:
+    """Deletes pending reservations whose hold lapsed and frees their tables. Returns how many."""
+    def sweep(conn: sqlite3.Connection):
+        rows = conn.execute(EXPIRED_HOLDS_SQL, (utc_timestamp(), batch_size)).fetchall()
+        conn.executemany("DELETE FROM reservations WHERE reservation_id = ?", [(row[0],) for row in rows])
+        return rows
+
+    expired = 0
+    while True:
+        rows = immediate_transaction(sweep)
+        for reservation_id, res_date, res_time in rows:
+            release_booking(reservation_id, res_date, res_time)
+        expired += len(rows)
+        if len(rows) < batch_size:
+            break
+    if expired:
+        metrics.inc("booking_holds_reaped_total", expired)
+    return expired
+
+
+class HoldReaper:
+    """
+    Daemon thread calling expire_holds() every interval seconds for every
+    restaurant shard this process has opened. It starts with the first hold
+    taken in the process; every worker may run one, the deletes are idempotent.
+    """
+
+    def __init__(self, interval: float = HOLD_REAP_INTERVAL):
+        self.interval = interval
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def ensure_started(self) -> None:
+        if self._thread is None and self.interval > 0:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="hold-reaper", daemon=True)
+                    self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            for restaurant_id in db_pool.router.tenants():
+                try:
+                    with tenant_scope(restaurant_id):
+                        expire_holds()
+                except sqlite3.Error as e:
+                    print(f"[booking] Hold reaper failed for {restaurant_id or 'default'}: {e}")
+
+
+hold_reaper = HoldReaper()
+atexit.register(hold_reaper.stop)
+
+
+metrics.registry.describe("booking_conflicts_total", "Bookings refused because the slot filled up after the availability check.")
+metrics.registry.describe("booking_retries_total", "Booking transactions retried after SQLITE_BUSY.")
+metrics.registry.describe("booking_holds_reaped_total", "Lapsed pending holds deleted by the reaper.")
@@ -0,0 +1,388 @@
+# bulk_io.py
+"""
+Streaming bulk import and export of the reservations table.
+
+    python bulk_io.py import bookings.csv --errors rejected.jsonl
+    python bulk_io.py export backup.jsonl --from 2025-08-01 --to 2025-08-31
+    python bulk_io.py --restaurant downtown import downtown.csv
+
+Files are read and written a chunk at a time, so memory stays flat whatever
+their size. Imported rows are validated through the Entities model and
+inserted with executemany, one BEGIN IMMEDIATE transaction per chunk; rows
+that fail are reported with their line number instead of stopping the load.
+"""
+import argparse
+import csv
+import datetime as dt
+import json
+import os
+import sqlite3
+import sys
+import time
+from itertools import islice
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+import db_pool
+from availability_index import get_index
+from booking import immediate_transaction, slot_has_room
+from db_migrations import normalize_res_date, normalize_res_time
+from pydantic_schemas import Entities
+from tenancy import DEFAULT_RESTAURANT_ID, ensure_tenant, tenant_scope
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "5000"))
+# Errors kept in the returned report; all of them go to the errors file when one is given.
+MAX_REPORTED_ERRORS = 100
+
+REQUIRED_FIELDS = ("user_name", "email_id", "num_persons", "res_date", "res_time")
+EXPORT_COLUMNS = (
+    "reservation_id", "user_name", "email_id", "num_persons", "res_date", "res_time",
+    "reservation_type", "status", "created_at", "updated_at", "hold_expires_at",
+)
+
+BULK_INSERT_SQL = """
+    INSERT INTO reservations (
+        reservation_id, user_name, email_id, num_persons,
+        res_date, res_time, reservation_type,
+        status, created_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_entities_list = TypeAdapter(List[Entities])
+
+
+class ImportReport:
+    """
+    Counts for one import, plus the first MAX_REPORTED_ERRORS (line, message)
+    pairs. retried_chunks counts chunks that fell back to row-by-row inserts.
+    """
+
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.chunks = 0
+        self.retried_chunks = 0
+        self.errors: List[Tuple[int, str]] = []
+        self.seconds = 0.0
+
+    def reject(self, line: int, message: str, sink: Optional[IO[str]] = None) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+        if sink is not None:
+            sink.write(json.dumps({"line": line, "error": message}) + "\n")
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.read / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "read": self.read,
+            "inserted": self.inserted,
+            "rejected": self.rejected,
+            "chunks": self.chunks,
+            "retried_chunks": self.retried_chunks,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+            "errors": self.errors,
+        }
+
+
+def _detect_format(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    return "jsonl" if path.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def read_rows(stream: IO[str], fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yields (line number, row) lazily; a JSONL line that does not parse is yielded as the error text."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, f"invalid JSON: {e}"
+
+
+def _clean(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Entities fields only, with CSV's empty strings as missing values."""
+    cleaned = {}
+    for field in Entities.model_fields:
+        value = row.get(field)
+        if isinstance(value, str):
+            value = value.strip() or None
+        elif field == "reservation_id" and value is not None:
+            value = str(value)
+        cleaned[field] = value
+    return cleaned
+
+
+def _check(entities: Entities) -> Optional[str]:
+    """Rules beyond the model's types; returns the problem or None."""
+    missing = [field for field in REQUIRED_FIELDS if getattr(entities, field) in (None, "")]
+    if missing:
+        return f"missing {', '.join(missing)}"
+    if entities.reservation_id is not None and not entities.reservation_id.isdigit():
+        return f"reservation_id must be a positive integer, got {entities.reservation_id!r}"
+    if not 0 < entities.num_persons <= 50:
+        return f"num_persons must be 1-50, got {entities.num_persons}"
+    try:
+        dt.date.fromisoformat(normalize_res_date(entities.res_date))
+        dt.time.fromisoformat(normalize_res_time(entities.res_time))
+    except ValueError:
+        return f"bad date/time {entities.res_date!r} {entities.res_time!r}"
+    return None
+
+
+def _validate_chunk(chunk: List[Tuple[int, Any]], report: ImportReport,
+                    sink: Optional[IO[str]]) -> List[Tuple[int, Entities, Any]]:
+    """Validates a chunk with one TypeAdapter call; only rows that fail are looked at one by one."""
+    lines, cleaned, originals = [], [], []
+    for line, row in chunk:
+        if isinstance(row, str):
+            report.reject(line, row, sink)
+        elif not isinstance(row, dict):
+            report.reject(line, "expected an object per line", sink)
+        else:
+            lines.append(line)
+            cleaned.append(_clean(row))
+            originals.append(row)
+
+    try:
+        models = _entities_list.validate_python(cleaned)
+        valid = list(zip(lines, models, originals))
+    except ValidationError as e:
+        problems: Dict[int, List[str]] = {}
+        for error in e.errors():
+            position, field = error["loc"][0], ".".join(str(part) for part in error["loc"][1:])
+            problems.setdefault(position, []).append(f"{field}: {error['msg']}")
+        for position, messages in problems.items():
+            report.reject(lines[position], "; ".join(messages), sink)
+        keep = [i for i in range(len(cleaned)) if i not in problems]
+        models = _entities_list.validate_python([cleaned[i] for i in keep])
+        valid = [(lines[i], model, originals[i]) for i, model in zip(keep, models)]
+
+    accepted = []
+    for line, entities, original in valid:
+        problem = _check(entities)
+        if problem:
+            report.reject(line, problem, sink)
+        else:
+            accepted.append((line, entities, original))
+    return accepted
+
+
+def _row_params(entities: Entities, original: Dict[str, Any], default_status: str) -> tuple:
+    return (
+        int(entities.reservation_id) if entities.reservation_id is not None else None,
+        entities.user_name,
+        entities.email_id,
+        entities.num_persons,
+        normalize_res_date(entities.res_date),
+        normalize_res_time(entities.res_time),
+        entities.reservation_type,
+        entities.status if "status" in original and original["status"] else default_status,
+        original.get("created_at") or dt.datetime.now().isoformat(),
+    )
+
+
+def _insert_chunk(rows: List[Tuple[int, tuple]], report: ImportReport, sink: Optional[IO[str]],
+                  check_capacity: bool) -> None:
+    """
+    Inserts one chunk in one transaction.
+
+    The fast path is a single executemany. If any row violates a constraint
+    (a reservation_id already taken, a status the CHECK refuses, ...) that
+    transaction is rolled back as a whole and the chunk is retried row by
+    row in a new one, so only the offending rows are rejected, each with its
+    line and the database's message. The retry costs one statement per row;
+    report.retried_chunks says how often it happened. With check_capacity
+    every chunk takes the row-by-row path, since each row must see the ones
+    inserted before it.
+    """
+    def insert_all(conn: sqlite3.Connection) -> None:
+        conn.executemany(BULK_INSERT_SQL, [params for _, params in rows])
+
+    def insert_each(conn: sqlite3.Connection) -> List[Tuple[int, str]]:
+        failures = []
+        for line, params in rows:
+            if check_capacity and params[7] != "cancelled" and \
+                    not slot_has_room(conn, params[4], params[5], params[3]):
+                failures.append((line, f"no table free for {params[3]} on {params[4]} at {params[5]}"))
+                continue
+            try:
+                conn.execute(BULK_INSERT_SQL, params)
+            except sqlite3.IntegrityError as e:
+                failures.append((line, f"rejected by the database: {e}"))
+        return failures
+
+    if not check_capacity:
+        try:
+            immediate_transaction(insert_all)
+            report.inserted += len(rows)
+            return
+        except sqlite3.IntegrityError:
+            report.retried_chunks += 1
+
+    failures = immediate_transaction(insert_each)
+    for line, message in failures:
+        report.reject(line, message, sink)
+    report.inserted += len(rows) - len(failures)
+
+
+def import_rows(rows: Iterable[Tuple[int, Any]], chunk_size: int = BULK_CHUNK_SIZE,
+                default_status: str = "confirmed", check_capacity: bool = False,
+                errors: Optional[IO[str]] = None) -> ImportReport:
+    """
+    Loads (line, row) pairs into reservations. Rows without a status are
+    imported as default_status; imported bookings carry no hold, so they do
+    not expire. With check_capacity, rows that would overbook a slot are
+    rejected (slower: the slot is re-checked for every row).
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            break
+        report.read += len(chunk)
+        report.chunks += 1
+        accepted = _validate_chunk(chunk, report, errors)
+        if accepted:
+            _insert_chunk(
+                [(line, _row_params(entities, original, default_status)) for line, entities, original in accepted],
+                report, errors, check_capacity,
+            )
+    get_index().invalidate()
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def import_file(path: str, fmt: Optional[str] = None, **options) -> ImportReport:
+    """import_rows for a CSV or JSONL file ("-" reads stdin); the format follows the extension unless given."""
+    fmt = _detect_format(path, fmt)
+    stream = sys.stdin if path == "-" else open(path, newline="" if fmt == "csv" else None, encoding="utf-8")
+    try:
+        return import_rows(read_rows(stream, fmt), **options)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def export_rows(start_date: Optional[str] = None, end_date: Optional[str] = None,
+                status: Optional[str] = None, batch_size: int = BULK_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Streams reservations as dicts, fetching batch_size rows at a time, ordered by reservation_id."""
+    clauses, params = [], []
+    if start_date:
+        clauses.append("res_date >= ?")
+        params.append(start_date)
+    if end_date:
+        clauses.append("res_date <= ?")
+        params.append(end_date)
+    if status:
+        clauses.append("status = ?")
+        params.append(status)
+    query = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM reservations"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY reservation_id"
+
+    with db_pool.connection() as conn:
+        cursor = conn.execute(query, params)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                return
+            for row in batch:
+                yield dict(zip(EXPORT_COLUMNS, row))
+
+
+def export_file(path: str, fmt: Optional[str] = None, **filters) -> int:
+    """Writes export_rows to a CSV or JSONL file ("-" writes stdout); returns the row count."""
+    fmt = _detect_format(path, fmt)
+    stream = sys.stdout if path == "-" else open(path, "w", newline="" if fmt == "csv" else None, encoding="utf-8")
+    count = 0
+    try:
+        if fmt == "csv":
+            writer = csv.DictWriter(stream, fieldnames=EXPORT_COLUMNS)
+            writer.writeheader()
+            for row in export_rows(**filters):
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in export_rows(**filters):
+                stream.write(json.dumps(row) + "\n")
+                count += 1
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    return count
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import / export of reservations (CSV or JSONL).")
+    parser.add_argument("--restaurant", default=DEFAULT_RESTAURANT_ID,
+                        help="restaurant whose shard to use (default: RESTAURANT_ID, else the main database)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load = commands.add_parser("import", help="load reservations from a file")
+    load.add_argument("path", help="CSV or JSONL file, or - for stdin")
+    load.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+    load.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE, help="rows per transaction")
+    load.add_argument("--status", default="confirmed", choices=["pending", "confirmed", "cancelled"],
+                      help="status for rows that have none")
+    load.add_argument("--check-capacity", action="store_true", help="reject rows that would overbook a slot")
+    load.add_argument("--errors", help="write every rejected row as JSONL here")
+
+    dump = commands.add_parser("export", help="write reservations to a file")
+    dump.add_argument("path", help="CSV or JSONL file, or - for stdout")
+    dump.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+    dump.add_argument("--from", dest="start_date", help="first res_date (YYYY-MM-DD)")
+    dump.add_argument("--to", dest="end_date", help="last res_date (YYYY-MM-DD)")
+    dump.add_argument("--status", choices=["pending", "confirmed", "cancelled"])
+    args = parser.parse_args(argv)
+
+    ensure_tenant(args.restaurant)
+    with tenant_scope(args.restaurant):
+        return _run(args)
+
+
+def _run(args: argparse.Namespace) -> int:
+    if args.command == "export":
+        started = time.perf_counter()
+        count = export_file(args.path, args.format, start_date=args.start_date, end_date=args.end_date,
+                            status=args.status)
+        elapsed = time.perf_counter() - started
+        print(f"[bulk_io] Exported {count} rows in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.0f} rows/s)",
+              file=sys.stderr)
+        return 0
+
+    errors = open(args.errors, "w", encoding="utf-8") if args.errors else None
+    try:
+        report = import_file(args.path, args.format, chunk_size=args.chunk_size, default_status=args.status,
+                             check_capacity=args.check_capacity, errors=errors)
+    finally:
+        if errors is not None:
+            errors.close()
+    print(f"[bulk_io] Read {report.read} rows in {report.seconds:.2f}s ({report.rows_per_second:.0f} rows/s): "
+          f"{report.inserted} inserted, {report.rejected} rejected", file=sys.stderr)
+    if report.retried_chunks:
+        print(f"[bulk_io] {report.retried_chunks} of {report.chunks} chunks hit a constraint and were "
+              f"inserted row by row", file=sys.stderr)
+    for line, message in report.errors[:10]:
+        print(f"  line {line}: {message}", file=sys.stderr)
+    return 1 if report.rejected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,15 @@
 import sqlite3
 from typing import Dict, Any, Union
 from pydantic_schemas import ReservationState
-from langsmith import traceable
-import datetime
-
-DB_PATH = "app\\database\\restaurant.db"
+from tracing import traceable
+import db_pool
+from booking import confirm_hold, reserve_slot
 
 @traceable(name="Confirm Reservation Node")
 def confirm_reservation_node(state: Union[Dict[str, Any], ReservationState]) -> Dict[str, Any]:
     """
-    Creates reservation if doesn't exist, then confirms it.
+    Creates reservation if doesn't exist, then confirms it. A hold that
+    lapsed is booked again if its time is still free.
     Returns updated state with confirmation message and reservation ID.
     """
     if isinstance(state, ReservationState):
@@ -26,97 +26,79 @@ def confirm_reservation_node(state: Union[Dict[str, Any], ReservationState]) ->
     entities = state_model.entities
     
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
         if not entities.reservation_id:
-            cursor.execute("""
-                INSERT INTO reservations (
-                    user_name, email_id, num_persons, 
-                    res_date, res_time, reservation_type, 
-                    status, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    entities.user_name,
-                    entities.email_id,
-                    entities.num_persons,
-                    entities.res_date,
-                    entities.res_time,
-                    entities.reservation_type,
-                    'pending',
-                    datetime.datetime.now().isoformat()
-                ))
-            reservation_id = str(cursor.lastrowid)
-            conn.commit()
-            
+            reservation_id = reserve_slot(entities)
+            if reservation_id is None:
+                return _error_response(state_model, "Sorry, that time was just booked by someone else. Could you pick another time?")
+
             updated_entities = entities.model_copy(update={"reservation_id": reservation_id})
             state_model = state_model.model_copy(update={"entities": updated_entities})
-        
-        cursor.execute("""
-            UPDATE reservations 
-            SET status = 'confirmed', 
-                updated_at = CURRENT_TIMESTAMP 
-            WHERE reservation_id = ?
-            AND status = 'pending'
-            """, (state_model.entities.reservation_id,))
-        
-        if cursor.rowcount == 0:
-            cursor.execute("SELECT status FROM reservations WHERE reservation_id = ?", 
-                         (state_model.entities.reservation_id,))
-            result = cursor.fetchone()
-            status = result[0] if result else "not found"
-            
-            msg = (f"Reservation {state_model.entities.reservation_id} "
-                  f"is already {status}" if result 
-                  else "Reservation not found")
+
+        outcome = confirm_hold(state_model.entities.reservation_id)
+        if outcome in ("not found", "expired") and entities.res_date and entities.res_time:
+            reservation_id = reserve_slot(entities)
+            if reservation_id is not None:
+                updated_entities = entities.model_copy(update={"reservation_id": reservation_id})
+                state_model = state_model.model_copy(update={"entities": updated_entities})
+                outcome = confirm_hold(reservation_id)
+            else:
+                outcome = "expired"
+
+        if outcome == "expired":
+            return _error_response(state_model, "Sorry, the hold on your table expired and that time has since been booked. Could you pick another time?")
+        if outcome != "confirmed":
+            msg = (f"Reservation {state_model.entities.reservation_id} is {outcome}"
+                   if outcome != "not found" else "Reservation not found")
             return _error_response(state_model, msg)
+
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
         
-        conn.commit()
-        
-        cursor.execute("""
-            SELECT user_name, res_date, res_time, num_persons 
-            FROM reservations 
-            WHERE reservation_id = ?
-            """, (state_model.entities.reservation_id,))
-        user_name, res_date, res_time, num_persons = cursor.fetchone()
+            cursor.execute("""
+                SELECT user_name, res_date, res_time, num_persons 
+                FROM reservations 
+                WHERE reservation_id = ?
+                """, (state_model.entities.reservation_id,))
+            user_name, res_date, res_time, num_persons = cursor.fetchone()
         
-        confirmation_msg = (
-            f"Reservation confirmed! 🎉\n"
-            f"• ID: {state_model.entities.reservation_id}\n"
-            f"• Name: {user_name}\n"
-            f"• Date: {res_date} at {res_time}\n"
-            f"• Party size: {num_persons}\n"
-            f"• Type: {entities.reservation_type}\n"
-            f"Confirmation sent to: {entities.email_id}"
-        )
+            confirmation_msg = (
+                f"Reservation confirmed! 🎉\n"
+                f"• ID: {state_model.entities.reservation_id}\n"
+                f"• Name: {user_name}\n"
+                f"• Date: {res_date} at {res_time}\n"
+                f"• Party size: {num_persons}\n"
+                f"• Type: {entities.reservation_type}\n"
+                f"Confirmation sent to: {entities.email_id}"
+            )
         
-        return _success_response(state_model, confirmation_msg)
+            return _success_response(state_model, confirmation_msg)
         
     except sqlite3.Error as e:
         return _error_response(state_model, f"Database error: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
+
+@traceable(name="Confirm Reservation Node (async)")
+async def aconfirm_reservation_node(state: Union[Dict[str, Any], ReservationState]) -> Dict[str, Any]:
+    return await db_pool.run_in_db_executor(confirm_reservation_node, state)
 
 def _success_response(state_model: ReservationState, message: str) -> Dict[str, Any]:
     """Helper for success responses"""
-    return state_model.model_copy(update={
+    return {
+        "entities": {"reservation_id": state_model.entities.reservation_id, "status": "confirmed"},
         "assistant_response": message,
         "chat_history": [
-            *state_model.chat_history,
             {"role": "user", "content": state_model.user_input},
             {"role": "assistant", "content": message}
         ]
-    }).model_dump()
+    }
 
 def _error_response(state_model: ReservationState, error_msg: str) -> Dict[str, Any]:
     """Helper for error responses"""
-    return state_model.model_copy(update={
+    return {
+        "entities": {"reservation_id": state_model.entities.reservation_id},
         "assistant_response": error_msg,
         "chat_history": [
-            *state_model.chat_history,
             {"role": "user", "content": state_model.user_input},
             {"role": "assistant", "content": error_msg}
         ],
         "error": True
-    }).model_dump()
\ No newline at end of file
+    }
\ No newline at end of file
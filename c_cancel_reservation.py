@@ -1,9 +1,10 @@
 import sqlite3
 from typing import Dict, Any, Union
 from pydantic_schemas import ReservationState
-from langsmith import traceable
+from tracing import traceable
+import db_pool
+from availability_index import release_booking
 
-DB_PATH = "app\\database\\restaurant.db"
 DEFAULT_DATE = "2000-01-01"
 DEFAULT_TIME = "00:00"
 
@@ -21,8 +22,7 @@ def cancel_reservation_node(state: Union[Dict[str, Any], ReservationState]) -> D
         except Exception as e:
             return {
                 "assistant_response": f"Error processing reservation: {str(e)}",
-                "error": True,
-                "chat_history": state.get("chat_history", []) if isinstance(state, dict) else []
+                "error": True
             }
 
     entities = state_model.entities
@@ -30,7 +30,6 @@ def cancel_reservation_node(state: Union[Dict[str, Any], ReservationState]) -> D
     if state_model.intent != "cancel_reservation":
         return {
             "assistant_response": "No cancellation request detected.",
-            "chat_history": state_model.chat_history,
             "error": True
         }
 
@@ -46,78 +45,77 @@ def cancel_reservation_node(state: Union[Dict[str, Any], ReservationState]) -> D
 
     if msg:
         return {
-            **state_model.model_dump(),
             "assistant_response": msg,
             "chat_history": [
-                *state_model.chat_history,
                 {"role": "user", "content": state_model.user_input},
                 {"role": "assistant", "content": msg}
             ]
         }
 
-    conn = None
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT user_name, res_date, res_time, status, email_id 
-            FROM reservations 
-            WHERE reservation_id = ?
-        """, (str(reservation_id),)) 
-
-        row = cursor.fetchone()
-
-        if not row:
-            response = f"No reservation found with ID {reservation_id}."
-        else:
-            user_name, res_date, res_time, status, db_email = row
-
-            if db_email.lower() != email_id.lower():
-                response = "The provided email does not match our records."
-            elif status == "cancelled":
-                response = f"Reservation ID {reservation_id} is already cancelled."
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT user_name, res_date, res_time, status, email_id 
+                FROM reservations 
+                WHERE reservation_id = ?
+            """, (str(reservation_id),)) 
+
+            row = cursor.fetchone()
+            cancelled = False
+
+            if not row:
+                response = f"No reservation found with ID {reservation_id}."
             else:
-                cursor.execute("""
-                    UPDATE reservations 
-                    SET status = 'cancelled',
-                        res_date = ?,
-                        res_time = ?,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE reservation_id = ? AND email_id = ?
-                """, (DEFAULT_DATE, DEFAULT_TIME, str(reservation_id), email_id))
-                conn.commit()
-
-                response = (
-                    f"Reservation ID {reservation_id} for {user_name} has been cancelled.\n"
-                    f"Thank you for using our services."
-                )
+                user_name, res_date, res_time, status, db_email = row
+
+                if db_email.lower() != email_id.lower():
+                    response = "The provided email does not match our records."
+                elif status == "cancelled":
+                    response = f"Reservation ID {reservation_id} is already cancelled."
+                else:
+                    cursor.execute("""
+                        UPDATE reservations 
+                        SET status = 'cancelled',
+                            res_date = ?,
+                            res_time = ?,
+                            updated_at = CURRENT_TIMESTAMP
+                        WHERE reservation_id = ? AND email_id = ?
+                    """, (DEFAULT_DATE, DEFAULT_TIME, str(reservation_id), email_id))
+                    conn.commit()
+                    release_booking(reservation_id, res_date, res_time)
+
+                    response = (
+                        f"Reservation ID {reservation_id} for {user_name} has been cancelled.\n"
+                        f"Thank you for using our services."
+                    )
+                    cancelled = True
 
-        return {
-            **state_model.model_dump(),
-            "assistant_response": response,
-            "chat_history": [
-                *state_model.chat_history,
-                {"role": "user", "content": state_model.user_input},
-                {"role": "assistant", "content": response}
-            ]
-        }
+            return {
+                "entities": {"status": "cancelled"} if cancelled else {},
+                "assistant_response": response,
+                "chat_history": [
+                    {"role": "user", "content": state_model.user_input},
+                    {"role": "assistant", "content": response}
+                ]
+            }
 
     except sqlite3.Error as e:
         error_msg = f"Database error: {str(e)}"
     except Exception as e:
         error_msg = f"Unexpected error: {str(e)}"
-    finally:
-        if conn:
-            conn.close()
 
     return {
-        **state_model.model_dump(),
         "assistant_response": error_msg,
         "chat_history": [
-            *state_model.chat_history,
             {"role": "user", "content": state_model.user_input},
             {"role": "assistant", "content": error_msg}
         ],
         "error": True
-    }
\ No newline at end of file
+    }
+
+
+@traceable(name="Cancel Reservation Node (async)")
+async def acancel_reservation_node(state: Union[Dict[str, Any], ReservationState]) -> Dict[str, Any]:
+    return await db_pool.run_in_db_executor(cancel_reservation_node, state)
\ No newline at end of file
@@ -0,0 +1,384 @@
+# checkpointing.py
+import os
+import random
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+import db_pool
+
+# "sqlite" (default), "memory" (single process, lost on restart) or "none".
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite")
+# Kept apart from restaurant.db so conversation state can live on shared storage on its own.
+CHECKPOINT_DB_PATH = os.getenv(
+    "CHECKPOINT_DB_PATH",
+    os.path.join(os.path.dirname(db_pool.DB_PATH), "checkpoints.db"),
+)
+# "exit" writes one checkpoint per turn; "async" / "sync" also checkpoint after every node.
+CHECKPOINT_DURABILITY = os.getenv("CHECKPOINT_DURABILITY", "exit")
+
+# State types restored from checkpoints; anything else is refused on load.
+ALLOWED_STATE_TYPES = [("pydantic_schemas", "Entities"), ("pydantic_schemas", "ReservationState")]
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS checkpoints (
+        thread_id TEXT NOT NULL,
+        checkpoint_ns TEXT NOT NULL DEFAULT '',
+        checkpoint_id TEXT NOT NULL,
+        parent_checkpoint_id TEXT,
+        type TEXT,
+        checkpoint BLOB,
+        metadata_type TEXT,
+        metadata BLOB,
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS checkpoint_blobs (
+        thread_id TEXT NOT NULL,
+        checkpoint_ns TEXT NOT NULL DEFAULT '',
+        channel TEXT NOT NULL,
+        version TEXT NOT NULL,
+        type TEXT NOT NULL,
+        blob BLOB,
+        PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS checkpoint_writes (
+        thread_id TEXT NOT NULL,
+        checkpoint_ns TEXT NOT NULL DEFAULT '',
+        checkpoint_id TEXT NOT NULL,
+        task_id TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        channel TEXT NOT NULL,
+        type TEXT,
+        blob BLOB,
+        task_path TEXT NOT NULL DEFAULT '',
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+    )
+    """,
+)
+
+
+def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not checkpoint_id:
+        return None
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    LangGraph checkpoint saver on a local SQLite file (WAL), so every worker
+    on the host can resume any thread. Same layout as InMemorySaver: the
+    checkpoint row holds only channel versions, and each channel value is
+    stored once per version, so a turn only writes the channels it changed.
+    Channels declared as DeltaChannel (chat_history) store just the turn's
+    writes and are rebuilt from them on load.
+
+    Nothing is read until a thread is resumed. The async methods run the
+    same queries on the DB executor.
+    """
+
+    def __init__(self, db_path: str = CHECKPOINT_DB_PATH, *, serde=None):
+        super().__init__(serde=serde or JsonPlusSerializer(allowed_msgpack_modules=ALLOWED_STATE_TYPES))
+        self.db_path = db_path
+        self._pool = db_pool.ConnectionPool(db_path)
+        self._setup_lock = threading.Lock()
+        self._ready = False
+
+    def _connection(self):
+        if not self._ready:
+            with self._setup_lock:
+                if not self._ready:
+                    with self._pool.connection() as conn:
+                        for statement in SCHEMA:
+                            conn.execute(statement)
+                        conn.commit()
+                    self._ready = True
+        return self._pool.connection()
+
+    # -- reads ---------------------------------------------------------------
+
+    def _load_blobs(self, conn, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> Dict[str, Any]:
+        values = {}
+        for channel, version in versions.items():
+            row = conn.execute(
+                "SELECT type, blob FROM checkpoint_blobs"
+                " WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if row is not None and row[0] != "empty":
+                values[channel] = self.serde.loads_typed((row[0], row[1]))
+        return values
+
+    def _load_writes(self, conn, thread_id: str, checkpoint_ns: str, checkpoint_id: str,
+                     channels: Optional[Sequence[str]] = None) -> List[Tuple[str, str, Any]]:
+        rows = conn.execute(
+            "SELECT task_id, idx, channel, type, blob, task_path FROM checkpoint_writes"
+            " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        rows.sort(key=lambda row: writes_sort_key(row[5], row[0], row[1]))
+        return [
+            (task_id, channel, self.serde.loads_typed((kind, blob)))
+            for task_id, _, channel, kind, blob, _ in rows
+            if channels is None or channel in channels
+        ]
+
+    def _tuple(self, conn, thread_id: str, checkpoint_ns: str, row) -> CheckpointTuple:
+        checkpoint_id, parent_id, kind, blob, metadata_kind, metadata_blob = row
+        checkpoint = self.serde.loads_typed((kind, blob))
+        return CheckpointTuple(
+            config=_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_blobs(conn, thread_id, checkpoint_ns, checkpoint["channel_versions"]),
+            },
+            metadata=self.serde.loads_typed((metadata_kind, metadata_blob)),
+            parent_config=_config(thread_id, checkpoint_ns, parent_id),
+            pending_writes=self._load_writes(conn, thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        columns = "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        with self._connection() as conn:
+            if checkpoint_id:
+                row = conn.execute(
+                    f"SELECT {columns} FROM checkpoints"
+                    " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+                    " ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            if row is None:
+                return None
+            return self._tuple(conn, thread_id, checkpoint_ns, row)
+
+    def list(self, config, *, filter: Optional[Dict[str, Any]] = None, before=None,
+             limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint,"
+                 " metadata_type, metadata FROM checkpoints")
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+            for thread_id, checkpoint_ns, *row in rows:
+                if limit is not None and limit <= 0:
+                    break
+                if filter:
+                    metadata = self.serde.loads_typed((row[4], row[5]))
+                    if not all(metadata.get(key) == value for key, value in filter.items()):
+                        continue
+                if limit is not None:
+                    limit -= 1
+                yield self._tuple(conn, thread_id, checkpoint_ns, row)
+
+    def get_delta_channel_history(self, *, config, channels: Sequence[str]) -> Mapping[str, Dict[str, Any]]:
+        """
+        Walks the parent chain once for all channels. Each channel stops at
+        the nearest ancestor holding a stored value (its seed); the writes of
+        the ancestors on the way are replayed on top of it.
+        """
+        if not channels:
+            return {}
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        collected: Dict[str, list] = {channel: [] for channel in channels}
+        seeds: Dict[str, Any] = {}
+        remaining = set(channels)
+
+        with self._connection() as conn:
+            checkpoint_id = get_checkpoint_id(config)
+            if checkpoint_id:
+                row = conn.execute(
+                    "SELECT parent_checkpoint_id FROM checkpoints"
+                    " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = conn.execute(
+                    "SELECT parent_checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+                    " ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            current = row[0] if row else None
+
+            while current is not None and remaining:
+                row = conn.execute(
+                    "SELECT parent_checkpoint_id, type, checkpoint FROM checkpoints"
+                    " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, current),
+                ).fetchone()
+                if row is None:
+                    break
+                parent_id, kind, blob = row
+                versions = self.serde.loads_typed((kind, blob)).get("channel_versions", {})
+                stored = self._load_blobs(
+                    conn, thread_id, checkpoint_ns,
+                    {channel: versions[channel] for channel in remaining if channel in versions},
+                )
+                for write in reversed(self._load_writes(conn, thread_id, checkpoint_ns, current, remaining)):
+                    collected[write[1]].append(write)
+                for channel, value in stored.items():
+                    seeds[channel] = value
+                    remaining.discard(channel)
+                current = parent_id
+
+        history = {}
+        for channel in channels:
+            entry: Dict[str, Any] = {"writes": list(reversed(collected[channel]))}
+            if channel in seeds:
+                entry["seed"] = seeds[channel]
+            history[channel] = entry
+        return history
+
+    # -- writes --------------------------------------------------------------
+
+    def put(self, config, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> Dict[str, Any]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        stored = checkpoint.copy()
+        values = stored.pop("channel_values")
+        kind, blob = self.serde.dumps_typed(stored)
+        metadata_kind, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        blobs = []
+        for channel, version in new_versions.items():
+            value_kind, value_blob = self.serde.dumps_typed(values[channel]) if channel in values else ("empty", b"")
+            blobs.append((thread_id, checkpoint_ns, channel, str(version), value_kind, value_blob))
+
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO checkpoint_blobs (thread_id, checkpoint_ns, channel, version, type, blob)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                blobs,
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,"
+                " type, checkpoint, metadata_type, metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 kind, blob, metadata_kind, metadata_blob),
+            )
+            conn.commit()
+        return _config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            kind, blob = self.serde.dumps_typed(value)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+                         channel, kind, blob, task_path))
+        # Special writes (errors, interrupts) replace earlier ones; regular writes are kept once.
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        with self._connection() as conn:
+            conn.executemany(
+                f"{verb} INTO checkpoint_writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx,"
+                " channel, type, blob, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._connection() as conn:
+            for table in ("checkpoints", "checkpoint_blobs", "checkpoint_writes"):
+                conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            conn.commit()
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # -- async: same work on the DB executor ----------------------------------
+
+    async def aget_tuple(self, config) -> Optional[CheckpointTuple]:
+        return await db_pool.run_in_db_executor(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator[CheckpointTuple]:
+        items = await db_pool.run_in_db_executor(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aget_delta_channel_history(self, *, config, channels: Sequence[str]):
+        return await db_pool.run_in_db_executor(
+            lambda: self.get_delta_channel_history(config=config, channels=channels)
+        )
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await db_pool.run_in_db_executor(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id: str, task_path: str = "") -> None:
+        return await db_pool.run_in_db_executor(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await db_pool.run_in_db_executor(self.delete_thread, thread_id)
+
+
+_checkpointer = None
+_checkpointer_lock = threading.Lock()
+
+
+def get_checkpointer(backend: str = CHECKPOINT_BACKEND) -> Optional[BaseCheckpointSaver]:
+    """The process-wide saver for CHECKPOINT_BACKEND, or None when checkpointing is off."""
+    global _checkpointer
+    if backend == "none":
+        return None
+    if _checkpointer is None:
+        with _checkpointer_lock:
+            if _checkpointer is None:
+                if backend == "memory":
+                    _checkpointer = InMemorySaver(serde=JsonPlusSerializer(allowed_msgpack_modules=ALLOWED_STATE_TYPES))
+                else:
+                    _checkpointer = SQLiteCheckpointSaver()
+    return _checkpointer
+
+
+def thread_config(thread_id: str, **configurable) -> Dict[str, Any]:
+    """Run config for a conversation: pass it with durability=CHECKPOINT_DURABILITY."""
+    return {"configurable": {"thread_id": str(thread_id), **configurable}}
@@ -1,25 +1,71 @@
-from langgraph.graph import StateGraph, END
-from a_extract_intent import extract_intent
-from b_check_availibility import check_availability_node
-from c_accept_reservation import confirm_reservation_node
-from c_cancel_reservation import cancel_reservation_node
-from c_modify_reservation import modify_reservation_node
-from c_create_reservation import create_reservation_node 
-from a_track_entities import track_entities
+import logging
+import threading
+from typing import Callable, Dict, Optional
 from pydantic_schemas import ReservationState
-from langsmith import traceable
+from tracing import traceable
+from tenancy import tenant_node
+import metrics
+
+# Nothing heavy happens at import: the node modules (and with them the
+# OpenAI client) and langgraph.graph are loaded when a graph is first built,
+# and each graph is compiled once per process by get_app / get_session_app.
+
+logger = logging.getLogger("reservation_flow")
+
+NODE_NAMES = (
+    "extract_intent",
+    "track_entities",
+    "check_availability",
+    "create_reservation",
+    "confirm_reservation",
+    "modify_reservation",
+    "cancel_reservation",
+)
+
+
+def _node_functions(use_async: bool = False) -> Dict[str, Callable]:
+    """Node name -> callable, importing the node modules on first call."""
+    from a_extract_intent import extract_intent, aextract_intent
+    from a_track_entities import track_entities, atrack_entities
+    from b_check_availibility import check_availability_node, acheck_availability_node
+    from c_accept_reservation import confirm_reservation_node, aconfirm_reservation_node
+    from c_cancel_reservation import cancel_reservation_node, acancel_reservation_node
+    from c_create_reservation import create_reservation_node, acreate_reservation_node
+    from c_modify_reservation import modify_reservation_node, amodify_reservation_node
+
+    if use_async:
+        nodes = (aextract_intent, atrack_entities, acheck_availability_node, acreate_reservation_node,
+                 aconfirm_reservation_node, amodify_reservation_node, acancel_reservation_node)
+    else:
+        nodes = (extract_intent, track_entities, check_availability_node, create_reservation_node,
+                 confirm_reservation_node, modify_reservation_node, cancel_reservation_node)
+    return dict(zip(NODE_NAMES, nodes))
 
 @traceable(name="Reservation Flow")
-def build_reservation_graph():
+def build_reservation_graph(use_async: bool = False, wrap_node: Optional[Callable] = None, checkpointer=None):
+    """
+    Compiles the reservation graph. With use_async=True every node is a
+    coroutine (async LLM client, DB work on the DB executor), so the compiled
+    graph is meant to be driven with ainvoke / astream.
+
+    Every node runs against the shard of the state's restaurant_id (see
+    tenancy.py). Unless METRICS_ENABLED=0, every node is timed into the
+    metrics registry. wrap_node(name, node), if given, is applied on top and
+    returns the callable registered for each node.
+
+    With a checkpointer, runs need config={"configurable": {"thread_id": ...}}
+    and callers pass only the new input; the rest of the state is restored
+    from the thread's last checkpoint.
+    """
+    from langgraph.graph import StateGraph, END
+
     builder = StateGraph(ReservationState)
 
-    builder.add_node("extract_intent", extract_intent)
-    builder.add_node("track_entities", track_entities)
-    builder.add_node("check_availability", check_availability_node)
-    builder.add_node("create_reservation", create_reservation_node)  
-    builder.add_node("confirm_reservation", confirm_reservation_node)
-    builder.add_node("modify_reservation", modify_reservation_node)
-    builder.add_node("cancel_reservation", cancel_reservation_node)
+    for name, node in _node_functions(use_async).items():
+        node = tenant_node(node)
+        if metrics.registry.enabled:
+            node = metrics.timed_node(name, node)
+        builder.add_node(name, wrap_node(name, node) if wrap_node else node)
 
     builder.set_entry_point("extract_intent")
     
@@ -57,7 +103,7 @@ def build_reservation_graph():
         return END
 
     def route_after_availability(state: ReservationState) -> str:
-        print(f"[ROUTING DEBUG] is_available: {state.is_available}")
+        logger.debug("route_after_availability: is_available=%s", state.is_available)
         if not state.is_available:
             return END
         if state.entities.reservation_id:
@@ -88,12 +134,20 @@ def build_reservation_graph():
     
 
 
-    builder.add_edge("create_reservation", "confirm_reservation")
+    def route_after_create(state: ReservationState) -> str:
+        # No ID means the slot was taken between the check and the insert.
+        return "confirm_reservation" if state.entities.reservation_id else END
+
+    builder.add_conditional_edges(
+        "create_reservation",
+        route_after_create,
+        {"confirm_reservation": "confirm_reservation", END: END}
+    )
     builder.add_edge("confirm_reservation", END)
     builder.add_edge("modify_reservation", END)
     builder.add_edge("cancel_reservation", END)
 
-    return builder.compile()
+    return builder.compile(checkpointer=checkpointer)
 
 def _has_complete_reservation_details(state: ReservationState) -> bool:
     """Check if all required reservation fields are present"""
@@ -122,4 +176,33 @@ def _route_cancellation(state: ReservationState) -> str:
         return "extract_intent"
     return "cancel_reservation"
 
-app = build_reservation_graph()
\ No newline at end of file
+_apps = {}
+_apps_lock = threading.Lock()
+
+def _cached_app(key, build: Callable):
+    app = _apps.get(key)
+    if app is None:
+        with _apps_lock:
+            app = _apps.get(key)
+            if app is None:
+                app = _apps[key] = build()
+    return app
+
+def get_app(use_async: bool = False):
+    """The graph without a checkpointer, compiled on first use and shared by the process."""
+    return _cached_app(("app", use_async), lambda: build_reservation_graph(use_async=use_async))
+
+def get_session_app(use_async: bool = False):
+    """The graph compiled with the process-wide checkpointer (see checkpointing.py)."""
+    def build():
+        from checkpointing import get_checkpointer
+        return build_reservation_graph(use_async=use_async, checkpointer=get_checkpointer())
+    return _cached_app(("session", use_async), build)
+
+def __getattr__(name: str):
+    # `from d_reservation_flow import app` keeps working; the graph is compiled on that first access.
+    if name == "app":
+        return get_app()
+    if name == "async_app":
+        return get_app(use_async=True)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -1,10 +1,15 @@
 # db_init.py (database)
-import sqlite3
-
-DB_PATH = r"D:\demo\app\database\restaurant.db"
+from db_pool import DB_PATH, connection
+from db_migrations import check_query_plans, current_version, migrate
 
 def initialize_database():
-    conn = sqlite3.connect(DB_PATH)
+    """Creates missing tables, then brings the schema up to the latest migration."""
+    with connection() as conn:
+        _create_tables(conn)
+        conn.commit()
+        migrate(conn)
+
+def _create_tables(conn):
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -54,4 +59,6 @@ def initialize_database():
 
 if __name__ == "__main__":
     initialize_database()
-    print("Database initialized using app\database\db_init.py")
\ No newline at end of file
+    with connection() as conn:
+        check_query_plans(conn)
+        print(f"Database initialized at {DB_PATH} (schema version {current_version(conn)})")
\ No newline at end of file
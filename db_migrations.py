@@ -0,0 +1,239 @@
+# db_migrations.py (database)
+import datetime as dt
+import sqlite3
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Reservations are stored as "YYYY-MM-DD" and "HH:MM" so that plain string
+# comparison orders them chronologically and index range scans work.
+
+
+def normalize_res_date(res_date: Optional[str]) -> Optional[str]:
+    """Zero-pads "2025-7-4" style dates to "2025-07-04"; unparseable values are kept as-is."""
+    if not res_date:
+        return res_date
+    text = str(res_date).strip()
+    try:
+        year, month, day = (int(part) for part in text[:10].split("-"))
+        return dt.date(year, month, day).isoformat()
+    except ValueError:
+        return text
+
+
+def normalize_res_time(res_time: Optional[str]) -> Optional[str]:
+    """Turns "19:00:00" / "7:30" into "19:00" / "07:30"; unparseable values are kept as-is."""
+    if not res_time:
+        return res_time
+    text = str(res_time).strip()
+    parts = text.split(":")
+    try:
+        hour, minute = int(parts[0]), int(parts[1])
+    except (IndexError, ValueError):
+        return text
+    if 0 <= hour < 24 and 0 <= minute < 60:
+        return f"{hour:02d}:{minute:02d}"
+    return text
+
+
+def _add_indexes(conn: sqlite3.Connection) -> None:
+    # Covers the per-date availability read (res_date = ? AND status != 'cancelled')
+    # without touching the table: reservation_id is the rowid, so it rides along.
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reservations_slot
+            ON reservations (res_date, res_time, status, num_persons)
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reservations_email ON reservations (email_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_interaction_logs_timestamp ON interaction_logs (timestamp)")
+
+
+def _normalize_dates(conn: sqlite3.Connection) -> None:
+    conn.create_function("normalize_res_date", 1, normalize_res_date, deterministic=True)
+    conn.create_function("normalize_res_time", 1, normalize_res_time, deterministic=True)
+    conn.execute("""
+        UPDATE reservations
+            SET res_date = normalize_res_date(res_date),
+                res_time = normalize_res_time(res_time)
+            WHERE res_date IS NOT normalize_res_date(res_date)
+            OR res_time IS NOT normalize_res_time(res_time)
+    """)
+
+
+def _add_hold_expiry(conn: sqlite3.Connection) -> None:
+    # Pending rows are holds that lapse at hold_expires_at (UTC, CURRENT_TIMESTAMP format).
+    # The slot index gains the column so availability reads stay covering.
+    conn.execute("ALTER TABLE reservations ADD COLUMN hold_expires_at TEXT")
+    conn.execute("DROP INDEX IF EXISTS idx_reservations_slot")
+    conn.execute("""
+        CREATE INDEX idx_reservations_slot
+            ON reservations (res_date, res_time, status, num_persons, hold_expires_at)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reservations_hold_expiry
+            ON reservations (hold_expires_at) WHERE status = 'pending'
+    """)
+
+
+def _add_slot_summaries(conn: sqlite3.Connection) -> None:
+    # Bookings and covers per (date, hourly slot), kept current by triggers on
+    # every write to reservations, so a calendar over many days is one range
+    # read. held_covers is the part still pending, which may yet expire.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS slot_summaries (
+            res_date TEXT NOT NULL,
+            res_time TEXT NOT NULL,
+            bookings INTEGER NOT NULL DEFAULT 0,
+            covers INTEGER NOT NULL DEFAULT 0,
+            held_covers INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (res_date, res_time)
+        ) WITHOUT ROWID
+    """)
+    add = """
+        INSERT INTO slot_summaries (res_date, res_time, bookings, covers, held_covers)
+            VALUES (NEW.res_date, substr(NEW.res_time, 1, 2) || ':00', 1, COALESCE(NEW.num_persons, 1),
+                    CASE WHEN NEW.status = 'pending' THEN COALESCE(NEW.num_persons, 1) ELSE 0 END)
+            ON CONFLICT (res_date, res_time) DO UPDATE SET
+                bookings = bookings + 1,
+                covers = covers + excluded.covers,
+                held_covers = held_covers + excluded.held_covers;
+    """
+    remove = """
+        UPDATE slot_summaries SET
+                bookings = bookings - 1,
+                covers = covers - COALESCE(OLD.num_persons, 1),
+                held_covers = held_covers - CASE WHEN OLD.status = 'pending' THEN COALESCE(OLD.num_persons, 1) ELSE 0 END
+            WHERE res_date = OLD.res_date AND res_time = substr(OLD.res_time, 1, 2) || ':00';
+        DELETE FROM slot_summaries
+            WHERE res_date = OLD.res_date AND res_time = substr(OLD.res_time, 1, 2) || ':00' AND bookings <= 0;
+    """
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_slot_summaries_insert AFTER INSERT ON reservations
+        WHEN NEW.status != 'cancelled' AND NEW.res_date IS NOT NULL AND NEW.res_time IS NOT NULL
+        BEGIN {add} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_slot_summaries_delete AFTER DELETE ON reservations
+        WHEN OLD.status != 'cancelled' AND OLD.res_date IS NOT NULL AND OLD.res_time IS NOT NULL
+        BEGIN {remove} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_slot_summaries_remove AFTER UPDATE OF res_date, res_time, num_persons, status
+            ON reservations
+        WHEN OLD.status != 'cancelled' AND OLD.res_date IS NOT NULL AND OLD.res_time IS NOT NULL
+        BEGIN {remove} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_slot_summaries_add AFTER UPDATE OF res_date, res_time, num_persons, status
+            ON reservations
+        WHEN NEW.status != 'cancelled' AND NEW.res_date IS NOT NULL AND NEW.res_time IS NOT NULL
+        BEGIN {add} END
+    """)
+    conn.execute("DELETE FROM slot_summaries")
+    conn.execute("""
+        INSERT INTO slot_summaries (res_date, res_time, bookings, covers, held_covers)
+            SELECT res_date, substr(res_time, 1, 2) || ':00', COUNT(*), SUM(COALESCE(num_persons, 1)),
+                   SUM(CASE WHEN status = 'pending' THEN COALESCE(num_persons, 1) ELSE 0 END)
+                FROM reservations
+                WHERE status != 'cancelled' AND res_date IS NOT NULL AND res_time IS NOT NULL
+                GROUP BY 1, 2
+    """)
+
+
+# (user_version, description, step). Append only; never renumber a shipped step.
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "index reservations by slot and email, interaction_logs by timestamp", _add_indexes),
+    (2, "store res_date as YYYY-MM-DD and res_time as HH:MM", _normalize_dates),
+    (3, "expire pending reservations at hold_expires_at", _add_hold_expiry),
+    (4, "per-day slot summaries maintained by triggers", _add_slot_summaries),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, target: int = LATEST_VERSION) -> int:
+    """
+    Applies every pending step up to target, each in its own transaction
+    together with the PRAGMA user_version bump, so an interrupted run resumes
+    where it stopped. Returns the resulting version.
+    """
+    version = current_version(conn)
+    for step_version, description, step in MIGRATIONS:
+        if step_version <= version or step_version > target:
+            continue
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {int(step_version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"[db_migrations] Applied {step_version}: {description}")
+        version = step_version
+    return version
+
+
+# Hot queries and the index each one must use.
+EXPECTED_PLANS: Dict[str, Tuple[str, tuple, str]] = {
+    "availability by date": (
+        "SELECT reservation_id, res_time, num_persons, hold_expires_at FROM reservations"
+        " WHERE res_date = ? AND status != 'cancelled' AND (hold_expires_at IS NULL OR hold_expires_at > ?)",
+        ("2025-01-01", "2025-01-01 00:00:00"),
+        "COVERING INDEX idx_reservations_slot",
+    ),
+    "slot lookup": (
+        "SELECT COUNT(*) FROM reservations WHERE res_date = ? AND res_time = ? AND status != 'cancelled'",
+        ("2025-01-01", "19:00"),
+        "COVERING INDEX idx_reservations_slot",
+    ),
+    "booking slot check": (
+        "SELECT reservation_id, res_time, num_persons FROM reservations"
+        " WHERE res_date = ? AND res_time >= ? AND res_time < ? AND status != 'cancelled'"
+        " AND (hold_expires_at IS NULL OR hold_expires_at > ?)",
+        ("2025-01-01", "19:00", "20:00", "2025-01-01 00:00:00"),
+        "COVERING INDEX idx_reservations_slot",
+    ),
+    "expired holds": (
+        "SELECT reservation_id, res_date, res_time FROM reservations"
+        " WHERE status = 'pending' AND hold_expires_at <= ?",
+        ("2025-01-01 00:00:00",),
+        "idx_reservations_hold_expiry",
+    ),
+    "calendar summaries": (
+        "SELECT res_date, res_time, bookings, covers, held_covers FROM slot_summaries"
+        " WHERE res_date BETWEEN ? AND ?",
+        ("2025-01-01", "2025-01-07"),
+        "PRIMARY KEY",
+    ),
+    "reservations by email": (
+        "SELECT reservation_id FROM reservations WHERE email_id = ?",
+        ("guest@example.com",),
+        "idx_reservations_email",
+    ),
+    "logs by time range": (
+        "SELECT log_id FROM interaction_logs WHERE timestamp >= ? AND timestamp < ?",
+        ("2025-01-01 00:00:00", "2025-01-02 00:00:00"),
+        "idx_interaction_logs_timestamp",
+    ),
+}
+
+
+def query_plans(conn: sqlite3.Connection) -> Dict[str, str]:
+    """{query name: EXPLAIN QUERY PLAN details} for the queries in EXPECTED_PLANS."""
+    plans = {}
+    for name, (sql, params, _) in EXPECTED_PLANS.items():
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        plans[name] = " | ".join(row[-1] for row in rows)
+    return plans
+
+
+def check_query_plans(conn: sqlite3.Connection) -> None:
+    """Raises AssertionError if a hot query stopped using its index."""
+    for name, plan in query_plans(conn).items():
+        expected = EXPECTED_PLANS[name][2]
+        if expected not in plan:
+            raise AssertionError(f"{name}: expected {expected}, got {plan}")
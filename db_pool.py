@@ -0,0 +1,172 @@
+# db_pool.py (database)
+import asyncio
+import contextvars
+import functools
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import metrics
+from tenancy import current_tenant, shard_path
+
+DB_PATH = os.getenv(
+    "RESTAURANT_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "restaurant.db"),
+)
+
+# Number of compiled statements sqlite3 keeps per connection. The nodes run a
+# small, fixed set of queries, so they are prepared once per thread and reused.
+STATEMENT_CACHE_SIZE = 128
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -8000",
+)
+
+# Threads available to async callers for blocking DB work. Each thread keeps its
+# own pooled connection, so this also bounds the connections async code opens.
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "8"))
+
+
+def _count_statement(statement: str) -> None:
+    metrics.inc("db_queries_total")
+
+
+class ConnectionPool:
+    """
+    Process-wide pool handing out one long-lived SQLite connection per thread.
+    Connections are opened lazily, tuned once and closed together on shutdown.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = set()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=5.0,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        if metrics.registry.enabled:
+            conn.set_trace_callback(_count_statement)
+        with self._lock:
+            self._connections.add(conn)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Yields this thread's connection. Work left uncommitted when the block
+        exits (early return or exception) is rolled back, as closing a
+        short-lived connection used to do.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+
+    def close_all(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+class ShardRouter:
+    """
+    One ConnectionPool per restaurant shard (see tenancy.py), opened on first
+    use. Each shard is its own SQLite file, so a busy restaurant's write lock
+    never blocks another's, and adding restaurants adds files, not contention.
+    """
+
+    def __init__(self, default_path: str = DB_PATH):
+        self.default_path = default_path
+        self._pools: Dict[Optional[str], ConnectionPool] = {}
+        self._lock = threading.Lock()
+
+    def pool(self, restaurant_id: Optional[str] = None) -> ConnectionPool:
+        pool = self._pools.get(restaurant_id)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(restaurant_id)
+                if pool is None:
+                    pool = self._pools[restaurant_id] = ConnectionPool(shard_path(restaurant_id, self.default_path))
+        return pool
+
+    def tenants(self) -> List[Optional[str]]:
+        """Restaurants whose shard this process has opened (None is the default database)."""
+        with self._lock:
+            return list(self._pools)
+
+    def close_all(self) -> None:
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close_all()
+
+
+router = ShardRouter()
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """The pool of the current restaurant's shard."""
+    return router.pool(current_tenant())
+
+
+def connection():
+    """Shortcut for ``get_pool().connection()``."""
+    return get_pool().connection()
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _pool_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+    return _executor
+
+
+async def run_in_db_executor(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Runs a blocking DB call on the DB executor without blocking the event loop.
+    Context variables (tracing, graph config) are carried over like asyncio.to_thread.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_db_executor(), call)
+
+
+def close_pool() -> None:
+    router.close_all()
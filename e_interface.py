@@ -1,14 +1,121 @@
+import json
+import os
+import uuid
+from typing import Optional
+
+import httpx
 import streamlit as st
 from pydantic_schemas import ReservationState
-from d_reservation_flow import app
+from d_reservation_flow import get_session_app
+from checkpointing import CHECKPOINT_DURABILITY, thread_config
+from tenancy import DEFAULT_RESTAURANT_ID
+
+# When set (e.g. http://localhost:8000), the UI is a client of e_server.py instead of running the graph itself.
+API_URL = os.getenv("RESERVATION_API_URL", "").rstrip("/")
+# The UI serves one location: RESTAURANT_ID, or the default database when unset.
+if API_URL and DEFAULT_RESTAURANT_ID:
+    API_URL = f"{API_URL}/restaurants/{DEFAULT_RESTAURANT_ID}"
+
+def _thread_id() -> str:
+    """
+    The conversation's checkpoint thread. It lives in the URL, so a reload or
+    a request served by another worker resumes the same conversation.
+    """
+    if "thread_id" not in st.session_state:
+        st.session_state.thread_id = st.query_params.get("thread") or _new_thread_id()
+    st.query_params["thread"] = st.session_state.thread_id
+    return st.session_state.thread_id
+
+def _new_thread_id() -> str:
+    """A new conversation; the server only accepts session IDs it issued itself."""
+    if API_URL:
+        response = httpx.post(f"{API_URL}/sessions")
+        response.raise_for_status()
+        return response.json()["session_id"]
+    return str(uuid.uuid4())
+
+def _restore_state(thread_id: str) -> ReservationState:
+    """Loads the thread's last checkpoint and rebuilds the on-screen history from it."""
+    if API_URL:
+        response = httpx.get(f"{API_URL}/sessions/{thread_id}")
+        values = response.json() if response.status_code == 200 else {}
+        if not values:  # not started yet, or an ID this server never issued
+            st.session_state.thread_id = _new_thread_id()
+            st.query_params["thread"] = st.session_state.thread_id
+    else:
+        values = get_session_app().get_state(thread_config(thread_id)).values
+    state = ReservationState(**values) if values else ReservationState()
+    st.session_state.chat_history = [
+        message for message in map(_display_message, state.chat_history) if message is not None
+    ]
+    return state
+
+def _display_message(entry: dict) -> Optional[dict]:
+    """
+    extract_intent writes {"user": ...} / {"assistant": ...} entries, the
+    booking nodes {"role", "content"} ones, whose user entry repeats the turn's input.
+    """
+    if "role" in entry:
+        return None if entry["role"] == "user" else {"role": entry["role"], "content": entry.get("content")}
+    for role, content in entry.items():
+        return {"role": role, "content": content}
+    return None
+
+def _run_streaming(state: ReservationState, placeholder) -> dict:
+    """
+    Runs the graph, painting assistant tokens into the placeholder as
+    extract_intent streams them, and returns the final state. Only this
+    turn's input is sent; the checkpointer supplies the rest.
+    """
+    if API_URL:
+        return _run_remote(state, placeholder)
+    streamed = ""
+    state_dict = state.model_dump()
+    for mode, chunk in get_session_app().stream(
+        {"user_input": state.user_input, "turn_count": state.turn_count, "restaurant_id": DEFAULT_RESTAURANT_ID},
+        config=thread_config(st.session_state.thread_id, stream_tokens=True),
+        stream_mode=["custom", "values"],
+        durability=CHECKPOINT_DURABILITY,
+    ):
+        if mode == "custom" and "assistant_token" in chunk:
+            streamed += chunk["assistant_token"]
+            placeholder.markdown(streamed + "▌")
+        elif mode == "values":
+            state_dict = chunk
+    return state_dict
+
+def _run_remote(state: ReservationState, placeholder) -> dict:
+    """Same as _run_streaming, over the server's server-sent events."""
+    streamed, event, reply = "", None, {}
+    with httpx.stream(
+        "POST",
+        f"{API_URL}/sessions/{st.session_state.thread_id}/messages",
+        json={"message": state.user_input},
+        headers={"Accept": "text/event-stream"},
+        timeout=None,
+    ) as response:
+        if response.status_code != 200:
+            raise RuntimeError(json.loads(response.read()).get("error", response.status_code))
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "token":
+                    streamed += data["text"]
+                    placeholder.markdown(streamed + "▌")
+                elif event == "reply":
+                    reply = data
+                elif event == "error":
+                    raise RuntimeError(data["error"])
+    return {key: reply.get(key) for key in ("assistant_response", "intent", "entities", "is_available")}
 
 def main():
     st.title("🍽️ Restaurant Reservation Assistant")
     st.write("Book, modify, or cancel your reservation")
 
     if 'state' not in st.session_state:
-        st.session_state.state = ReservationState()
-        st.session_state.chat_history = []
+        st.session_state.state = _restore_state(_thread_id())
 
     for message in st.session_state.chat_history:
         if message["role"] == "user":
@@ -29,8 +136,9 @@ def main():
         st.session_state.chat_history.append({"role": "user", "content": user_input})
         st.chat_message("user").markdown(user_input)
 
+        placeholder = st.chat_message("assistant").empty()
         try:
-            state_dict = app.invoke(st.session_state.state.model_dump())
+            state_dict = _run_streaming(st.session_state.state, placeholder)
             st.session_state.state = ReservationState(**state_dict)
 
             if st.session_state.state.assistant_response:
@@ -38,14 +146,17 @@ def main():
                     "role": "assistant", 
                     "content": st.session_state.state.assistant_response
                 })
-                st.chat_message("assistant").markdown(st.session_state.state.assistant_response)
+                placeholder.markdown(st.session_state.state.assistant_response)
 
             if st.session_state.state.intent in ("cancel_reservation", "modify_reservation", "make_reservation"):
                 if any(phrase in (st.session_state.state.assistant_response or "").lower() 
                        for phrase in ["confirmed", "cancelled", "modified", "completed"]):
                     st.success("✅ Process complete!")
                     st.balloons()
-                    st.session_state.state = ReservationState()  
+                    # Start a fresh thread; the finished one stays in the checkpoint store.
+                    st.session_state.thread_id = _new_thread_id()
+                    st.query_params["thread"] = st.session_state.thread_id
+                    st.session_state.state = ReservationState()
 
         except Exception as e:
             error_msg = f"System error: {str(e)}"
@@ -53,7 +164,7 @@ def main():
                 "role": "assistant",
                 "content": error_msg
             })
-            st.chat_message("assistant").error(error_msg)
+            placeholder.error(error_msg)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,549 @@
+# e_server.py
+# Headless front-end for the reservation graph: a plain ASGI application, so
+# it runs under any ASGI server, e.g.
+#
+#     uvicorn e_server:server --workers 4 --timeout-graceful-shutdown 30
+#
+# Conversations are checkpointed (checkpointing.py), so any worker behind the
+# load balancer can serve any session.
+#
+#   GET    /healthz                  liveness
+#   GET    /readyz                   readiness: 503 while draining or if the DB is unreachable
+#   GET    /metrics                  Prometheus export of metrics.registry
+#   POST   /sessions                 start a session -> {"session_id"}; only IDs issued
+#                                    here are accepted by the session routes below
+#   GET    /sessions/{id}            chat history and entities so far
+#   DELETE /sessions/{id}            forget the session
+#   POST   /sessions/{id}/messages   {"message": "..."} -> reply; streams as SSE with
+#                                    "Accept: text/event-stream" or ?stream=1
+#   GET    /availability?from=YYYY-MM-DD&to=YYYY-MM-DD&persons=N
+#                                    free slots per date across the range
+#   WS     /sessions/{id}/ws         send {"message": "..."} (or plain text), receive
+#                                    {"type": "token"} events then {"type": "reply"}
+#
+# With RESTAURANT_IDS set, every route except the health checks and /metrics
+# is also served under /restaurants/{restaurant_id}/..., against that
+# restaurant's shard (tenancy.py); other IDs get 404. The listed shards are
+# provisioned at startup, never by a request. Sessions belong to one
+# restaurant; unprefixed routes use RESTAURANT_ID, if set.
+#
+# A session ID is a random token signed with SERVER_SESSION_SECRET for its
+# restaurant, so clients cannot pick or guess one to read another guest's
+# conversation. Give every worker the same secret: when unset, each process
+# signs with its own random one and sessions do not outlive it.
+import asyncio
+import base64
+import datetime as dt
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import secrets
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+import db_init
+import db_pool
+import metrics
+from availability_calendar import free_slots
+from checkpointing import CHECKPOINT_DURABILITY, get_checkpointer, thread_config
+from d_reservation_flow import get_session_app
+from log_writer import log_writer
+from tenancy import DEFAULT_RESTAURANT_ID, RESTAURANT_IDS, UnknownRestaurantError, ensure_tenant, is_initialized, \
+    open_tenant, route_restaurant_id, tenant_scope
+
+# Graph turns running at once in this worker; the rest wait up to SERVER_QUEUE_TIMEOUT, then get 503.
+MAX_CONCURRENT_TURNS = int(os.getenv("SERVER_MAX_CONCURRENT_TURNS", "64"))
+QUEUE_TIMEOUT = float(os.getenv("SERVER_QUEUE_TIMEOUT", "5"))
+# Of those, turns one restaurant may run at once, so a busy location cannot take every slot.
+MAX_TURNS_PER_RESTAURANT = int(os.getenv("SERVER_MAX_TURNS_PER_RESTAURANT", str(max(MAX_CONCURRENT_TURNS // 4, 1))))
+TURN_TIMEOUT = float(os.getenv("SERVER_TURN_TIMEOUT", "60"))
+# How long shutdown waits for running turns before giving up on them.
+SHUTDOWN_GRACE = float(os.getenv("SERVER_SHUTDOWN_GRACE", "30"))
+MAX_BODY_BYTES = int(os.getenv("SERVER_MAX_BODY_BYTES", "65536"))
+MAX_MESSAGE_CHARS = int(os.getenv("SERVER_MAX_MESSAGE_CHARS", "2000"))
+
+SESSION_SECRET = os.getenv("SERVER_SESSION_SECRET", "").encode() or secrets.token_bytes(32)
+# "<token>.<signature>", both 16 bytes in unpadded URL-safe base64.
+SESSION_ID_RE = re.compile(r"^([A-Za-z0-9_-]{22})\.([A-Za-z0-9_-]{22})$")
+
+logger = logging.getLogger("reservation_server")
+
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, detail: str, headers: Optional[List[Tuple[bytes, bytes]]] = None):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.headers = headers or []
+
+
+def _busy(detail: str) -> HTTPError:
+    return HTTPError(503, detail, [(b"retry-after", b"1")])
+
+
+class ReservationServer:
+    """
+    ASGI app serving the checkpointed async graph. Turns are admitted through
+    a semaphore (MAX_CONCURRENT_TURNS), at most MAX_TURNS_PER_RESTAURANT of
+    them for one restaurant, and serialized per session, since two turns on
+    one thread would race on its checkpoint. On shutdown it stops admitting
+    turns, waits for running ones, then flushes the interaction log.
+    """
+
+    def __init__(self, max_concurrent_turns: int = MAX_CONCURRENT_TURNS, queue_timeout: float = QUEUE_TIMEOUT,
+                 turn_timeout: float = TURN_TIMEOUT, shutdown_grace: float = SHUTDOWN_GRACE,
+                 max_turns_per_restaurant: int = MAX_TURNS_PER_RESTAURANT):
+        self.max_concurrent_turns = max_concurrent_turns
+        self.max_turns_per_restaurant = max_turns_per_restaurant
+        self.queue_timeout = queue_timeout
+        self.turn_timeout = turn_timeout
+        self.shutdown_grace = shutdown_grace
+        self.graph = None
+        self.draining = False
+        self.in_flight = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._restaurant_slots: Dict[Optional[str], asyncio.Semaphore] = {}
+
+    async def __call__(self, scope: Dict[str, Any], receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if self.graph is None:  # server without lifespan support
+            await self.startup()
+        if scope["type"] == "http":
+            await self._http(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await self._websocket(scope, receive, send)
+
+    # -- lifecycle -----------------------------------------------------------
+
+    async def startup(self) -> None:
+        if get_checkpointer() is None:
+            raise RuntimeError("e_server keeps sessions in the checkpointer; set CHECKPOINT_BACKEND to sqlite or memory")
+        await db_pool.run_in_db_executor(db_init.initialize_database)
+        for restaurant_id in sorted({DEFAULT_RESTAURANT_ID, *RESTAURANT_IDS} - {None}):
+            await db_pool.run_in_db_executor(ensure_tenant, restaurant_id)
+        self.graph = get_session_app(use_async=True)
+        self._slots = asyncio.Semaphore(self.max_concurrent_turns)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.draining = False
+        if not os.getenv("SERVER_SESSION_SECRET"):
+            logger.warning("[server] SERVER_SESSION_SECRET is not set; sessions only work on this worker until it exits")
+
+    async def shutdown(self) -> None:
+        self.draining = True
+        if self._idle is not None:
+            try:
+                await asyncio.wait_for(self._idle.wait(), self.shutdown_grace)
+            except asyncio.TimeoutError:
+                logger.warning("[server] Shutting down with %d turns still running", self.in_flight)
+        await asyncio.get_running_loop().run_in_executor(None, log_writer.flush)
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            event = await receive()
+            if event["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif event["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # -- turns ---------------------------------------------------------------
+
+    @asynccontextmanager
+    async def turn_slot(self, session_id: str, restaurant_id: Optional[str] = None):
+        """
+        Admits one turn: one at a time per session, MAX_TURNS_PER_RESTAURANT
+        per restaurant and MAX_CONCURRENT_TURNS overall.
+        """
+        if self.draining:
+            raise _busy("server is shutting down")
+        thread_id = _thread_id(restaurant_id, session_id)
+        lock = self._session_locks.get(thread_id)
+        if lock is None:
+            lock = self._session_locks[thread_id] = asyncio.Lock()
+        restaurant_slots = self._restaurant_slots.get(restaurant_id)
+        if restaurant_slots is None:
+            restaurant_slots = self._restaurant_slots[restaurant_id] = asyncio.Semaphore(self.max_turns_per_restaurant)
+        try:
+            await asyncio.wait_for(lock.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(409, "another message for this session is still being answered")
+        try:
+            try:
+                await asyncio.wait_for(restaurant_slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                metrics.inc("server_turns_rejected_total", reason="restaurant")
+                raise _busy("too many conversations in progress for this restaurant, try again shortly")
+            try:
+                try:
+                    await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+                except asyncio.TimeoutError:
+                    metrics.inc("server_turns_rejected_total", reason="server")
+                    raise _busy("too many conversations in progress, try again shortly")
+                self.in_flight += 1
+                self._idle.clear()
+                try:
+                    yield
+                finally:
+                    self.in_flight -= 1
+                    if self.in_flight == 0:
+                        self._idle.set()
+                    self._slots.release()
+            finally:
+                restaurant_slots.release()
+        finally:
+            lock.release()
+
+    async def run_turn(self, session_id: str, message: str,
+                       on_token: Optional[Callable[[str], Awaitable[None]]] = None,
+                       restaurant_id: Optional[str] = None) -> Dict[str, Any]:
+        """Runs one turn inside an admitted slot; on_token receives the reply as it streams."""
+        started = time.perf_counter()
+        try:
+            await _open_tenant(restaurant_id)
+            return await asyncio.wait_for(self._stream_turn(session_id, message, on_token, restaurant_id),
+                                          self.turn_timeout)
+        except asyncio.TimeoutError:
+            metrics.inc("server_turn_errors_total", reason="timeout")
+            raise HTTPError(504, "the assistant took too long to answer")
+        finally:
+            metrics.observe("server_turn_duration_seconds", time.perf_counter() - started)
+
+    async def _stream_turn(self, session_id: str, message: str, on_token,
+                           restaurant_id: Optional[str] = None) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+        async for mode, chunk in self.graph.astream(
+            {"user_input": message, "restaurant_id": restaurant_id},
+            config=thread_config(_thread_id(restaurant_id, session_id), stream_tokens=on_token is not None),
+            stream_mode=["custom", "values"],
+            durability=CHECKPOINT_DURABILITY,
+        ):
+            if mode == "custom" and "assistant_token" in chunk:
+                await on_token(chunk["assistant_token"])
+            elif mode == "values":
+                values = chunk
+        return _reply(session_id, values)
+
+    # -- HTTP ----------------------------------------------------------------
+
+    async def _http(self, scope: Dict[str, Any], receive: Receive, send: Send) -> None:
+        method = scope["method"]
+        parts = [part for part in scope["path"].split("/") if part]
+        route = "unknown"
+        status = 500
+        started = time.perf_counter()
+        try:
+            parts, restaurant_id = _split_restaurant(parts)
+            if parts == ["healthz"] and method == "GET":
+                route, status = "/healthz", 200
+                await _send_json(send, status, {"status": "ok"})
+            elif parts == ["readyz"] and method == "GET":
+                route = "/readyz"
+                status = await self._readiness(send)
+            elif parts == ["metrics"] and method == "GET":
+                route, status = "/metrics", 200
+                await _send(send, status, metrics.registry.render_prometheus().encode(),
+                            b"text/plain; version=0.0.4; charset=utf-8")
+            elif parts == ["availability"] and method == "GET":
+                route, status = "/availability", 200
+                await _send_json(send, status, await self._availability(scope, restaurant_id))
+            elif parts == ["sessions"] and method == "POST":
+                route, status = "/sessions", 201
+                await _send_json(send, status, {"session_id": new_session_id(restaurant_id)})
+            elif len(parts) == 2 and parts[0] == "sessions":
+                route = "/sessions/{id}"
+                status = await self._session(method, _session_id(parts[1], restaurant_id), send, restaurant_id)
+            elif len(parts) == 3 and parts[0] == "sessions" and parts[2] == "messages":
+                route = "/sessions/{id}/messages"
+                if method != "POST":
+                    raise HTTPError(405, "use POST")
+                status = await self._message(scope, receive, send, _session_id(parts[1], restaurant_id),
+                                             restaurant_id)
+            else:
+                raise HTTPError(404, "not found")
+        except HTTPError as e:
+            status = e.status
+            await _send_json(send, e.status, {"error": e.detail}, e.headers)
+        except Exception as e:
+            logger.exception("[server] %s %s failed", method, scope["path"])
+            status = 500
+            await _send_json(send, 500, {"error": f"System error: {e}"})
+        finally:
+            metrics.inc("server_requests_total", route=route, status=str(status))
+            metrics.observe("server_request_duration_seconds", time.perf_counter() - started, route=route)
+
+    async def _readiness(self, send: Send) -> int:
+        ready, detail = not self.draining, "draining" if self.draining else "ok"
+        if ready:
+            try:
+                await db_pool.run_in_db_executor(_ping_db)
+            except Exception as e:
+                ready, detail = False, f"database: {e}"
+        status = 200 if ready else 503
+        await _send_json(send, status, {
+            "status": detail,
+            "turns_in_flight": self.in_flight,
+            "max_concurrent_turns": self.max_concurrent_turns,
+        })
+        return status
+
+    async def _availability(self, scope: Dict[str, Any], restaurant_id: Optional[str] = None) -> Dict[str, Any]:
+        query = parse_qs(scope.get("query_string", b"").decode())
+        start = query.get("from", [dt.date.today().isoformat()])[0]
+        end = query.get("to", [start])[0]
+        try:
+            persons = int(query.get("persons", ["1"])[0])
+        except ValueError:
+            raise HTTPError(400, "from and to are YYYY-MM-DD dates, persons a number")
+        await _open_tenant(restaurant_id)
+        try:
+            with tenant_scope(restaurant_id):
+                calendar = await db_pool.run_in_db_executor(free_slots, start, end, persons)
+        except ValueError:
+            raise HTTPError(400, "from and to are YYYY-MM-DD dates, persons a number")
+        return {"persons": persons, "dates": calendar}
+
+    async def _session(self, method: str, session_id: str, send: Send, restaurant_id: Optional[str] = None) -> int:
+        thread_id = _thread_id(restaurant_id, session_id)
+        config = thread_config(thread_id)
+        if method == "GET":
+            snapshot = await self.graph.aget_state(config)
+            if not snapshot.values:
+                raise HTTPError(404, "unknown session")
+            values = snapshot.values
+            await _send_json(send, 200, {
+                **_reply(session_id, values),
+                "chat_history": values.get("chat_history", []),
+            })
+            return 200
+        if method == "DELETE":
+            async with self.turn_slot(session_id, restaurant_id):
+                await self.graph.checkpointer.adelete_thread(thread_id)
+            await _send(send, 204, b"")
+            return 204
+        raise HTTPError(405, "use GET or DELETE")
+
+    async def _message(self, scope: Dict[str, Any], receive: Receive, send: Send, session_id: str,
+                       restaurant_id: Optional[str] = None) -> int:
+        message = _parse_message(await _read_body(receive))
+        query = parse_qs(scope.get("query_string", b"").decode())
+        wants_stream = query.get("stream", ["0"])[0] not in ("0", "false") or \
+            b"text/event-stream" in dict(scope.get("headers", [])).get(b"accept", b"")
+
+        async with self.turn_slot(session_id, restaurant_id):
+            if not wants_stream:
+                reply = await self.run_turn(session_id, message, restaurant_id=restaurant_id)
+                await _send_json(send, 200, reply)
+                return 200
+
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ]})
+
+            async def on_token(text: str) -> None:
+                await _send_event(send, "token", {"text": text})
+
+            try:
+                reply = await self.run_turn(session_id, message, on_token, restaurant_id)
+                await _send_event(send, "reply", reply)
+            except HTTPError as e:
+                await _send_event(send, "error", {"status": e.status, "error": e.detail})
+            except Exception as e:
+                logger.exception("[server] Streaming turn failed")
+                await _send_event(send, "error", {"status": 500, "error": f"System error: {e}"})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return 200
+
+    # -- WebSocket -----------------------------------------------------------
+
+    async def _websocket(self, scope: Dict[str, Any], receive: Receive, send: Send) -> None:
+        parts = [part for part in scope["path"].split("/") if part]
+        event = await receive()
+        if event["type"] != "websocket.connect":
+            return
+        try:
+            parts, restaurant_id = _split_restaurant(parts)
+            if len(parts) != 3 or parts[0] != "sessions" or parts[2] != "ws":
+                raise HTTPError(404, "not found")
+            session_id = _session_id(parts[1], restaurant_id)
+        except HTTPError:
+            await send({"type": "websocket.close", "code": 1008})
+            return
+        if self.draining:
+            await send({"type": "websocket.close", "code": 1013})
+            return
+        await send({"type": "websocket.accept"})
+        metrics.inc("server_websocket_connections_total")
+
+        async def send_json(payload: Dict[str, Any]) -> None:
+            await send({"type": "websocket.send", "text": json.dumps(payload, default=str)})
+
+        async def on_token(text: str) -> None:
+            await send_json({"type": "token", "text": text})
+
+        while True:
+            event = await receive()
+            if event["type"] == "websocket.disconnect":
+                return
+            try:
+                message = _parse_message(event.get("text") or (event.get("bytes") or b"").decode())
+                async with self.turn_slot(session_id, restaurant_id):
+                    reply = await self.run_turn(session_id, message, on_token, restaurant_id)
+                await send_json({"type": "reply", **reply})
+            except HTTPError as e:
+                await send_json({"type": "error", "status": e.status, "error": e.detail})
+            except Exception as e:
+                logger.exception("[server] WebSocket turn failed")
+                await send_json({"type": "error", "status": 500, "error": f"System error: {e}"})
+            if self.draining:
+                await send({"type": "websocket.close", "code": 1001})
+                return
+
+
+def _reply(session_id: str, values: Dict[str, Any]) -> Dict[str, Any]:
+    entities = values.get("entities")
+    if hasattr(entities, "model_dump"):
+        entities = entities.model_dump(exclude_none=True)
+    return {
+        "session_id": session_id,
+        "assistant_response": values.get("assistant_response"),
+        "intent": values.get("intent"),
+        "entities": entities or {},
+        "is_available": values.get("is_available"),
+        "restaurant_id": values.get("restaurant_id"),
+    }
+
+
+def _split_restaurant(parts: List[str]) -> Tuple[List[str], Optional[str]]:
+    """Strips a /restaurants/{id} prefix: (remaining path parts, restaurant_id)."""
+    if len(parts) >= 2 and parts[0] == "restaurants":
+        try:
+            return parts[2:], route_restaurant_id(parts[1])
+        except UnknownRestaurantError as e:
+            raise HTTPError(404, str(e))
+    return parts, DEFAULT_RESTAURANT_ID
+
+
+async def _open_tenant(restaurant_id: Optional[str]) -> None:
+    if is_initialized(restaurant_id):
+        return
+    try:
+        await db_pool.run_in_db_executor(open_tenant, restaurant_id)
+    except UnknownRestaurantError as e:
+        raise HTTPError(404, str(e))
+
+
+def _thread_id(restaurant_id: Optional[str], session_id: str) -> str:
+    """Checkpoint thread of a session; namespaced so one restaurant cannot read another's sessions."""
+    return f"{restaurant_id}:{session_id}" if restaurant_id else session_id
+
+
+def _sign(restaurant_id: Optional[str], token: str) -> str:
+    digest = hmac.new(SESSION_SECRET, f"{restaurant_id or ''}:{token}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:16]).rstrip(b"=").decode()
+
+
+def new_session_id(restaurant_id: Optional[str] = None) -> str:
+    """A fresh, unguessable session ID, valid only for restaurant_id."""
+    token = secrets.token_urlsafe(16)
+    return f"{token}.{_sign(restaurant_id, token)}"
+
+
+def _session_id(raw: str, restaurant_id: Optional[str] = None) -> str:
+    """
+    Accepts only IDs issued by new_session_id for this restaurant. Anything
+    else is reported as an unknown session, so forged IDs learn nothing.
+    """
+    match = SESSION_ID_RE.match(raw)
+    if not match or not hmac.compare_digest(match.group(2), _sign(restaurant_id, match.group(1))):
+        raise HTTPError(404, "unknown session")
+    return raw
+
+
+def _parse_message(body: str) -> str:
+    """Accepts {"message": "..."} or a plain-text body."""
+    message = body
+    if body.lstrip().startswith("{"):
+        try:
+            message = json.loads(body).get("message")
+        except (ValueError, AttributeError):
+            raise HTTPError(400, "invalid JSON")
+    if not isinstance(message, str) or not message.strip():
+        raise HTTPError(400, "message is required")
+    if len(message) > MAX_MESSAGE_CHARS:
+        raise HTTPError(413, f"message is longer than {MAX_MESSAGE_CHARS} characters")
+    return message.strip()
+
+
+def _ping_db() -> None:
+    with db_pool.connection() as conn:
+        conn.execute("SELECT 1").fetchone()
+
+
+async def _read_body(receive: Receive) -> str:
+    chunks, size = [], 0
+    while True:
+        event = await receive()
+        if event["type"] == "http.disconnect":
+            raise HTTPError(400, "client disconnected")
+        chunk = event.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise HTTPError(413, "request body too large")
+        chunks.append(chunk)
+        if not event.get("more_body"):
+            return b"".join(chunks).decode("utf-8", errors="replace")
+
+
+async def _send(send: Send, status: int, body: bytes, content_type: bytes = b"application/json",
+                headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", content_type), *(headers or [])]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send: Send, status: int, payload: Dict[str, Any],
+                     headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+    await _send(send, status, json.dumps(payload, default=str).encode(), headers=headers)
+
+
+async def _send_event(send: Send, event: str, payload: Dict[str, Any]) -> None:
+    data = f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n".encode()
+    await send({"type": "http.response.body", "body": data, "more_body": True})
+
+
+server = ReservationServer()
+
+metrics.registry.describe("server_requests_total", "HTTP requests by route and status.")
+metrics.registry.describe("server_turn_duration_seconds", "Time to answer one chat turn, streaming included.")
+metrics.registry.describe("server_turns_rejected_total",
+                          "Turns refused with 503 because every slot (server-wide or for the restaurant) was busy.")
+metrics.registry.add_collector(lambda: {"server_turns_in_flight": server.in_flight})
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("e_server:server", host=os.getenv("SERVER_HOST", "0.0.0.0"), port=int(os.getenv("PORT", "8000")),
+                workers=int(os.getenv("SERVER_WORKERS", "1")), timeout_graceful_shutdown=int(SHUTDOWN_GRACE))
@@ -0,0 +1,64 @@
+# history.py
+import json
+from typing import Any, Dict, List, Optional
+
+from pydantic_schemas import Entities
+
+
+def _to_message(entry: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    """Maps a chat_history entry written by extract_intent to an LLM message."""
+    if "user" in entry:
+        return {"role": "user", "content": entry["user"]}
+    if "assistant" in entry:
+        return {"role": "assistant", "content": entry["assistant"]}
+    return None
+
+
+def history_messages(chat_history: List[Dict[str, Any]], entities: Optional[Entities] = None,
+                     intent: Optional[str] = None, max_turns: int = 10) -> List[Dict[str, str]]:
+    """
+    Returns the LLM messages for chat_history, keeping the last max_turns turns
+    (a user message and the replies to it) verbatim. Older turns are replaced by
+    one summary message built from the already tracked entities, so the prompt
+    stays bounded however long the conversation runs.
+    """
+    kept: List[Dict[str, str]] = []
+    turns = 0
+    cut = 0
+    turn_start = 0
+    # Walk backwards so the cost depends on the window, not the full history.
+    for position in range(len(chat_history) - 1, -1, -1):
+        message = _to_message(chat_history[position])
+        if message is None:
+            continue
+        if message["role"] == "user":
+            if turns == max_turns:
+                cut = position + 1
+                # Replies collected since the last kept user message belong to this older turn.
+                del kept[turn_start:]
+                break
+            turns += 1
+            kept.append(message)
+            turn_start = len(kept)
+            continue
+        kept.append(message)
+    kept.reverse()
+
+    if cut == 0:
+        return kept
+
+    return [_summary_message(entities, intent)] + kept
+
+
+def _summary_message(entities: Optional[Entities], intent: Optional[str]) -> Dict[str, str]:
+    known = {}
+    if entities is not None:
+        known = {key: value for key, value in entities.model_dump().items() if value is not None}
+        known.pop("status", None)
+    content = (
+        "Earlier turns of this conversation were omitted. "
+        f"Current intent: {intent or 'unknown'}. "
+        f"Details collected so far: {json.dumps(known)}. "
+        "Do not ask for these again unless the user changes them."
+    )
+    return {"role": "system", "content": content}
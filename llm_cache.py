@@ -0,0 +1,174 @@
+# llm_cache.py
+import datetime as dt
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import metrics
+from db_pool import ConnectionPool
+
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL", "3600"))
+# Optional SQLite file that keeps cached replies across restarts and workers.
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+# How many trailing history messages take part in the key.
+KEY_HISTORY_MESSAGES = int(os.getenv("LLM_CACHE_HISTORY", "4"))
+
+_SPACES_RE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " \t\r\n.,!?;:'\""
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Lowercases, collapses whitespace and trims edge punctuation."""
+    return _SPACES_RE.sub(" ", (text or "").lower()).strip(_EDGE_PUNCTUATION)
+
+
+def make_key(model: str, messages: List[Dict[str, str]], entities: Optional[Dict[str, Any]] = None,
+             today: Optional[dt.date] = None) -> str:
+    """
+    Hash of the normalised (system prompt, recent history, user input, known
+    entities). Today's date is part of the key because replies resolve
+    relative dates like "tomorrow".
+    """
+    system = [m["content"] for m in messages[:1] if m["role"] == "system"]
+    rest = messages[len(system):]
+    recent = [(m["role"], normalize_text(m["content"])) for m in rest[-(KEY_HISTORY_MESSAGES + 1):]]
+    known = {k: v for k, v in (entities or {}).items() if v is not None and k != "status"}
+    payload = json.dumps(
+        {
+            "model": model,
+            "system": hashlib.sha256("".join(system).encode()).hexdigest(),
+            "recent": recent,
+            "entities": known,
+            "today": (today or dt.date.today()).isoformat(),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    LRU cache of raw LLM replies with a TTL, optionally backed by SQLite so
+    entries survive restarts. hits / misses / evictions / expirations are
+    counted for monitoring.
+    """
+
+    def __init__(self, max_entries: int = CACHE_SIZE, ttl_seconds: float = CACHE_TTL_SECONDS,
+                 db_path: str = CACHE_PATH):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = ConnectionPool(db_path) if db_path else None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        if self._disk is not None:
+            with self._disk.connection() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS llm_cache (
+                        cache_key TEXT PRIMARY KEY,
+                        content TEXT NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                """)
+                conn.commit()
+
+    @property
+    def persistent(self) -> bool:
+        return self._disk is not None
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                content, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return content
+                del self._entries[key]
+                self.expirations += 1
+
+        if self._disk is not None:
+            with self._disk.connection() as conn:
+                row = conn.execute(
+                    "SELECT content, created_at FROM llm_cache WHERE cache_key = ? AND created_at >= ?",
+                    (key, now - self.ttl_seconds),
+                ).fetchone()
+            if row is not None:
+                self._remember(key, row[0], row[1])
+                with self._lock:
+                    self.hits += 1
+                return row[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, content: str) -> None:
+        created_at = time.time()
+        self._remember(key, content, created_at)
+        if self._disk is not None:
+            with self._disk.connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (cache_key, content, created_at) VALUES (?, ?, ?)",
+                    (key, content, created_at),
+                )
+                conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (created_at - self.ttl_seconds,))
+                conn.commit()
+
+    def _remember(self, key: str, content: str, created_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (content, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self._disk is not None:
+            with self._disk.connection() as conn:
+                conn.execute("DELETE FROM llm_cache")
+                conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+response_cache: Optional[LLMResponseCache] = LLMResponseCache() if CACHE_ENABLED else None
+
+
+def _metrics() -> Dict[str, float]:
+    stats = response_cache.stats()
+    return {
+        "llm_cache_hits_total": stats["hits"],
+        "llm_cache_misses_total": stats["misses"],
+        "llm_cache_evictions_total": stats["evictions"],
+        "llm_cache_entries": stats["entries"],
+    }
+
+
+if response_cache is not None:
+    metrics.registry.add_collector(_metrics)
@@ -0,0 +1,178 @@
+# log_writer.py
+import atexit
+import datetime as dt
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import db_pool
+import metrics
+from tenancy import current_tenant, tenant_scope
+
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "0.5"))
+# "drop" discards rows when the queue is full, "block" waits up to LOG_BLOCK_TIMEOUT for room.
+LOG_FULL_POLICY = os.getenv("LOG_FULL_POLICY", "drop")
+LOG_BLOCK_TIMEOUT = float(os.getenv("LOG_BLOCK_TIMEOUT", "0.05"))
+
+INSERT_LOG_SQL = """
+    INSERT INTO interaction_logs
+        (log_id, user_input, llm_response, missing_fields, fallback_triggered, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+LogRow = Tuple[str, str, str, str, bool, str]
+
+
+def utc_timestamp() -> str:
+    """Same format as SQLite's CURRENT_TIMESTAMP, taken when the turn happened rather than when the row is written."""
+    return dt.datetime.now(dt.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class LogWriter:
+    """
+    Writes interaction_logs rows from a background thread.
+
+    submit() only puts the row on a bounded queue; the worker drains it and
+    inserts up to batch_size rows with one executemany / commit, at least
+    every flush_interval seconds. When the queue is full rows are dropped (or
+    the caller waits briefly, with policy "block") and counted. Each row is
+    written to the shard of the restaurant that was current when it was
+    submitted.
+    """
+
+    def __init__(self, max_queue: int = LOG_QUEUE_SIZE, batch_size: int = LOG_BATCH_SIZE,
+                 flush_interval: float = LOG_FLUSH_INTERVAL, policy: str = LOG_FULL_POLICY,
+                 sql: str = INSERT_LOG_SQL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.sql = sql
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)  # (restaurant_id, row), Event or None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()  # the counters below change from callers and the worker
+        self._closed = False
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="interaction-log-writer", daemon=True)
+                    self._thread.start()
+
+    def submit(self, row: LogRow) -> bool:
+        """Queues a row; returns False if it was dropped."""
+        if self._closed:
+            self._count("dropped")
+            return False
+        self._ensure_started()
+        try:
+            if self.policy == "block":
+                self._queue.put((current_tenant(), row), timeout=LOG_BLOCK_TIMEOUT)
+            else:
+                self._queue.put_nowait((current_tenant(), row))
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("submitted")
+        return True
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Blocks until every row queued so far is written. Returns False on timeout."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """
+        Flushes the remaining rows and stops the worker, waiting at most
+        timeout seconds for room in the queue and again for the worker.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                print(f"[log_writer] Queue still full after {timeout}s, {self._queue.qsize()} rows not written")
+                return
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        batch: List[Tuple[Optional[str], LogRow]] = []
+        deadline = None
+        while True:
+            wait = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                item = ()  # flush interval elapsed
+
+            if isinstance(item, tuple) and item:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) < self.batch_size:
+                    continue
+
+            self._write(batch)
+            batch = []
+            deadline = None
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+    def _write(self, batch: List[Tuple[Optional[str], LogRow]]) -> None:
+        by_restaurant: Dict[Optional[str], List[LogRow]] = {}
+        for restaurant_id, row in batch:
+            by_restaurant.setdefault(restaurant_id, []).append(row)
+        for restaurant_id, rows in by_restaurant.items():
+            try:
+                with tenant_scope(restaurant_id), db_pool.connection() as conn:
+                    conn.executemany(self.sql, rows)
+                    conn.commit()
+                self._count("written", len(rows))
+                self._count("batches")
+            except Exception as e:
+                self._count("failed", len(rows))
+                print(f"[log_writer] DB Logging Error: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return {
+                "queued": self._queue.qsize(),
+                "submitted": self.submitted,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches,
+            }
+
+
+log_writer = LogWriter()
+atexit.register(log_writer.close)
+metrics.registry.add_collector(lambda: {
+    "interaction_logs_written_total": log_writer.written,
+    "interaction_logs_dropped_total": log_writer.dropped,
+    "interaction_logs_queued": log_writer._queue.qsize(),
+})
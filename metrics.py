@@ -0,0 +1,214 @@
+# metrics.py
+import asyncio
+import atexit
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# METRICS_ENABLED=0 removes the node wrappers and the per-statement DB counter.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+# If set, the Prometheus text export is written to this file at exit.
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (0 < q < 1)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    """
+    Process-wide counters and histograms with optional labels, plus
+    collectors: callables returning {name: value} read at export time, used
+    for stats other modules already keep (cache hits, fast-path hits). Collector
+    values named *_total are exported as counters, the rest as gauges.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: List[Callable[[], Dict[str, float]]] = []
+
+    def describe(self, name: str, text: str) -> None:
+        self._help[name] = text
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        if not self.enabled:
+            return
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        if not self.enabled:
+            return
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def add_collector(self, collector: Callable[[], Dict[str, float]]) -> None:
+        self._collectors.append(collector)
+
+    def timed_node(self, name: str, node: Callable) -> Callable:
+        """Wraps a graph node so each call lands in reservation_node_duration_seconds."""
+        if asyncio.iscoroutinefunction(node):
+            async def timed_async(state):
+                started = time.perf_counter()
+                try:
+                    return await node(state)
+                except Exception:
+                    self.inc("reservation_node_errors_total", node=name)
+                    raise
+                finally:
+                    self.observe("reservation_node_duration_seconds", time.perf_counter() - started, node=name)
+            return timed_async
+
+        def timed(state):
+            started = time.perf_counter()
+            try:
+                return node(state)
+            except Exception:
+                self.inc("reservation_node_errors_total", node=name)
+                raise
+            finally:
+                self.observe("reservation_node_duration_seconds", time.perf_counter() - started, node=name)
+        return timed
+
+    def snapshot(self) -> Dict[str, object]:
+        """Plain-dict view: counters, histogram count/sum/p50/p95/p99, collector values."""
+        with self._lock:
+            counters = {
+                name + _format_labels(labels): value
+                for name, series in self._counters.items() for labels, value in series.items()
+            }
+            histograms = {
+                name + _format_labels(labels): {
+                    "count": h.count, "sum": h.sum,
+                    "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99),
+                }
+                for name, series in self._histograms.items() for labels, h in series.items()
+            }
+        gauges = {}
+        for collector in self._collectors:
+            gauges.update(collector())
+        return {"counters": counters, "histograms": histograms, "gauges": gauges}
+
+    def render_prometheus(self) -> str:
+        """Everything in the Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                self._header(lines, name, "counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                self._header(lines, name, "histogram")
+                for labels, h in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(h.buckets, h.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {h.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {h.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {h.count}")
+        for collector in self._collectors:
+            for name, value in sorted(collector().items()):
+                self._header(lines, name, "counter" if name.endswith("_total") else "gauge")
+                lines.append(f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: List[str], name: str, kind: str) -> None:
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    def write_file(self, path: str = METRICS_FILE) -> None:
+        """Writes the Prometheus export atomically, e.g. for node_exporter's textfile collector."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+registry = MetricsRegistry()
+
+registry.describe("reservation_node_duration_seconds", "Time spent in each reservation graph node.")
+registry.describe("reservation_node_errors_total", "Exceptions raised by each reservation graph node.")
+registry.describe("llm_requests_total", "Chat completion requests sent to the LLM.")
+registry.describe("llm_request_duration_seconds", "Latency of LLM chat completion requests.")
+registry.describe("llm_tokens_total", "Tokens reported by the LLM, by kind (prompt / completion).")
+registry.describe("db_queries_total", "SQL statements executed on pooled connections.")
+registry.describe("intent_replies_total", "extract_intent replies by source (rule / cache / llm / error).")
+
+inc = registry.inc
+observe = registry.observe
+timed_node = registry.timed_node
+
+
+def _write_on_exit() -> None:
+    try:
+        registry.write_file(METRICS_FILE)
+    except OSError as e:
+        print(f"[metrics] Could not write {METRICS_FILE}: {e}")
+
+
+if METRICS_FILE:
+    atexit.register(_write_on_exit)
+
+
+if __name__ == "__main__":
+    print(registry.render_prometheus(), end="")
@@ -1,6 +1,11 @@
 from pydantic import BaseModel, Field
 from typing import Optional, Literal
-from typing import Dict, Any
+from typing import Dict, Any, Annotated, Union, Sequence
+
+try:
+    from langgraph.channels.delta import DeltaChannel
+except ImportError:  # older langgraph: plain reducer, full list in every checkpoint
+    DeltaChannel = None
 
 
 
@@ -14,15 +19,81 @@ class Entities(BaseModel):
     status: Optional[Literal["pending", "confirmed", "cancelled"]] = "pending"
     reservation_id: Optional[str] = None
 
+
+# Key of an entities update listing fields to reset to their defaults,
+# e.g. {CLEAR_ENTITIES: ["reservation_id", "status"]} when a new booking starts.
+CLEAR_ENTITIES = "_clear"
+
+
+def merge_entities(current: Optional[Entities], update: Union[Entities, Dict[str, Any], None]) -> Entities:
+    """
+    Reducer for ReservationState.entities: a node returns only the fields it
+    learned or changed, and None never erases a known value. Fields named
+    under CLEAR_ENTITIES are reset first, then the update is applied.
+    """
+    if isinstance(current, dict):
+        current = Entities(**current)
+    elif current is None:
+        current = Entities()
+    if isinstance(update, Entities):
+        update = update.model_dump(exclude_unset=True)
+    update = update or {}
+    cleared = [key for key in update.get(CLEAR_ENTITIES) or [] if key in Entities.model_fields]
+    changes = {key: value for key, value in update.items() if value is not None and key in Entities.model_fields}
+    if not changes and not cleared:
+        return current
+    merged = current.model_dump()
+    for key in cleared:
+        merged[key] = Entities.model_fields[key].default
+    return Entities(**{**merged, **changes})
+
+
+def append_history(current: Optional[list], new: Optional[list]) -> list:
+    """
+    Reducer for ReservationState.chat_history: nodes return only the entries
+    they add. They are appended to the channel's list in place (the channel
+    starts from its own empty list), so a write costs the entries added, not
+    the length of the conversation.
+    """
+    if current is None:
+        return list(new or [])
+    if new:
+        current.extend(new)
+    return current
+
+
+# langchain message type -> the role the nodes write
+MESSAGE_ROLES = {"human": "user", "ai": "assistant"}
+
+
+def _history_entry(entry: Any) -> Any:
+    # A delta channel turns {"role", "content"} dicts into message objects
+    # before the reducer sees them; history stays plain dicts.
+    if isinstance(entry, dict) or not hasattr(entry, "type") or not hasattr(entry, "content"):
+        return entry
+    return {"role": MESSAGE_ROLES.get(entry.type, entry.type), "content": entry.content}
+
+
+def extend_history(current: Optional[list], batches: Sequence[Optional[list]]) -> list:
+    """Batch form of append_history, so checkpoints store each turn's entries instead of the whole list."""
+    history = current if current is not None else []
+    for new in batches:
+        history.extend(_history_entry(entry) for entry in new or [])
+    return history
+
+
+HISTORY_CHANNEL = DeltaChannel(extend_history, snapshot_frequency=50) if DeltaChannel is not None else append_history
+
 class ReservationState(BaseModel):
     user_input: str = Field(default="", description="Current user input")
-    chat_history: list = Field(default=[], description="Conversation history")
+    chat_history: Annotated[list, HISTORY_CHANNEL] = Field(default=[], description="Conversation history")
     intent: Optional[str] = Field(default=None, description="Detected intent")
-    entities: Entities = Field(default_factory=Entities, description="Extracted entities")
+    entities: Annotated[Entities, merge_entities] = Field(default_factory=Entities, description="Extracted entities")
     assistant_response: Optional[str] = Field(default=None, description="AI response")
     turn_count: int = Field(default=0, description="Conversation turn count")
     max_turns: int = Field(default=10, description="Maximum allowed turns")
     is_available: Optional[bool] = None 
+    restaurant_id: Optional[str] = Field(default=None, description="Restaurant (tenant) whose shard the turn reads and writes")
 
     def model_dump(self, **kwargs):
         return super().model_dump(**kwargs)
@@ -0,0 +1,294 @@
+# rule_extractor.py
+import datetime as dt
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+from pydantic_schemas import ReservationState
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+RESERVATION_ID_RE = re.compile(r"(?:\breservation\s*(?:id|number|no\.?)?|\bbooking\s*(?:id|number)?|\bid)\s*(?:is|:)?\s*#?(\d+)\b|#(\d+)\b", re.I)
+TIME_RE = re.compile(r"\b(\d{1,2})(?::(\d{2}))?(?::00)?\s*(am|pm|a\.m\.|p\.m\.)?(?![\d-])", re.I)
+PARTY_RE = re.compile(
+    r"\b(?:(?:party|table|group)\s+of\s+|for\s+)?(\d{1,2}|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve)"
+    r"(?:\s+(?:people|persons|guests|pax|adults|of us))\b|\b(?:party|table|group)\s+(?:of|for)\s+(\d{1,2})\b|\bfor\s+(\d{1,2})\b(?!\s*(?:am|pm|:))",
+    re.I,
+)
+BARE_NUMBER_RE = re.compile(r"^\s*#?(\d{1,6})\s*[.!]?\s*$")
+NAME_RE = re.compile(r"\b(?:my name is|name is|name's|this is)\s+([A-Za-z][A-Za-z'\-]*(?:\s+[A-Za-z][A-Za-z'\-]*){0,2})", re.I)
+BARE_NAME_RE = re.compile(r"^\s*([A-Za-z][A-Za-z'\-]*(?:\s+[A-Za-z][A-Za-z'\-]*){0,2})\s*[.!]?\s*$")
+# Replies that are not a name even when the bot just asked for one.
+NEGATION_RE = re.compile(
+    r"\b(?:no|nope|nah|not|never|nevermind|forget|cancel|stop|quit|skip|start over|don't|dont)\b", re.I
+)
+NAME_QUESTION_RE = re.compile(r"\bname\b", re.I)
+YES_RE = re.compile(r"^\s*(?:yes|yeah|yep|yup|sure|ok|okay|confirm|please confirm|go ahead|sounds good|that's right|correct)\s*[.!]*\s*$", re.I)
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+RELATIVE_DATE_RE = re.compile(
+    r"\b(today|tonight|tomorrow|day after tomorrow|(?:this\s+|next\s+)?(?:" + "|".join(WEEKDAYS) + r"))\b", re.I
+)
+RESERVATION_TYPES = {
+    "dinner", "lunch", "breakfast", "brunch", "supper", "birthday", "birthday party", "party",
+    "meeting", "business meeting", "anniversary", "celebration", "date night", "family dinner",
+}
+# Words that may surround recognised values without changing their meaning.
+FILLER_RE = re.compile(
+    r"\b(?:at|on|for|the|a|an|it|it's|its|is|my|email|e-mail|address|and|please|at around|around|"
+    r"about|make|change|to|instead|people|persons|guests|of|us|we|are|will|be|would|like|i|i'd|"
+    r"i'm|reservation|booking|id|number|time|date|ok|okay|thanks|thank|you|type|just)\b|[,.!?:;#\-]",
+    re.I,
+)
+NOT_A_NAME = {
+    "yes", "no", "ok", "okay", "sure", "hi", "hello", "hey", "thanks", "thank you", "maybe",
+    "later", "cancel", "modify", "change", "help", "what", "why", "how", "today", "tomorrow", "tonight",
+    "there", "please", "not", "want", "need", "book", "table", "reservation", "can", "could", "wait",
+} | RESERVATION_TYPES
+
+FIELD_ORDER = ["user_name", "email_id", "num_persons", "res_date", "res_time", "reservation_type"]
+QUESTIONS = {
+    "user_name": "May I have the name for the reservation?",
+    "email_id": "Thanks! What email address should we send the confirmation to?",
+    "num_persons": "Got it. How many guests will be joining?",
+    "res_date": "Great. Which date would you like to book?",
+    "res_time": "What time would you like? We take reservations on the hour.",
+    "reservation_type": "And what's the occasion - dinner, a birthday party, a meeting?",
+}
+
+
+class FastPathStats:
+    """Counts how often the rules answered a turn, and what that saved in LLM time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+        self.rule_seconds = 0.0
+
+    def record(self, hit: bool, seconds: float) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.rule_seconds += seconds
+
+    def record_llm(self, seconds: float) -> None:
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_seconds += seconds
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            turns = self.hits + self.misses
+            avg_llm = self.llm_seconds / self.llm_calls if self.llm_calls else 0.0
+            avg_rule = self.rule_seconds / turns if turns else 0.0
+            return {
+                "turns": turns,
+                "hits": self.hits,
+                "hit_rate": self.hits / turns if turns else 0.0,
+                "avg_llm_seconds": avg_llm,
+                "avg_rule_seconds": avg_rule,
+                "estimated_seconds_saved": self.hits * max(avg_llm - avg_rule, 0.0),
+            }
+
+
+stats = FastPathStats()
+metrics.registry.add_collector(lambda: {"fast_path_hits_total": stats.hits, "fast_path_misses_total": stats.misses})
+
+
+def resolve_date(text: str, today: Optional[dt.date] = None) -> Optional[str]:
+    """
+    Resolves ISO and relative dates ("tomorrow", "next friday") to YYYY-MM-DD.
+    Other phrasings ("july 5th") are left to the LLM.
+    """
+    today = today or dt.date.today()
+    match = ISO_DATE_RE.search(text)
+    if match:
+        try:
+            return dt.date(*map(int, match.groups())).isoformat()
+        except ValueError:
+            return None
+
+    match = RELATIVE_DATE_RE.search(text)
+    if match:
+        phrase = " ".join(match.group(1).lower().split())
+        if phrase in ("today", "tonight"):
+            return today.isoformat()
+        if phrase == "tomorrow":
+            return (today + dt.timedelta(days=1)).isoformat()
+        if phrase == "day after tomorrow":
+            return (today + dt.timedelta(days=2)).isoformat()
+        weekday = WEEKDAYS.index(phrase.split()[-1])
+        ahead = (weekday - today.weekday()) % 7
+        if phrase.startswith("next"):
+            ahead = ahead or 7
+        return (today + dt.timedelta(days=ahead)).isoformat()
+    return None
+
+
+def _parse_time(match: re.Match) -> Optional[str]:
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), (match.group(3) or "").lower()
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.startswith("p") else 0)
+    elif match.group(2) is None:
+        return None  # a bare "7" could be guests, an ID or a time
+    if hour > 23 or minute > 59 or minute != 0:
+        return None  # off-slot times need the LLM to explain the hourly slots
+    return f"{hour:02d}:00:00"
+
+
+def extract_entities(text: str, today: Optional[dt.date] = None) -> Tuple[Dict[str, Any], bool]:
+    """
+    Pulls every entity the rules recognise out of text. The flag says whether
+    the recognised values (plus filler words) account for the whole input; if
+    not, something else was said and the LLM should handle the turn.
+    """
+    found: Dict[str, Any] = {}
+    spans: List[Tuple[int, int]] = []
+
+    def take(match: re.Match, key: str, value: Any) -> None:
+        start, end = match.span()
+        if value is None or key in found or any(s < end and start < e for s, e in spans):
+            return
+        found[key] = value
+        spans.append((start, end))
+
+    for match in EMAIL_RE.finditer(text):
+        take(match, "email_id", match.group(0).lower())
+    masked = EMAIL_RE.sub(lambda m: " " * len(m.group(0)), text)
+
+    for match in RESERVATION_ID_RE.finditer(masked):
+        take(match, "reservation_id", match.group(1) or match.group(2))
+    for match in ISO_DATE_RE.finditer(masked):
+        take(match, "res_date", resolve_date(match.group(0), today))
+    for match in RELATIVE_DATE_RE.finditer(masked):
+        take(match, "res_date", resolve_date(match.group(0), today))
+    for match in PARTY_RE.finditer(masked):
+        raw = next(group for group in match.groups() if group)
+        persons = NUMBER_WORDS.get(raw.lower()) or int(raw)
+        take(match, "num_persons", persons if 0 < persons <= 50 else None)
+    for match in TIME_RE.finditer(masked):
+        take(match, "res_time", _parse_time(match))
+    for match in NAME_RE.finditer(masked):
+        take(match, "user_name", match.group(1).strip().title())
+
+    lowered = masked.lower()
+    for kind in sorted(RESERVATION_TYPES, key=len, reverse=True):
+        position = re.search(rf"\b{re.escape(kind)}\b", lowered)
+        if position:
+            take(position, "reservation_type", kind)
+            break
+
+    rest = list(masked)
+    for start, end in spans:
+        rest[start:end] = " " * (end - start)
+    leftover = FILLER_RE.sub(" ", "".join(rest)).strip()
+    return found, not leftover
+
+
+def _next_missing(entities: Dict[str, Any]) -> Optional[str]:
+    return next((field for field in FIELD_ORDER if not entities.get(field)), None)
+
+
+def _last_assistant_message(chat_history: List[Dict[str, Any]]) -> str:
+    for entry in reversed(chat_history or []):
+        if "assistant" in entry:
+            return entry["assistant"] or ""
+        if entry.get("role") == "assistant":
+            return entry.get("content") or ""
+    return ""
+
+
+def _bare_name(state: ReservationState, text: str) -> Optional[str]:
+    """
+    A reply of one to three words taken as the guest's name, only while
+    booking and right after the bot asked for it; "never mind", "nope" and
+    the like go to the LLM.
+    """
+    if state.intent != "make_reservation" or NEGATION_RE.search(text):
+        return None
+    if not NAME_QUESTION_RE.search(_last_assistant_message(state.chat_history)):
+        return None
+    name = BARE_NAME_RE.match(text)
+    if not name or any(word in NOT_A_NAME for word in name.group(1).lower().split()):
+        return None
+    return name.group(1).strip().title()
+
+
+def try_fast_path(state: ReservationState, today: Optional[dt.date] = None) -> Optional[Dict[str, Any]]:
+    """
+    Answers the turn without the LLM when it is unambiguous: an ongoing
+    reservation conversation and an input made up only of values the rules
+    recognise (an email, a party size, a date, a time, an ID, a "yes").
+    Returns {"intent", "entities" (only the values found), "assistant_response"} or None.
+    """
+    intent = state.intent
+    if intent not in ("make_reservation", "modify_reservation", "cancel_reservation"):
+        return None
+    if intent == "make_reservation" and state.entities.status in ("confirmed", "cancelled"):
+        return None  # whether this starts another booking is for the LLM to judge
+
+    text = state.user_input or ""
+    known = state.entities.model_dump()
+    expected = _next_missing(known)
+
+    if YES_RE.match(text):
+        if intent == "make_reservation" and expected is None:
+            return _result(intent, {}, "Perfect, let me check availability for you.")
+        return None
+
+    bare = BARE_NUMBER_RE.match(text)
+    if bare:
+        value = bare.group(1)
+        if intent in ("modify_reservation", "cancel_reservation") and not known.get("reservation_id"):
+            found = {"reservation_id": value}
+        elif intent == "make_reservation" and expected == "num_persons" and 0 < int(value) <= 50:
+            found = {"num_persons": int(value)}
+        else:
+            return None
+    else:
+        found, consumed = extract_entities(text, today)
+        if not consumed:
+            name = _bare_name(state, text) if expected == "user_name" else None
+            if name is None:
+                return None
+            found = {"user_name": name}
+        if not found:
+            return None
+
+    # Only the new values are returned; the entities reducer merges them in.
+    return _result(intent, found, _next_question(intent, {**known, **found}))
+
+
+def _next_question(intent: str, entities: Dict[str, Any]) -> str:
+    if intent == "cancel_reservation":
+        if not entities.get("reservation_id"):
+            return "Could you share your reservation ID?"
+        if not entities.get("email_id"):
+            return "Thanks! What email address was used for the booking?"
+        return f"Thanks, let me cancel reservation {entities['reservation_id']} for you."
+    if intent == "modify_reservation":
+        if not entities.get("reservation_id"):
+            return "Could you share your reservation ID?"
+        if any(entities.get(field) for field in ("user_name", "num_persons", "res_date", "res_time")):
+            return f"Got it, let me update reservation {entities['reservation_id']}."
+        return f"Got it. What would you like to change about reservation {entities['reservation_id']}?"
+    missing = _next_missing(entities)
+    if missing is None:
+        return "Thank you! Let me check availability for you."
+    return QUESTIONS[missing]
+
+
+def _result(intent: str, entities: Dict[str, Any], assistant_response: str) -> Dict[str, Any]:
+    return {"intent": intent, "entities": entities, "assistant_response": assistant_response}
@@ -0,0 +1,122 @@
+# slot_search.py
+import datetime as dt
+import heapq
+import os
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from availability_calendar import CALENDAR_SEARCH_DAYS, date_range
+from availability_index import AvailabilityIndex, get_index
+from db_migrations import normalize_res_date
+from tenancy import current_tenant
+from table_inventory import SERVICE_PERIODS, SERVICE_SLOTS, DayAllocation, SlotAllocation, slot_key
+
+# Ranking weights, in hours of distance: each hour away from the requested time
+# costs 1, each day away SLOT_SEARCH_DAY_WEIGHT, a slot in another service
+# (lunch instead of dinner) SLOT_SEARCH_SERVICE_WEIGHT, and a poor table fit up
+# to SLOT_SEARCH_FIT_WEIGHT (a party of 2 at a 6-top, or joined tables).
+SLOT_SEARCH_DAY_WEIGHT = float(os.getenv("SLOT_SEARCH_DAY_WEIGHT", "4"))
+SLOT_SEARCH_SERVICE_WEIGHT = float(os.getenv("SLOT_SEARCH_SERVICE_WEIGHT", "2"))
+SLOT_SEARCH_FIT_WEIGHT = float(os.getenv("SLOT_SEARCH_FIT_WEIGHT", "1"))
+
+# (largest party the slot can still seat, free table sizes in ascending order)
+Cell = Tuple[int, Tuple[int, ...]]
+
+
+def _cell(allocation: SlotAllocation) -> Cell:
+    room = allocation.free_seats
+    if allocation.cover_limit:
+        room = min(room, allocation.cover_limit - allocation.covers)
+    return room, tuple(seats for seats, _ in allocation.free)
+
+
+def _service(hour: int) -> int:
+    for number, (start, end) in enumerate(SERVICE_PERIODS):
+        if start <= hour < end:
+            return number
+    return -1
+
+
+class OccupancyGrid:
+    """
+    (date, slot) -> Cell, derived from the availability index. Index writes
+    replace a slot's allocation instead of changing it, so a cell stays valid
+    for as long as the index holds the same allocation object; only slots
+    booked or released since the last query are recomputed.
+    """
+
+    def __init__(self, index: Optional[AvailabilityIndex] = None, slots: List[str] = SERVICE_SLOTS):
+        self.index = index
+        # (hour, service) per opening slot, computed once
+        self.slots = [(slot, int(slot[:2]), _service(int(slot[:2]))) for slot in slots]
+        # (restaurant_id, res_date) -> (DayAllocation, {slot: (SlotAllocation, Cell)}, cell of an empty slot)
+        self._days: Dict[Tuple[Optional[str], str], Tuple[DayAllocation, Dict[str, Tuple[SlotAllocation, Cell]], Cell]] = {}
+
+    def _day_cells(self, res_date: str, day: DayAllocation):
+        key = (current_tenant(), res_date)
+        entry = self._days.get(key)
+        if entry is None or entry[0] is not day:
+            if len(self._days) > 4 * (self.index or get_index()).max_days:
+                self._days.clear()
+            entry = self._days[key] = (day, {}, _cell(SlotAllocation(day.tables, day.cover_limit)))
+        return entry[1], entry[2]
+
+    def rank(self, res_date: str, res_time: str, num_persons: Optional[int] = 1, limit: int = 3,
+             search_days: int = CALENDAR_SEARCH_DAYS,
+             now: Optional[dt.datetime] = None) -> List[Tuple[float, str, str]]:
+        """
+        The limit best (score, date, slot) candidates within search_days of the
+        requested slot, lowest score first. Only opening-hour slots that can
+        seat the party and have not started yet are candidates; the
+        requested slot itself is left out.
+        """
+        now = now or dt.datetime.now()
+        persons = max(int(num_persons or 1), 1)
+        requested_date = dt.date.fromisoformat(normalize_res_date(res_date))
+        requested_slot = slot_key(res_time)
+        requested_hour = int(requested_slot[:2])
+        requested_service = _service(requested_hour)
+        start = max(requested_date - dt.timedelta(days=search_days), now.date())
+        end = requested_date + dt.timedelta(days=search_days)
+        if end < start:
+            return []
+        dates = date_range(start.isoformat(), end.isoformat())
+        days = (self.index or get_index()).days(dates)
+        today, current = now.date().isoformat(), now.strftime("%H:%M")
+        requested_iso = requested_date.isoformat()
+        first_offset = (start - requested_date).days
+
+        def candidates():
+            for offset, day_iso in enumerate(dates, start=first_offset):
+                day = days[day_iso]
+                cells, empty = self._day_cells(day_iso, day)
+                day_cost = SLOT_SEARCH_DAY_WEIGHT * abs(offset)
+                for slot, hour, service in self.slots:
+                    allocation = day.slots.get(slot)
+                    if allocation is None:
+                        room, sizes = empty
+                    else:
+                        cached = cells.get(slot)
+                        if cached is None or cached[0] is not allocation:
+                            cached = cells[slot] = (allocation, _cell(allocation))
+                        room, sizes = cached[1]
+                    if room < persons or (day_iso == today and slot < current) or \
+                            (offset == 0 and slot == requested_slot):
+                        continue
+                    position = bisect_left(sizes, persons)
+                    fit = (sizes[position] - persons) / sizes[position] if position < len(sizes) else 1.0
+                    score = day_cost + abs(hour - requested_hour) + SLOT_SEARCH_FIT_WEIGHT * fit
+                    if service != requested_service:
+                        score += SLOT_SEARCH_SERVICE_WEIGHT
+                    yield score, day_iso, slot
+
+        return heapq.nsmallest(limit, candidates())
+
+
+grid = OccupancyGrid()
+
+
+def search_slots(res_date: str, res_time: str, num_persons: Optional[int] = 1, limit: int = 3,
+                 search_days: int = CALENDAR_SEARCH_DAYS, now: Optional[dt.datetime] = None) -> List[Tuple[str, str]]:
+    """Best alternative (date, slot) pairs for a party, closest in time first (see OccupancyGrid.rank)."""
+    return [(day, slot) for _, day, slot in grid.rank(res_date, res_time, num_persons, limit, search_days, now)]
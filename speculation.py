@@ -0,0 +1,105 @@
+# speculation.py
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Any, Callable, Hashable, Optional
+
+import metrics
+
+# Lookups started ahead of the node that needs them (e.g. the availability
+# check, started while extract_intent waits for the LLM). Results are shared by
+# key for SPECULATION_TTL seconds; a node waits at most SPECULATION_WAIT
+# seconds for one that is still running before doing the work itself.
+SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "1") != "0"
+SPECULATION_TTL = float(os.getenv("SPECULATION_TTL", "30"))
+SPECULATION_WAIT = float(os.getenv("SPECULATION_WAIT", "2"))
+SPECULATION_WORKERS = int(os.getenv("SPECULATION_WORKERS", "4"))
+SPECULATION_MAX_ENTRIES = 256
+
+
+class SpeculativeResults:
+    """
+    Futures keyed by what their result depends on. start() submits the work
+    unless the same key is already in flight or fresh; take() returns the
+    result, or None when there is nothing usable so the caller does the work
+    itself. Speculation runs on its own small executor so a node waiting here
+    can never be queued behind itself on the DB executor.
+    """
+
+    def __init__(self, ttl: float = SPECULATION_TTL, max_entries: int = SPECULATION_MAX_ENTRIES,
+                 workers: int = SPECULATION_WORKERS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.workers = workers
+        self._entries: "OrderedDict[Hashable, tuple[float, Future]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="speculate")
+        return self._executor
+
+    def _prune(self, now: float) -> None:
+        while self._entries:
+            key, (started, _) = next(iter(self._entries.items()))
+            if now - started < self.ttl and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
+
+    def start(self, key: Hashable, func: Callable[..., Any], *args) -> Future:
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry[1]
+            # carries the context (the restaurant being served) into the worker thread
+            future = self._pool().submit(contextvars.copy_context().run, func, *args)
+            self._entries[key] = (now, future)
+        metrics.inc("speculation_total", outcome="started")
+        return future
+
+    def take(self, key: Hashable, timeout: float = SPECULATION_WAIT) -> Optional[Any]:
+        with self._lock:
+            self._prune(time.monotonic())
+            entry = self._entries.get(key)
+        if entry is None:
+            metrics.inc("speculation_total", outcome="miss")
+            return None
+        future = entry[1]
+        if future.cancel():  # still queued: doing it inline is as fast
+            metrics.inc("speculation_total", outcome="cancelled")
+            return None
+        try:
+            result = future.result(timeout)
+        except TimeoutError:
+            metrics.inc("speculation_total", outcome="timeout")
+            return None
+        except Exception as e:
+            print(f"[speculation] Speculative lookup failed: {e}")
+            metrics.inc("speculation_total", outcome="failed")
+            return None
+        metrics.inc("speculation_total", outcome="hit")
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def shutdown(self) -> None:
+        self.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+speculative_results = SpeculativeResults()
+
+metrics.registry.describe(
+    "speculation_total",
+    "Speculative lookups by outcome: started, hit (result reused), miss, cancelled, timeout, failed, stale.",
+)
@@ -0,0 +1,214 @@
+# table_inventory.py
+import os
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Dining room layout as "<seats>x<count>" pairs, e.g. six 2-tops and eight 4-tops.
+DEFAULT_TABLE_LAYOUT = "2x6,4x8,6x3,8x1"
+TABLE_LAYOUT = os.getenv("RESTAURANT_TABLES", DEFAULT_TABLE_LAYOUT)
+
+# Optional kitchen pacing limit on guests seated per slot (0 = seats only).
+SLOT_COVER_LIMIT = int(os.getenv("RESTAURANT_SLOT_COVERS", "0"))
+
+# Opening hours as "<open>-<close>" hour ranges, e.g. "12-15,18-23" for lunch and
+# dinner. A slot starts on each hour inside a range; the close hour has none.
+OPENING_HOURS = os.getenv("RESTAURANT_HOURS", "12-23")
+
+
+def parse_layout(layout: str) -> List[Tuple[str, int]]:
+    """Expands "2x2,4x1" into [("T1", 2), ("T2", 2), ("T3", 4)]."""
+    tables = []
+    for part in layout.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        seats, _, count = part.partition("x")
+        for _ in range(int(count or 1)):
+            tables.append((f"T{len(tables) + 1}", int(seats)))
+    return tables
+
+
+TABLES = parse_layout(TABLE_LAYOUT)
+
+
+def parse_hours(hours: str) -> List[str]:
+    """Expands "12-15,18-20" into ["12:00", "13:00", "14:00", "18:00", "19:00"]."""
+    slots = set()
+    for part in hours.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        slots.update(range(int(start), int(end or int(start) + 1)))
+    return [f"{hour:02d}:00" for hour in sorted(slots) if 0 <= hour < 24]
+
+
+def parse_periods(hours: str) -> List[Tuple[int, int]]:
+    """Splits "12-15,18-23" into [(12, 15), (18, 23)], one (open, close) pair per service."""
+    periods = []
+    for part in hours.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        periods.append((int(start), int(end or int(start) + 1)))
+    return sorted(periods)
+
+
+SERVICE_SLOTS = parse_hours(OPENING_HOURS)
+SERVICE_PERIODS = parse_periods(OPENING_HOURS)
+TOTAL_SEATS = sum(seats for _, seats in TABLES)
+
+
+def slot_key(res_time: Optional[str]) -> str:
+    """Normalizes "19:00:00" / "19:30" style times to the hourly "HH:00" slot."""
+    parts = (res_time or "").split(":")
+    try:
+        hour, minute = int(parts[0]), int(parts[1])
+    except (IndexError, ValueError):
+        return res_time or ""
+    if 0 <= hour < 24 and 0 <= minute < 60:
+        return f"{hour:02d}:00"
+    return res_time or ""
+
+
+class SlotAllocation:
+    """
+    Table assignments for one (date, time) slot.
+
+    Free tables are kept sorted by seat count, so the best-fitting single table
+    for a party is found with one bisect.
+    """
+
+    __slots__ = ("free", "free_seats", "covers", "assignments", "overflow", "cover_limit")
+
+    def __init__(self, tables: Iterable[Tuple[str, int]] = TABLES, cover_limit: int = SLOT_COVER_LIMIT):
+        self.free = sorted((seats, table_id) for table_id, seats in tables)
+        self.free_seats = sum(seats for seats, _ in self.free)
+        self.covers = 0
+        self.assignments: Dict[str, Tuple[int, List[Tuple[int, str]]]] = {}
+        self.overflow = 0
+        self.cover_limit = cover_limit
+
+    def can_seat(self, persons: int) -> bool:
+        persons = max(int(persons or 1), 1)
+        if self.cover_limit and self.covers + persons > self.cover_limit:
+            return False
+        if bisect_left(self.free, (persons, "")) < len(self.free):
+            return True
+        return self.free_seats >= persons
+
+    def allocate(self, reservation_id: str, persons: int) -> Optional[List[str]]:
+        """
+        Seats a party at the smallest table that fits, or joins the largest free
+        tables when no single table is big enough. Returns the table IDs, or
+        None when the slot cannot take the party.
+        """
+        persons = max(int(persons or 1), 1)
+        if not self.can_seat(persons):
+            return None
+
+        pos = bisect_left(self.free, (persons, ""))
+        if pos < len(self.free):
+            taken = [self.free.pop(pos)]
+        else:
+            taken, seated = [], 0
+            while seated < persons:
+                table = self.free.pop()
+                taken.append(table)
+                seated += table[0]
+
+        self.free_seats -= sum(seats for seats, _ in taken)
+        self.covers += persons
+        self.assignments[reservation_id] = (persons, taken)
+        return [table_id for _, table_id in taken]
+
+    def force(self, reservation_id: str, persons: int) -> None:
+        """Records a booking that no longer fits (e.g. after a layout change) without tables."""
+        persons = max(int(persons or 1), 1)
+        self.covers += persons
+        self.overflow += 1
+        self.assignments[reservation_id] = (persons, [])
+
+    def release(self, reservation_id: str) -> bool:
+        booking = self.assignments.pop(reservation_id, None)
+        if booking is None:
+            return False
+        persons, taken = booking
+        if not taken:
+            self.overflow -= 1
+        for table in taken:
+            insort(self.free, table)
+        self.free_seats += sum(seats for seats, _ in taken)
+        self.covers -= persons
+        return True
+
+    def copy(self) -> "SlotAllocation":
+        clone = SlotAllocation((), self.cover_limit)
+        clone.free = list(self.free)
+        clone.free_seats = self.free_seats
+        clone.covers = self.covers
+        clone.assignments = dict(self.assignments)
+        clone.overflow = self.overflow
+        return clone
+
+
+class DayAllocation:
+    """All slot allocations for one date, created lazily per slot."""
+
+    __slots__ = ("res_date", "slots", "tables", "cover_limit", "_empty")
+
+    def __init__(self, res_date: str, tables: Iterable[Tuple[str, int]] = TABLES,
+                 cover_limit: int = SLOT_COVER_LIMIT):
+        self.res_date = res_date
+        self.slots: Dict[str, SlotAllocation] = {}
+        self.tables = list(tables)
+        self.cover_limit = cover_limit
+        self._empty = SlotAllocation(self.tables, cover_limit)
+
+    @classmethod
+    def from_bookings(cls, res_date: str, bookings: Iterable[Tuple[str, str, Optional[int]]],
+                      **kwargs) -> "DayAllocation":
+        """
+        Builds the day from (reservation_id, res_time, num_persons) rows.
+        Parties are packed largest first (best-fit decreasing) so a full
+        rebuild packs at least as tightly as the order they were booked in.
+        """
+        day = cls(res_date, **kwargs)
+        ordered = sorted(bookings, key=lambda row: -(row[2] or 1))
+        for reservation_id, res_time, num_persons in ordered:
+            day.book(str(reservation_id), res_time, num_persons)
+        return day
+
+    def slot(self, res_time: str) -> SlotAllocation:
+        key = slot_key(res_time)
+        allocation = self.slots.get(key)
+        if allocation is None:
+            allocation = SlotAllocation(self.tables, self.cover_limit)
+            self.slots[key] = allocation
+        return allocation
+
+    def can_seat(self, res_time: str, persons: int, exclude_reservation_id: Optional[str] = None) -> bool:
+        allocation = self.slots.get(slot_key(res_time))
+        if allocation is None:
+            return self._empty.can_seat(persons)
+        if exclude_reservation_id and str(exclude_reservation_id) in allocation.assignments:
+            allocation = allocation.copy()
+            allocation.release(str(exclude_reservation_id))
+        return allocation.can_seat(persons)
+
+    def book(self, reservation_id: str, res_time: str, persons: Optional[int]) -> Optional[List[str]]:
+        """Allocates tables; bookings that no longer fit still count as covers."""
+        allocation = self.slot(res_time)
+        tables = allocation.allocate(reservation_id, persons)
+        if tables is None:
+            allocation.force(reservation_id, persons)
+        return tables
+
+    def release(self, reservation_id: str, res_time: str) -> bool:
+        allocation = self.slots.get(slot_key(res_time))
+        return allocation.release(reservation_id) if allocation else False
+
+    def occupancy(self) -> Dict[str, int]:
+        """{slot: booked covers} for every slot with at least one booking."""
+        return {key: allocation.covers for key, allocation in self.slots.items() if allocation.covers}
@@ -0,0 +1,181 @@
+# tenancy.py
+import argparse
+import asyncio
+import contextvars
+import os
+import re
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional, Set
+
+# One deployment serves many restaurants. Each restaurant_id is a tenant with
+# its own SQLite shard (TENANT_DB_DIR/<restaurant_id>.db) and its own
+# connection pool, availability index and hold sweeps; no restaurant_id means
+# the original single database (RESTAURANT_DB_PATH). The current tenant is a
+# context variable, so it follows a graph run into the DB executor threads.
+#
+# Shards are provisioned by the operator, never by a request:
+#
+#     python tenancy.py provision downtown airport
+#
+# Requests may only name restaurants listed in RESTAURANT_IDS (e_server
+# provisions those at startup) and are refused when the list is empty.
+
+# Restaurant for clients that do not pass one (e.g. the Streamlit UI of one location).
+DEFAULT_RESTAURANT_ID = os.getenv("RESTAURANT_ID", "").strip() or None
+# Comma-separated restaurant IDs this deployment serves. Empty: requests cannot
+# pick a restaurant, only trusted callers (the CLIs, RESTAURANT_ID) can.
+RESTAURANT_IDS = {rid.strip() for rid in os.getenv("RESTAURANT_IDS", "").split(",") if rid.strip()}
+TENANT_DB_DIR = os.getenv("TENANT_DB_DIR", "")
+
+RESTAURANT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+_current: "contextvars.ContextVar[Optional[str]]" = contextvars.ContextVar("restaurant_id", default=None)
+_initialized: Set[Optional[str]] = set()
+_init_lock = threading.Lock()
+
+
+class UnknownRestaurantError(ValueError):
+    pass
+
+
+def validate_restaurant_id(restaurant_id: Optional[str]) -> Optional[str]:
+    """Returns the ID (None for the default database) or raises UnknownRestaurantError."""
+    if restaurant_id is None or restaurant_id == "":
+        return None
+    restaurant_id = str(restaurant_id)
+    if not RESTAURANT_ID_RE.match(restaurant_id):
+        raise UnknownRestaurantError("restaurant IDs are 1-64 letters, digits, '-' or '_'")
+    if RESTAURANT_IDS and restaurant_id not in RESTAURANT_IDS:
+        raise UnknownRestaurantError(f"unknown restaurant {restaurant_id!r}")
+    return restaurant_id
+
+
+def route_restaurant_id(restaurant_id: str) -> str:
+    """Checks a restaurant ID that came from a request: it must be in RESTAURANT_IDS."""
+    if not RESTAURANT_IDS:
+        raise UnknownRestaurantError("this deployment does not route by restaurant")
+    if restaurant_id not in RESTAURANT_IDS:
+        raise UnknownRestaurantError(f"unknown restaurant {restaurant_id!r}")
+    return restaurant_id
+
+
+def current_tenant() -> Optional[str]:
+    return _current.get()
+
+
+@contextmanager
+def tenant_scope(restaurant_id: Optional[str]) -> Iterator[Optional[str]]:
+    """Runs the block against restaurant_id's shard."""
+    token = _current.set(validate_restaurant_id(restaurant_id))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def _shard_file(restaurant_id: str, default_path: str) -> str:
+    directory = TENANT_DB_DIR or os.path.join(os.path.dirname(default_path), "restaurants")
+    return os.path.join(directory, f"{restaurant_id}.db")
+
+
+def shard_path(restaurant_id: Optional[str], default_path: str) -> str:
+    """The SQLite file for a restaurant; default_path for none."""
+    if restaurant_id is None:
+        return default_path
+    path = _shard_file(restaurant_id, default_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def is_initialized(restaurant_id: Optional[str]) -> bool:
+    return restaurant_id in _initialized
+
+
+def is_provisioned(restaurant_id: Optional[str]) -> bool:
+    """Whether the restaurant's shard file exists (the default database always counts)."""
+    if restaurant_id is None or restaurant_id in _initialized:
+        return True
+    import db_pool
+    return os.path.exists(_shard_file(restaurant_id, db_pool.router.default_path))
+
+
+def open_tenant(restaurant_id: Optional[str] = None) -> None:
+    """
+    Brings an already provisioned shard up to the current schema; unlike
+    ensure_tenant it never creates one. Raises UnknownRestaurantError for a
+    restaurant without a shard.
+    """
+    restaurant_id = validate_restaurant_id(restaurant_id)
+    if restaurant_id in _initialized:
+        return
+    if not is_provisioned(restaurant_id):
+        raise UnknownRestaurantError(f"restaurant {restaurant_id!r} is not provisioned")
+    ensure_tenant(restaurant_id)
+
+
+def ensure_tenant(restaurant_id: Optional[str] = None) -> None:
+    """
+    Creates and migrates the restaurant's shard the first time this process
+    uses it. Provisioning: only for operator-chosen IDs, never request input.
+    """
+    restaurant_id = validate_restaurant_id(restaurant_id)
+    if restaurant_id in _initialized:
+        return
+    with _init_lock:
+        if restaurant_id in _initialized:
+            return
+        import db_init
+        with tenant_scope(restaurant_id):
+            db_init.initialize_database()
+        _initialized.add(restaurant_id)
+
+
+def _restaurant_of(state: Any) -> Optional[str]:
+    if isinstance(state, dict):
+        restaurant_id = state.get("restaurant_id")
+    else:
+        restaurant_id = getattr(state, "restaurant_id", None)
+    return restaurant_id or current_tenant() or DEFAULT_RESTAURANT_ID
+
+
+def tenant_node(node: Callable) -> Callable:
+    """Wraps a graph node so it runs against the shard of the state's restaurant_id."""
+    if asyncio.iscoroutinefunction(node):
+        async def scoped_async(state):
+            restaurant_id = _restaurant_of(state)
+            if not is_initialized(restaurant_id):
+                open_tenant(restaurant_id)
+            with tenant_scope(restaurant_id):
+                return await node(state)
+        return scoped_async
+
+    def scoped(state):
+        restaurant_id = _restaurant_of(state)
+        if not is_initialized(restaurant_id):
+            open_tenant(restaurant_id)
+        with tenant_scope(restaurant_id):
+            return node(state)
+    return scoped
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage restaurant shards.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    provision = commands.add_parser("provision", help="create (or migrate) restaurant shards")
+    provision.add_argument("restaurant_ids", nargs="+", metavar="restaurant_id")
+    args = parser.parse_args(argv)
+
+    try:
+        for restaurant_id in args.restaurant_ids:
+            ensure_tenant(restaurant_id)
+            print(f"[tenancy] Provisioned {restaurant_id}")
+    except UnknownRestaurantError as e:
+        print(f"[tenancy] {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+# tests/conftest.py
+import datetime as dt
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Settings are read when the modules are imported, so they are fixed here,
+# before any test imports them: a throwaway database, no tracing, and the
+# benchmark's mock LLM server instead of the real provider.
+TEST_DIR = tempfile.mkdtemp(prefix="reservation-tests-")
+os.environ["RESTAURANT_DB_PATH"] = os.path.join(TEST_DIR, "restaurant.db")
+os.environ["CHECKPOINT_DB_PATH"] = os.path.join(TEST_DIR, "checkpoints.db")
+os.environ["LANGSMITH_TRACING"] = "false"
+os.environ["GROQ_API_KEY"] = "mock"
+os.environ["LLM_CACHE_ENABLED"] = "0"
+for name in ("RESTAURANT_ID", "RESTAURANT_IDS", "TENANT_DB_DIR", "LLM_CACHE_PATH"):
+    os.environ.pop(name, None)
+
+from benchmark import MockLLMServer  # noqa: E402
+
+llm_server = MockLLMServer(latency=0, jitter=0).start()
+os.environ["LLM_BASE_URL"] = llm_server.base_url
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    import db_init
+    db_init.initialize_database()
+    yield os.environ["RESTAURANT_DB_PATH"]
+
+
+@pytest.fixture
+def llm():
+    """The mock LLM; register(user_message, reply) scripts its answers."""
+    llm_server.replies.clear()
+    yield llm_server
+    llm_server.replies.clear()
+
+
+def future_date(days: int) -> str:
+    return (dt.date.today() + dt.timedelta(days=days)).isoformat()
+
+
+def reply(intent: str, entities: dict, assistant_response: str = "Let me check that for you.") -> dict:
+    return {"intent": intent, "entities": entities, "assistant_response": assistant_response}
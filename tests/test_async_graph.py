@@ -0,0 +1,42 @@
+# tests/test_async_graph.py
+import asyncio
+
+import db_pool
+from conftest import future_date, reply
+from d_reservation_flow import get_app
+
+
+def _ainvoke(state: dict) -> dict:
+    return asyncio.run(get_app(use_async=True).ainvoke(state))
+
+
+def test_async_graph_extracts_intent_and_entities(llm):
+    llm.register("Hi, I'm Grace and we are four", reply(
+        "make_reservation", {"user_name": "Grace", "num_persons": 4}, "Nice to meet you, Grace! Which date?"))
+
+    result = _ainvoke({"user_input": "Hi, I'm Grace and we are four"})
+
+    assert result["intent"] == "make_reservation"
+    assert result["entities"].user_name == "Grace"
+    assert result["entities"].num_persons == 4
+    assert result["entities"].reservation_id is None
+    assert result["assistant_response"] == "Nice to meet you, Grace! Which date?"
+    assert llm.requests > 0
+
+
+def test_async_graph_books_a_table_in_one_turn(llm):
+    res_date = future_date(43)
+    entities = {"user_name": "Grace", "email_id": "grace@example.com", "num_persons": 4,
+                "res_date": res_date, "res_time": "20:00:00", "reservation_type": "dinner"}
+    llm.register("Table for four on the date, 8pm, grace@example.com", reply("make_reservation", entities))
+
+    result = _ainvoke({"user_input": "Table for four on the date, 8pm, grace@example.com"})
+
+    reservation_id = result["entities"].reservation_id
+    assert reservation_id is not None
+    assert result["entities"].status == "confirmed"
+    assert result["assistant_response"].startswith("Reservation confirmed!")
+    with db_pool.connection() as conn:
+        row = conn.execute("SELECT user_name, res_date, res_time, num_persons, status FROM reservations "
+                           "WHERE reservation_id = ?", (reservation_id,)).fetchone()
+    assert tuple(row) == ("Grace", res_date, "20:00", 4, "confirmed")
@@ -0,0 +1,22 @@
+# tests/test_availability.py
+import datetime as dt
+
+from availability_index import get_index
+from b_check_availibility import check_availability_node
+from booking import reserve_slot
+from pydantic_schemas import Entities, ReservationState
+
+
+def test_unpadded_date_reads_and_writes_the_stored_day():
+    year = dt.date.today().year + 1
+    entities = Entities(user_name="Ada", email_id="ada@example.com", num_persons=8,
+                        res_date=f"{year}-7-5", res_time="19:00:00", reservation_type="dinner")
+    get_index().day(f"{year}-07-05")  # cached before the bookings, so they must reach the index
+
+    booked = [reserve_slot(entities) for _ in range(50)]
+    assert booked[0] is not None and booked[-1] is None
+
+    state = ReservationState(intent="make_reservation", entities=entities)
+    result = check_availability_node(state)
+    assert result["is_available"] is False
+    assert f"19:00 on {year}-07-05 isn't available" in result["assistant_response"]
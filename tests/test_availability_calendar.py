@@ -0,0 +1,100 @@
+# tests/test_availability_calendar.py
+import datetime as dt
+
+import pytest
+
+import db_pool
+from availability_calendar import date_range, free_slots
+from conftest import future_date
+from table_inventory import SERVICE_SLOTS, TOTAL_SEATS
+
+RECOMPUTED_SQL = """
+    SELECT res_date, substr(res_time, 1, 2) || ':00', COUNT(*), SUM(COALESCE(num_persons, 1)),
+           SUM(CASE WHEN status = 'pending' THEN COALESCE(num_persons, 1) ELSE 0 END)
+        FROM reservations
+        WHERE res_date = ? AND status != 'cancelled'
+        GROUP BY 1, 2 ORDER BY 2
+"""
+
+
+def _execute(sql: str, params: tuple = ()) -> int:
+    with db_pool.connection() as conn:
+        cursor = conn.execute(sql, params)
+        conn.commit()
+    return cursor.lastrowid
+
+
+def _book(res_date: str, res_time: str, num_persons: int, status: str = "confirmed",
+          hold_expires_at: str = None) -> int:
+    return _execute("INSERT INTO reservations (user_name, num_persons, res_date, res_time, status, hold_expires_at) "
+                    "VALUES ('Ada', ?, ?, ?, ?, ?)", (num_persons, res_date, res_time, status, hold_expires_at))
+
+
+def _summaries(res_date: str) -> list:
+    with db_pool.connection() as conn:
+        return [tuple(row) for row in conn.execute(
+            "SELECT res_date, res_time, bookings, covers, held_covers FROM slot_summaries "
+            "WHERE res_date = ? ORDER BY res_time", (res_date,))]
+
+
+def _recomputed(res_date: str) -> list:
+    with db_pool.connection() as conn:
+        return [tuple(row) for row in conn.execute(RECOMPUTED_SQL, (res_date,))]
+
+
+def test_summaries_follow_every_write():
+    res_date, moved_to = future_date(80), future_date(81)
+    first = _book(res_date, "19:00", 4, "pending", "2998-01-01 00:00:00")
+    second = _book(res_date, "19:30", 2)
+    assert _summaries(res_date) == [(res_date, "19:00", 2, 6, 4)] == _recomputed(res_date)
+
+    steps = [
+        ("UPDATE reservations SET status = 'confirmed', hold_expires_at = NULL WHERE reservation_id = ?", (first,)),
+        ("UPDATE reservations SET num_persons = 6 WHERE reservation_id = ?", (second,)),
+        ("UPDATE reservations SET res_time = '20:00' WHERE reservation_id = ?", (second,)),
+        ("UPDATE reservations SET res_date = ? WHERE reservation_id = ?", (moved_to, first)),
+        ("UPDATE reservations SET status = 'cancelled' WHERE reservation_id = ?", (second,)),
+        ("UPDATE reservations SET status = 'confirmed' WHERE reservation_id = ?", (second,)),
+        ("DELETE FROM reservations WHERE reservation_id = ?", (second,)),
+    ]
+    for sql, params in steps:
+        _execute(sql, params)
+        for day in (res_date, moved_to):
+            assert _summaries(day) == _recomputed(day), sql
+
+    assert _summaries(res_date) == []
+    assert _summaries(moved_to) == [(moved_to, "19:00", 1, 4, 0)]
+
+
+def test_free_slots_skip_full_and_past_slots():
+    res_date = future_date(82)
+    for _ in range(TOTAL_SEATS // 8 + 1):
+        _book(res_date, "19:00", 8)
+    _book(res_date, "20:00", 6)
+
+    calendar = free_slots(res_date, res_date, 2)
+    assert "19:00" not in calendar[res_date]
+    assert "20:00" in calendar[res_date]
+    assert calendar[res_date] == [slot for slot in SERVICE_SLOTS if slot != "19:00"]
+
+    afternoon = dt.datetime.fromisoformat(f"{res_date}T15:30")
+    assert free_slots(res_date, res_date, 2, now=afternoon)[res_date] == \
+        [slot for slot in SERVICE_SLOTS if "16:00" <= slot != "19:00"]
+    assert free_slots(res_date, res_date, TOTAL_SEATS + 1) == {res_date: []}
+
+
+def test_expired_holds_do_not_fill_the_calendar():
+    res_date = future_date(83)
+    for _ in range(TOTAL_SEATS // 8 + 1):
+        _book(res_date, "21:00", 8, "pending", "2000-01-01 00:00:00")
+    assert _summaries(res_date)[0][4] >= TOTAL_SEATS  # still pending in the summary
+
+    assert "21:00" in free_slots(res_date, res_date, 8)[res_date]
+
+
+def test_date_range_is_ordered_and_capped():
+    start = dt.date(2030, 1, 1)
+    assert date_range("2030-01-03", "2030-01-01") == ["2030-01-01", "2030-01-02", "2030-01-03"]
+    assert date_range("2030-01-01", "2030-12-31", max_days=5)[-1] == (start + dt.timedelta(days=4)).isoformat()
+    with pytest.raises(ValueError):
+        date_range("someday", "2030-01-01")
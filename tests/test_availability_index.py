@@ -0,0 +1,110 @@
+# tests/test_availability_index.py
+import availability_index
+import db_pool
+from availability_index import AvailabilityIndex
+from conftest import future_date
+
+LATER = "2999-01-01 00:00:00"
+
+
+def _insert(res_date: str, res_time: str = "19:00", num_persons: int = 4, status: str = "confirmed",
+            hold_expires_at: str = None) -> str:
+    with db_pool.connection() as conn:
+        cursor = conn.execute(
+            "INSERT INTO reservations (user_name, email_id, num_persons, res_date, res_time, status, hold_expires_at) "
+            "VALUES ('Ada', 'ada@example.com', ?, ?, ?, ?, ?)",
+            (num_persons, res_date, res_time, status, hold_expires_at))
+        conn.commit()
+    return str(cursor.lastrowid)
+
+
+def test_lapsed_holds_are_released_when_the_date_is_read(monkeypatch):
+    res_date = future_date(70)
+    index = AvailabilityIndex(tables=[("T1", 4)])
+    hold = _insert(res_date, status="pending", hold_expires_at="2998-01-01 00:00:00")
+    assert not index.day(res_date).can_seat("19:00", 2)
+    assert index.stats()["holds"] == 1
+
+    monkeypatch.setattr(availability_index, "utc_timestamp", lambda: LATER)
+    assert index.day(res_date).can_seat("19:00", 2)
+    assert index.stats()["expired_holds"] == 1 and index.stats()["holds"] == 0
+    assert index.verify_day(res_date)  # the database read skips the lapsed hold as well
+
+    index.record_booking(hold, res_date, "19:00", 4)  # confirmed after all: no expiry
+    assert not index.day(res_date).can_seat("19:00", 2)
+
+
+def test_confirming_a_cached_hold_stops_its_expiry(monkeypatch):
+    res_date = future_date(71)
+    index = AvailabilityIndex(tables=[("T1", 4)])
+    index.day(res_date)
+    index.record_booking("900001", res_date, "19:00", 4, hold_expires_at="2998-01-01 00:00:00")
+    index.record_booking("900001", res_date, "19:00", 4)
+
+    monkeypatch.setattr(availability_index, "utc_timestamp", lambda: LATER)
+    assert not index.day(res_date).can_seat("19:00", 2)
+    assert index.stats()["expired_holds"] == 0
+
+
+def test_verify_day_repairs_a_stale_cache():
+    res_date, other_date = future_date(72), future_date(73)
+    index = AvailabilityIndex(tables=[("T1", 4), ("T2", 4)])
+    assert index.verify_day(res_date)  # not cached: nothing to compare
+    index.days([res_date, other_date])
+
+    _insert(res_date)  # written behind the index's back
+    assert index.day(res_date).can_seat("19:00", 4)
+    assert index.verify_all() == {res_date: False, other_date: True}
+
+    day = index.day(res_date)
+    assert day.can_seat("19:00", 4) and not day.can_seat("19:00", 8)
+    assert index.verify_all() == {res_date: True, other_date: True}
+
+
+def test_lru_keeps_the_most_recently_used_dates():
+    first, second, third = future_date(74), future_date(75), future_date(76)
+    index = AvailabilityIndex(max_days=2)
+    index.day(first)
+    index.day(second)
+    index.day(first)
+    index.day(third)  # evicts second, the least recently used
+
+    assert list(index._days) == [first, third]
+    stats = index.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["cached_days"]) == (1, 3, 1, 2)
+    index.days([first, second])
+    assert list(index._days) == [first, second]
+
+
+def test_loads_racing_a_write_are_not_cached():
+    res_date = future_date(77)
+    index = AvailabilityIndex(tables=[("T1", 4)])
+    fetch = index._fetch
+
+    def fetch_during_a_write(day):
+        loaded = fetch(day)
+        _insert(res_date)  # lands after the read, before the result is stored
+        index.record_booking("late", res_date, "19:00", 4)
+        return loaded
+
+    index._fetch = fetch_during_a_write
+    assert index.load_day(res_date).can_seat("19:00", 4)  # the caller still gets what was read
+    assert index.stats()["cached_days"] == 0
+
+    index._fetch = fetch
+    assert not index.day(res_date).can_seat("19:00", 4)
+    assert index.stats()["cached_days"] == 1
+
+
+def test_range_loads_racing_a_write_are_not_cached(monkeypatch):
+    dates = [future_date(78), future_date(79)]
+    index = AvailabilityIndex()
+    connection = db_pool.connection
+
+    def connection_during_a_write():
+        index.invalidate()
+        return connection()
+
+    monkeypatch.setattr(db_pool, "connection", connection_during_a_write)
+    assert set(index.days(dates)) == set(dates)
+    assert index.stats()["cached_days"] == 0
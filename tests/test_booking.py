@@ -0,0 +1,118 @@
+# tests/test_booking.py
+import threading
+import time
+
+import pytest
+
+import booking
+import db_pool
+from availability_index import get_index
+from booking import HoldReaper, confirm_hold, expire_holds, reserve_slot, slot_has_room
+from conftest import future_date
+from log_writer import utc_timestamp
+from pydantic_schemas import Entities
+from table_inventory import TOTAL_SEATS, DayAllocation
+
+
+def _party(res_date: str, res_time: str, num_persons: int = 2, name: str = "Ada") -> Entities:
+    return Entities(user_name=name, email_id=f"{name.lower()}@example.com", num_persons=num_persons,
+                    res_date=res_date, res_time=res_time, reservation_type="dinner")
+
+
+@pytest.mark.parametrize("res_time", ["soon", "25:00", "19", ""])
+def test_unparseable_times_never_have_room(res_time):
+    res_date = future_date(50)
+    with db_pool.connection() as conn:
+        assert not slot_has_room(conn, res_date, res_time, 2)
+    assert reserve_slot(_party(res_date, res_time)) is None
+
+
+def _live_rows(res_date: str, res_time: str = "19:00") -> list:
+    with db_pool.connection() as conn:
+        return conn.execute(
+            "SELECT reservation_id, res_time, num_persons FROM reservations WHERE res_date = ? AND res_time = ? "
+            "AND status != 'cancelled' AND (hold_expires_at IS NULL OR hold_expires_at > ?)",
+            (res_date, res_time, utc_timestamp()),
+        ).fetchall()
+
+
+def test_concurrent_bookings_never_overbook_a_slot():
+    res_date = future_date(51)
+    outcomes = []
+
+    def guest(number: int) -> None:
+        for attempt in range(8):
+            reservation_id = reserve_slot(_party(res_date, "19:00", 2 + (number + attempt) % 7, f"Guest{number}"))
+            if reservation_id is not None and attempt % 2:
+                outcomes.append(confirm_hold(reservation_id))
+
+    threads = [threading.Thread(target=guest, args=(number,)) for number in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    rows = _live_rows(res_date)
+    day = DayAllocation.from_bookings(res_date, rows)
+    assert rows and set(outcomes) == {"confirmed"}
+    assert day.slot("19:00").overflow == 0
+    assert sum(persons for _, _, persons in rows) <= TOTAL_SEATS
+    assert not day.can_seat("19:00", 8)  # 128 attempts fill the room
+    assert get_index().verify_day(res_date)
+
+
+def _expired_hold(monkeypatch, res_date: str, num_persons: int = 8, name: str = "Held") -> str:
+    monkeypatch.setattr(booking, "hold_deadline", lambda: "2000-01-01 00:00:00")
+    reservation_id = reserve_slot(_party(res_date, "19:00", num_persons, name))
+    monkeypatch.undo()
+    return reservation_id
+
+
+def test_expired_holds_stop_counting_and_are_reaped(monkeypatch):
+    res_date = future_date(52)
+    holds = [_expired_hold(monkeypatch, res_date) for _ in range(5)]
+    assert all(holds)
+    assert _live_rows(res_date) == []
+    with db_pool.connection() as conn:
+        assert slot_has_room(conn, res_date, "19:00", 8)
+    assert get_index().day(res_date).can_seat("19:00", 8)
+
+    assert expire_holds() >= 5
+    with db_pool.connection() as conn:
+        left = conn.execute("SELECT COUNT(*) FROM reservations WHERE res_date = ?", (res_date,)).fetchone()[0]
+    assert left == 0
+    assert confirm_hold(holds[0]) == "not found"
+
+
+def test_lapsed_hold_is_confirmed_only_while_its_slot_has_room(monkeypatch):
+    res_date = future_date(53)
+    lapsed = _expired_hold(monkeypatch, res_date, 2)
+    assert confirm_hold(lapsed) == "confirmed"
+    assert confirm_hold(lapsed) == "already confirmed"
+
+    taken = _expired_hold(monkeypatch, res_date, 8)
+    while reserve_slot(_party(res_date, "19:00", 8, "Walkin")) is not None:
+        pass
+    assert confirm_hold(taken) == "expired"
+    with db_pool.connection() as conn:
+        assert conn.execute("SELECT 1 FROM reservations WHERE reservation_id = ?", (taken,)).fetchone() is None
+
+
+def _hold_row(reservation_id: str):
+    with db_pool.connection() as conn:
+        return conn.execute("SELECT status FROM reservations WHERE reservation_id = ?", (reservation_id,)).fetchone()
+
+
+def test_hold_reaper_sweeps_in_the_background(monkeypatch):
+    res_date = future_date(54)
+    hold = _expired_hold(monkeypatch, res_date)
+    reaper = HoldReaper(interval=0.02)
+    reaper.ensure_started()
+    try:
+        deadline = time.monotonic() + 5
+        while _hold_row(hold) and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        reaper.stop()
+    assert _hold_row(hold) is None
+    assert not reaper._thread.is_alive()
@@ -0,0 +1,120 @@
+# tests/test_bulk_io.py
+import csv
+import json
+
+import pytest
+
+import bulk_io
+from availability_index import get_index
+from bulk_io import export_file, export_rows, import_file, import_rows
+from conftest import future_date
+from table_inventory import TOTAL_SEATS
+
+FIELDS = ("user_name", "email_id", "num_persons", "res_date", "res_time", "reservation_type")
+
+
+def _booking(number: int, res_date: str, res_time: str = "18:00", num_persons: int = 2) -> dict:
+    return {"user_name": f"Guest{number}", "email_id": f"guest{number}@example.com", "num_persons": num_persons,
+            "res_date": res_date, "res_time": res_time, "reservation_type": "dinner"}
+
+
+def _write(path, fmt: str, rows: list) -> str:
+    with open(path, "w", newline="", encoding="utf-8") as stream:
+        if fmt == "csv":
+            writer = csv.DictWriter(stream, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            stream.writelines(json.dumps(row) + "\n" for row in rows)
+    return str(path)
+
+
+@pytest.mark.parametrize("fmt, days", [("csv", 60), ("jsonl", 61)])
+def test_import_export_round_trip(tmp_path, fmt, days):
+    res_date = future_date(days)
+    rows = [_booking(number, res_date, f"{17 + number % 4}:00") for number in range(12)]
+
+    report = import_file(_write(tmp_path / f"in.{fmt}", fmt, rows), chunk_size=5)
+    assert (report.read, report.inserted, report.rejected, report.chunks) == (12, 12, 0, 3)
+
+    out = str(tmp_path / f"out.{fmt}")
+    assert export_file(out, start_date=res_date, end_date=res_date) == 12
+    with open(out, newline="", encoding="utf-8") as stream:
+        exported = list(csv.DictReader(stream)) if fmt == "csv" else [json.loads(line) for line in stream]
+    assert [{field: str(row[field]) for field in FIELDS} for row in exported] == \
+        [{field: str(row[field]) for field in FIELDS} for row in rows]
+    assert {row["status"] for row in exported} == {"confirmed"}
+
+    # Importing the export again collides on every reservation_id.
+    again = import_file(out, chunk_size=5)
+    assert (again.inserted, again.rejected, again.retried_chunks) == (0, 12, 3)
+    assert all("rejected by the database" in message for _, message in again.errors)
+
+
+def test_invalid_rows_are_reported_by_line(tmp_path):
+    res_date = future_date(62)
+    lines = [
+        json.dumps(_booking(1, res_date)),
+        "{not json",
+        json.dumps({**_booking(2, res_date), "email_id": None}),
+        json.dumps({**_booking(3, res_date), "num_persons": 80}),
+        json.dumps({**_booking(4, res_date), "num_persons": "several"}),
+        json.dumps({**_booking(5, res_date), "res_date": "someday"}),
+        json.dumps(["not", "an", "object"]),
+        json.dumps({**_booking(6, res_date), "reservation_id": "abc"}),
+        json.dumps(_booking(7, res_date)),
+    ]
+    path = tmp_path / "rows.jsonl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    errors = tmp_path / "errors.jsonl"
+
+    assert bulk_io.main(["import", str(path), "--errors", str(errors)]) == 1
+
+    rejected = [json.loads(line) for line in errors.read_text(encoding="utf-8").splitlines()]
+    assert sorted(error["line"] for error in rejected) == [2, 3, 4, 5, 6, 7, 8]
+    messages = {error["line"]: error["error"] for error in rejected}
+    assert messages[2].startswith("invalid JSON")
+    assert messages[3] == "missing email_id"
+    assert messages[4] == "num_persons must be 1-50, got 80"
+    assert messages[5].startswith("num_persons:")
+    assert messages[6].startswith("bad date/time")
+    assert messages[7] == "expected an object per line"
+    assert messages[8].startswith("reservation_id must be a positive integer")
+    assert [row["user_name"] for row in export_rows(res_date, res_date)] == ["Guest1", "Guest7"]
+
+
+def test_duplicate_ids_only_reject_the_duplicates():
+    res_date = future_date(63)
+    first = import_rows([(1, _booking(1, res_date))])
+    taken = next(export_rows(res_date, res_date))["reservation_id"]
+
+    rows = [(2, _booking(2, res_date)), (3, {**_booking(3, res_date), "reservation_id": taken}),
+            (4, _booking(4, res_date))]
+    report = import_rows(rows)
+
+    assert first.inserted == 1
+    assert (report.inserted, report.rejected, report.retried_chunks) == (2, 1, 1)
+    assert report.errors[0][0] == 3 and "UNIQUE" in report.errors[0][1]
+    assert [row["user_name"] for row in export_rows(res_date, res_date)] == ["Guest1", "Guest2", "Guest4"]
+
+
+def test_check_capacity_refuses_overbooking(tmp_path):
+    res_date = future_date(64)
+    rows = [_booking(number, res_date, "19:00", 8) for number in range(TOTAL_SEATS // 8 + 5)]
+    path = _write(tmp_path / "full.csv", "csv", rows)
+
+    assert bulk_io.main(["import", path, "--check-capacity"]) == 1
+    seated = sum(row["num_persons"] for row in export_rows(res_date, res_date))
+    assert 0 < seated <= TOTAL_SEATS
+    assert not get_index().day(res_date).can_seat("19:00", 8)
+
+
+def test_import_refreshes_the_availability_index():
+    res_date = future_date(65)
+    assert get_index().day(res_date).can_seat("20:00", 8)  # cached before the import
+
+    report = import_rows((number, _booking(number, res_date, "20:00", 8)) for number in range(TOTAL_SEATS // 8 + 5))
+
+    assert report.rejected == 0  # without check_capacity the import trusts the file
+    assert not get_index().day(res_date).can_seat("20:00", 8)
+    assert get_index().verify_day(res_date)
@@ -0,0 +1,106 @@
+# tests/test_llm_cache.py
+import datetime as dt
+
+import a_extract_intent
+import llm_cache
+from conftest import reply
+from d_reservation_flow import build_reservation_graph
+from llm_cache import KEY_HISTORY_MESSAGES, LLMResponseCache, make_key
+
+TODAY = dt.date(2030, 5, 1)
+ENTITIES = {"user_name": "Ada", "num_persons": 2, "res_date": None, "status": "pending"}
+
+
+def _messages(user: str, system: str = "You are a reservation assistant.", history: tuple = ()) -> list:
+    return [{"role": "system", "content": system}, *history, {"role": "user", "content": user}]
+
+
+def _key(user: str = "Table for two, please", entities: dict = ENTITIES, **options) -> str:
+    model, today = options.pop("model", "llama"), options.pop("today", TODAY)
+    return make_key(model, _messages(user, **options), entities, today)
+
+
+class Clock:
+    now = 1_000.0
+
+    @classmethod
+    def time(cls) -> float:
+        return cls.now
+
+
+def test_key_ignores_formatting_and_entity_noise():
+    assert _key() == _key("  table   for TWO, please!  ")
+    assert _key() == _key(entities={"num_persons": 2, "user_name": "Ada"})  # order, None and status do not count
+    old_turns = tuple({"role": "user", "content": f"message {i}"} for i in range(3))
+    recent = tuple({"role": "assistant", "content": f"reply {i}"} for i in range(KEY_HISTORY_MESSAGES))
+    assert _key(history=old_turns + recent) == _key(history=recent)
+
+
+def test_key_changes_with_prompt_entities_model_and_date():
+    keys = {
+        _key(),
+        _key("Table for three, please"),
+        _key(system="You are a reservation assistant. Be brief."),
+        _key(entities={**ENTITIES, "num_persons": 3}),
+        _key(entities={**ENTITIES, "email_id": "ada@example.com"}),
+        _key(history=({"role": "assistant", "content": "Which date?"},)),
+        _key(model="mixtral"),
+        _key(today=TODAY + dt.timedelta(days=1)),
+    }
+    assert len(keys) == 8
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    monkeypatch.setattr(llm_cache, "time", Clock)
+    cache = LLMResponseCache(ttl_seconds=60)
+    cache.put("key", "reply")
+    Clock.now += 59
+    assert cache.get("key") == "reply"
+    Clock.now += 2
+    assert cache.get("key") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LLMResponseCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("1", None, "3")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (3, 1, 1, 2)
+
+
+def test_sqlite_backing_survives_a_restart(tmp_path, monkeypatch):
+    path = str(tmp_path / "llm_cache.db")
+    monkeypatch.setattr(llm_cache, "time", Clock)
+    first = LLMResponseCache(max_entries=1, ttl_seconds=60, db_path=path)
+    first.put("a", "1")
+    first.put("b", "2")  # evicts "a" from memory, not from disk
+    assert first.persistent
+    assert first.get("a") == "1"
+
+    restarted = LLMResponseCache(ttl_seconds=60, db_path=path)
+    assert (restarted.get("a"), restarted.get("b")) == ("1", "2")
+    Clock.now += 61
+    assert LLMResponseCache(ttl_seconds=60, db_path=path).get("a") is None
+
+    restarted.clear()
+    assert LLMResponseCache(ttl_seconds=600, db_path=path).get("b") is None
+
+
+def test_repeated_turns_are_answered_from_the_cache(llm, monkeypatch):
+    monkeypatch.setattr(a_extract_intent, "response_cache", LLMResponseCache())
+    llm.register("could you help me out", reply("greeting", {}, "Of course! What can I do for you?"))
+    graph = build_reservation_graph()
+
+    first = graph.invoke({"user_input": "could you help me out"})
+    requests = llm.requests
+    second = graph.invoke({"user_input": "Could you help me out?"})
+    assert llm.requests == requests
+    assert second["assistant_response"] == first["assistant_response"] == "Of course! What can I do for you?"
+
+    graph.invoke({"user_input": "could you help me out", "entities": {"user_name": "Ada"}})
+    assert llm.requests == requests + 1
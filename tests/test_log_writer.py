@@ -0,0 +1,81 @@
+# tests/test_log_writer.py
+import logging
+import threading
+import time
+
+import a_extract_intent
+import db_pool
+from log_writer import LogWriter, utc_timestamp
+
+
+def _row(marker: str, number: int) -> tuple:
+    return (f"{marker}-{number}", marker, "N/A", "", False, utc_timestamp())
+
+
+def _logged(marker: str) -> int:
+    with db_pool.connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM interaction_logs WHERE user_input = ?", (marker,)).fetchone()[0]
+
+
+def test_rows_are_batched_and_flushed():
+    writer = LogWriter(batch_size=10, flush_interval=60)
+    assert all(writer.submit(_row("batched", number)) for number in range(25))
+    assert writer.flush()
+    assert _logged("batched") == 25
+    stats = writer.stats()
+    assert (stats["submitted"], stats["written"], stats["dropped"], stats["batches"]) == (25, 25, 0, 3)
+
+    writer.close()
+    assert not writer._thread.is_alive()
+    assert not writer.submit(_row("batched", 99))
+    assert writer.stats()["dropped"] == 1
+
+
+def test_counters_add_up_under_concurrent_submits():
+    writer = LogWriter(max_queue=20, batch_size=50, flush_interval=0.01)
+
+    def submit_many(thread: int) -> None:
+        for number in range(300):
+            writer.submit(_row("concurrent", thread * 1000 + number))
+
+    threads = [threading.Thread(target=submit_many, args=(thread,)) for thread in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+
+    stats = writer.stats()
+    assert stats["submitted"] + stats["dropped"] == 8 * 300
+    assert stats["written"] == stats["submitted"] == _logged("concurrent")
+
+
+def test_close_gives_up_when_the_worker_is_stuck():
+    writer, stuck = LogWriter(max_queue=2, batch_size=1), threading.Event()
+    writer._write = lambda batch: stuck.wait(10)
+    writer.submit(_row("stuck", 0))
+    time.sleep(0.05)  # the worker takes the row and hangs writing it
+    while writer.submit(_row("stuck", 1)):
+        pass
+
+    closing = threading.Thread(target=writer.close, args=(0.1,))
+    closing.start()
+    closing.join(2)
+    hung = closing.is_alive()
+    stuck.set()
+    assert not hung
+
+
+def test_dropped_rows_are_reported_once_per_interval(monkeypatch, caplog):
+    monkeypatch.setattr(a_extract_intent.log_writer, "submit", lambda row: False)
+    monkeypatch.setattr(a_extract_intent, "_dropped_log_warned_at", float("-inf"))
+
+    with caplog.at_level(logging.WARNING, logger="intent_node"):
+        for _ in range(50):
+            a_extract_intent.log_to_db("hello")
+        assert len(caplog.records) == 1
+        assert "Log queue full" in caplog.records[0].getMessage()
+
+        monkeypatch.setattr(a_extract_intent, "DROPPED_LOG_WARNING_INTERVAL", 0)
+        a_extract_intent.log_to_db("hello")
+        assert len(caplog.records) == 2
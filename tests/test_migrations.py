@@ -0,0 +1,64 @@
+# tests/test_migrations.py
+import sqlite3
+
+from db_migrations import LATEST_VERSION, check_query_plans, current_version, migrate
+
+# The tables as the first release created them, before any migration.
+BASELINE_SCHEMA = """
+CREATE TABLE reservations (
+    reservation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    intent TEXT,
+    user_name TEXT,
+    email_id TEXT,
+    num_persons INTEGER,
+    reservation_type TEXT,
+    res_date TEXT,
+    res_time TEXT,
+    status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'confirmed', 'cancelled')),
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(res_date, res_time, reservation_id)
+);
+CREATE TABLE interaction_logs (
+    log_id TEXT PRIMARY KEY,
+    reservation_id TEXT,
+    user_input TEXT NOT NULL,
+    intent TEXT,
+    llm_response TEXT NOT NULL,
+    missing_fields TEXT,
+    fallback_triggered BOOLEAN DEFAULT FALSE,
+    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+    error TEXT,
+    FOREIGN KEY (reservation_id) REFERENCES reservations(reservation_id) ON DELETE SET NULL
+);
+CREATE TABLE evaluation_metrics (
+    eval_id TEXT PRIMARY KEY,
+    reservation_id TEXT NOT NULL,
+    extracted_fields TEXT,
+    validation_passed BOOLEAN,
+    availability_checked BOOLEAN,
+    alt_suggested BOOLEAN,
+    final_status TEXT,
+    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (reservation_id) REFERENCES reservations(reservation_id) ON DELETE CASCADE
+);
+"""
+
+
+def test_baseline_database_migrates_in_place(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "baseline.db"))
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute("""
+        INSERT INTO reservations (user_name, email_id, num_persons, reservation_type, res_date, res_time, status)
+        VALUES ('Ada', 'ada@example.com', 2, 'dinner', '2025-7-5', '19:00:00', 'confirmed')
+    """)
+    conn.commit()
+    assert current_version(conn) == 0
+
+    assert migrate(conn) == LATEST_VERSION == 4
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 4
+    check_query_plans(conn)
+    assert conn.execute("SELECT res_date, res_time FROM reservations").fetchone() == ("2025-07-05", "19:00")
+
+    assert migrate(conn) == 4  # nothing left to apply
+    conn.close()
@@ -0,0 +1,49 @@
+# tests/test_rule_extractor.py
+import datetime as dt
+
+import pytest
+
+from pydantic_schemas import ReservationState
+from rule_extractor import QUESTIONS, extract_entities, resolve_date, try_fast_path
+
+ASKED_NAME = [{"user": "I'd like a table"}, {"assistant": QUESTIONS["user_name"]}]
+
+
+def _state(text: str, intent: str = "make_reservation", chat_history=ASKED_NAME) -> ReservationState:
+    return ReservationState(user_input=text, intent=intent, chat_history=chat_history)
+
+
+def test_bare_name_after_the_name_question():
+    result = try_fast_path(_state("jane doe"))
+    assert result["entities"] == {"user_name": "Jane Doe"}
+    assert result["assistant_response"] == QUESTIONS["email_id"]
+
+
+@pytest.mark.parametrize("text", ["never mind", "forget it", "start over", "Nope"])
+def test_dismissals_are_not_names(text):
+    assert try_fast_path(_state(text)) is None
+
+
+def test_bare_name_needs_the_name_question():
+    history = [{"user": "hi"}, {"assistant": "Welcome! How can I help you today?"}]
+    assert try_fast_path(_state("jane doe", chat_history=history)) is None
+
+
+@pytest.mark.parametrize("intent", ["cancel_reservation", "modify_reservation"])
+def test_bare_name_only_while_booking(intent):
+    assert try_fast_path(_state("jane doe", intent=intent)) is None
+
+
+def test_dates_the_rules_know():
+    friday = dt.date(2030, 5, 3)
+    assert resolve_date("2030-5-4", friday) == "2030-05-04"
+    assert resolve_date("tomorrow", friday) == "2030-05-04"
+    assert resolve_date("next friday", friday) == "2030-05-10"
+    assert extract_entities("table for 2 tomorrow at 7pm", friday) == (
+        {"res_date": "2030-05-04", "num_persons": 2, "res_time": "19:00:00"}, True)
+
+
+def test_other_date_phrasings_go_to_the_llm():
+    assert resolve_date("july 5th") is None
+    found, complete = extract_entities("table for 2 on july 5th")
+    assert "res_date" not in found and not complete
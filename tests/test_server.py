@@ -0,0 +1,186 @@
+# tests/test_server.py
+import asyncio
+import json
+
+import httpx
+
+import e_server
+from conftest import reply
+from e_server import ReservationServer, new_session_id
+
+BOOKING = reply("make_reservation", {"user_name": "Ada", "num_persons": 2}, "Lovely, Ada! Which date?")
+
+
+def _serve(test, **settings):
+    """Runs test(client, server) against a fresh server, in one event loop."""
+    server = ReservationServer(**{"queue_timeout": 0.05, **settings})
+
+    async def run():
+        transport = httpx.ASGITransport(app=server)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await test(client, server)
+
+    return asyncio.run(run())
+
+
+async def _start_session(client: httpx.AsyncClient) -> str:
+    response = await client.post("/sessions")
+    assert response.status_code == 201
+    return response.json()["session_id"]
+
+
+def _events(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        name, data = block.split("\n")
+        events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_health_and_unknown_routes():
+    async def test(client, server):
+        assert (await client.get("/healthz")).json() == {"status": "ok"}
+        assert (await client.get("/readyz")).status_code == 200
+        assert "server_requests_total" in (await client.get("/metrics")).text
+        assert (await client.get("/nowhere")).status_code == 404
+        assert (await client.get("/restaurants/uptown/healthz")).status_code == 404
+
+    _serve(test)
+
+
+def test_session_round_trip(llm):
+    llm.register("I'd like a table for two", BOOKING)
+
+    async def test(client, server):
+        session_id = await _start_session(client)
+        assert (await client.get(f"/sessions/{session_id}")).status_code == 404  # nothing said yet
+
+        response = await client.post(f"/sessions/{session_id}/messages", json={"message": "I'd like a table for two"})
+        assert response.status_code == 200
+        assert response.json()["assistant_response"] == "Lovely, Ada! Which date?"
+
+        session = (await client.get(f"/sessions/{session_id}")).json()
+        assert session["entities"]["user_name"] == "Ada"
+        assert session["chat_history"][-1] == {"assistant": "Lovely, Ada! Which date?"}
+
+        assert (await client.delete(f"/sessions/{session_id}")).status_code == 204
+        assert (await client.get(f"/sessions/{session_id}")).status_code == 404
+
+    _serve(test)
+
+
+def test_messages_stream_as_server_sent_events(llm):
+    llm.register("I'd like a table for two", BOOKING)
+
+    async def test(client, server):
+        session_id = await _start_session(client)
+        response = await client.post(f"/sessions/{session_id}/messages?stream=1",
+                                     content="I'd like a table for two")
+        assert response.headers["content-type"] == "text/event-stream"
+        events = _events(response.text)
+        assert events[-1][0] == "reply"
+        assert events[-1][1]["assistant_response"] == "Lovely, Ada! Which date?"
+        tokens = "".join(data["text"] for name, data in events if name == "token")
+        assert tokens == "Lovely, Ada! Which date?"
+
+    _serve(test)
+
+
+def test_only_server_issued_session_ids_are_accepted(llm):
+    llm.register("I'd like a table for two", BOOKING)
+
+    async def test(client, server):
+        session_id = await _start_session(client)
+        await client.post(f"/sessions/{session_id}/messages", json={"message": "I'd like a table for two"})
+        token, signature = session_id.split(".")
+        forged = [
+            "my-session",
+            token,
+            f"{token}.{'A' * 22}",
+            new_session_id("uptown"),  # signed for another restaurant
+        ]
+        for session_id in forged:
+            assert (await client.get(f"/sessions/{session_id}")).status_code == 404
+            assert (await client.delete(f"/sessions/{session_id}")).status_code == 404
+            response = await client.post(f"/sessions/{session_id}/messages", json={"message": "hello"})
+            assert response.status_code == 404
+            assert response.json() == {"error": "unknown session"}
+
+    _serve(test)
+
+
+def test_bad_requests_are_refused(monkeypatch):
+    monkeypatch.setattr(e_server, "MAX_BODY_BYTES", 100)
+
+    async def test(client, server):
+        session_id = await _start_session(client)
+        messages = f"/sessions/{session_id}/messages"
+        assert (await client.post(messages, content="{not json")).status_code == 400
+        assert (await client.post(messages, json={"message": "  "})).status_code == 400
+        assert (await client.post(messages, content="x" * 101)).status_code == 413
+        assert (await client.get(messages)).status_code == 405
+        assert (await client.put(f"/sessions/{session_id}")).status_code == 405
+        assert (await client.get("/availability?persons=many")).status_code == 400
+        assert (await client.get("/availability?from=someday")).status_code == 400
+
+    _serve(test)
+
+
+def test_busy_sessions_and_servers_are_refused():
+    async def test(client, server):
+        first, second = await _start_session(client), await _start_session(client)
+        async with server.turn_slot(first):
+            # The same session is still answering; every slot in the server is taken.
+            same = await client.post(f"/sessions/{first}/messages", json={"message": "hello"})
+            other = await client.post(f"/sessions/{second}/messages", json={"message": "hello"})
+        assert same.status_code == 409
+        assert other.status_code == 503 and other.headers["retry-after"] == "1"
+        assert server.in_flight == 0
+
+        server.draining = True
+        assert (await client.post(f"/sessions/{first}/messages", json={"message": "hello"})).status_code == 503
+        assert (await client.get("/readyz")).status_code == 503
+
+    _serve(test, max_concurrent_turns=1)
+
+
+def test_restaurant_turns_are_capped():
+    async def test(client, server):
+        first, second = await _start_session(client), await _start_session(client)
+        async with server.turn_slot(first):
+            response = await client.post(f"/sessions/{second}/messages", json={"message": "hello"})
+        assert response.status_code == 503
+        assert "this restaurant" in response.json()["error"]
+
+    _serve(test, max_concurrent_turns=4, max_turns_per_restaurant=1)
+
+
+async def _websocket(server: ReservationServer, path: str, *texts: str) -> list:
+    inbox = asyncio.Queue()
+    for event in [{"type": "websocket.connect"}, *({"type": "websocket.receive", "text": text} for text in texts),
+                  {"type": "websocket.disconnect"}]:
+        inbox.put_nowait(event)
+    sent = []
+
+    async def send(event):
+        sent.append(event)
+
+    await server({"type": "websocket", "path": path}, inbox.get, send)
+    return [event if event["type"] != "websocket.send" else json.loads(event["text"]) for event in sent]
+
+
+def test_websocket_turns(llm):
+    llm.register("I'd like a table for two", BOOKING)
+
+    async def test(client, server):
+        session_id = await _start_session(client)
+        sent = await _websocket(server, f"/sessions/{session_id}/ws", '{"message": "I\'d like a table for two"}', "")
+        assert sent[0] == {"type": "websocket.accept"}
+        assert {event["type"] for event in sent[1:-2]} == {"token"}
+        assert sent[-2]["type"] == "reply" and sent[-2]["assistant_response"] == "Lovely, Ada! Which date?"
+        assert sent[-1] == {"type": "error", "status": 400, "error": "message is required"}
+
+        assert (await _websocket(server, "/sessions/my-session/ws")) == [{"type": "websocket.close", "code": 1008}]
+        assert (await _websocket(server, f"/sessions/{session_id}/chat")) == [{"type": "websocket.close", "code": 1008}]
+
+    _serve(test)
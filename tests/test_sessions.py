@@ -0,0 +1,55 @@
+# tests/test_sessions.py
+import json
+
+import pytest
+from langgraph.checkpoint.memory import InMemorySaver
+
+from checkpointing import SQLiteCheckpointSaver, thread_config
+from conftest import future_date, reply
+from d_reservation_flow import build_reservation_graph
+
+GUEST = {"user_name": "Ada", "email_id": "ada@example.com", "num_persons": 2, "reservation_type": "dinner"}
+
+
+def _turn(app, thread_id: str, text: str) -> dict:
+    return app.invoke({"user_input": text}, config=thread_config(thread_id))
+
+
+def test_second_booking_in_a_thread_creates_a_new_reservation(llm):
+    app = build_reservation_graph(checkpointer=InMemorySaver())
+    first_date, second_date = future_date(40), future_date(41)
+    llm.register("Book dinner for two", reply("make_reservation", {**GUEST, "res_date": first_date, "res_time": "19:00:00"}))
+    llm.register("And another the next day", reply("make_reservation", {**GUEST, "res_date": second_date, "res_time": "19:00:00"}))
+
+    first = _turn(app, "twice", "Book dinner for two")
+    assert first["assistant_response"].startswith("Reservation confirmed!")
+    assert first["entities"].status == "confirmed"
+
+    second = _turn(app, "twice", "And another the next day")
+    assert second["assistant_response"].startswith("Reservation confirmed!")
+    assert second["entities"].reservation_id != first["entities"].reservation_id
+    assert second_date in second["assistant_response"]
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_history_round_trips_through_the_checkpointer_as_dicts(llm, tmp_path, backend):
+    if backend == "memory":
+        saver = InMemorySaver()
+        reopen = lambda: saver  # noqa: E731
+    else:
+        path = str(tmp_path / "checkpoints.db")
+        saver = SQLiteCheckpointSaver(path)
+        reopen = lambda: SQLiteCheckpointSaver(path)  # noqa: E731
+    llm.register("Hi, a table please", reply("make_reservation", {"user_name": "Ada"}, "Hi Ada! How many guests?"))
+    llm.register("Book it", reply("make_reservation", {**GUEST, "res_date": future_date(42), "res_time": "19:00:00"}))
+
+    app = build_reservation_graph(checkpointer=saver)
+    _turn(app, "round-trip", "Hi, a table please")
+    _turn(app, "round-trip", "Book it")
+
+    history = build_reservation_graph(checkpointer=reopen()).get_state(thread_config("round-trip")).values["chat_history"]
+    assert all(isinstance(entry, dict) for entry in history)
+    assert history[:2] == [{"user": "Hi, a table please"}, {"assistant": "Hi Ada! How many guests?"}]
+    assert {"role": "user", "content": "Book it"} in history
+    assert history[-1]["role"] == "assistant" and history[-1]["content"].startswith("Reservation confirmed!")
+    json.dumps(history)
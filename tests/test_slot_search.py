@@ -0,0 +1,65 @@
+# tests/test_slot_search.py
+import datetime as dt
+
+import slot_search
+from availability_index import AvailabilityIndex
+from conftest import future_date
+from slot_search import SLOT_SEARCH_DAY_WEIGHT, OccupancyGrid
+
+TABLES = [("T1", 2), ("T2", 4)]
+
+
+def _grid(**options) -> OccupancyGrid:
+    return OccupancyGrid(AvailabilityIndex(tables=TABLES), **options)
+
+
+def _slots(ranked: list) -> list:
+    return [(day, slot) for _, day, slot in ranked]
+
+
+def test_nearest_hours_rank_first():
+    res_date = future_date(90)
+    ranked = _grid().rank(res_date, "19:00", 2, limit=4)
+    assert ranked == [(1.0, res_date, "18:00"), (1.0, res_date, "20:00"),
+                      (2.0, res_date, "17:00"), (2.0, res_date, "21:00")]
+
+
+def test_other_days_cost_the_day_weight():
+    day_before, res_date, day_after = future_date(90), future_date(91), future_date(92)
+    ranked = _grid(slots=["18:00", "19:00"]).rank(res_date, "19:00", 2, limit=4, search_days=1)
+    assert ranked == [(1.0, res_date, "18:00"),
+                      (SLOT_SEARCH_DAY_WEIGHT, day_before, "19:00"), (SLOT_SEARCH_DAY_WEIGHT, day_after, "19:00"),
+                      (SLOT_SEARCH_DAY_WEIGHT + 1, day_before, "18:00")]
+
+
+def test_full_and_poorly_fitting_slots_are_ranked_accordingly():
+    res_date = future_date(93)
+    grid = _grid()
+    assert _slots(grid.rank(res_date, "19:00", 2, limit=2)) == [(res_date, "18:00"), (res_date, "20:00")]
+
+    grid.index.record_booking("pair", res_date, "18:00", 2)  # only the 4-top is left at 18:00
+    ranked = grid.rank(res_date, "19:00", 2, limit=2)
+    assert ranked[0] == (1.0, res_date, "20:00")
+    assert ranked[1] == (1.5, res_date, "18:00")
+
+    grid.index.record_booking("four", res_date, "18:00", 4)  # 18:00 is now full
+    assert (res_date, "18:00") not in _slots(grid.rank(res_date, "19:00", 2, limit=10))
+    assert grid.rank(res_date, "19:00", 7) == []
+
+
+def test_other_services_rank_behind(monkeypatch):
+    monkeypatch.setattr(slot_search, "SERVICE_PERIODS", [(12, 15), (16, 23)])
+    res_date = future_date(94)
+    ranked = _grid(slots=["12:00", "16:00"]).rank(res_date, "14:00", 2, search_days=0)
+    assert ranked == [(2.0, res_date, "12:00"), (4.0, res_date, "16:00")]
+
+
+def test_requested_and_past_slots_are_skipped():
+    today = dt.date.today().isoformat()
+    now = dt.datetime.fromisoformat(f"{today}T18:30")
+    ranked = _grid().rank(today, "19:00", 2, limit=100, search_days=1, now=now)
+    assert (today, "19:00") not in _slots(ranked)
+    assert all(day >= today for _, day, _ in ranked)
+    assert all(slot > "18:30" for _, day, slot in ranked if day == today)
+    assert ranked[0] == (1.0, today, "20:00")
+    assert ranked == sorted(ranked)
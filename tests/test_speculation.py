@@ -0,0 +1,102 @@
+# tests/test_speculation.py
+import threading
+import time
+
+import pytest
+
+import b_check_availibility
+from b_check_availibility import _speculated_availability, speculate_availability
+from booking import reserve_slot
+from conftest import future_date
+from pydantic_schemas import Entities
+from speculation import SpeculativeResults
+
+
+@pytest.fixture
+def results():
+    speculative = SpeculativeResults(ttl=0.2, workers=1)
+    yield speculative
+    speculative.shutdown()
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, value):
+        self.calls += 1
+        return value
+
+
+def test_results_are_shared_until_they_expire(results):
+    work = Counter()
+    first = results.start("key", work, 1)
+    assert results.start("key", work, 2) is first
+    first.result()
+    assert results.take("key") == 1 and work.calls == 1
+
+    time.sleep(0.25)
+    assert results.take("key") is None
+    results.start("key", work, 3).result()
+    assert results.take("key") == 3 and work.calls == 2
+
+
+def test_take_gives_up_after_the_timeout(results):
+    release = threading.Event()
+    results.start("slow", release.wait, 5)
+    time.sleep(0.02)  # running, not queued, so it cannot be cancelled
+
+    started = time.monotonic()
+    assert results.take("slow", timeout=0.05) is None
+    assert time.monotonic() - started < 1
+    release.set()
+
+
+def test_queued_and_failed_lookups_are_done_inline(results):
+    release = threading.Event()
+    results.start("busy", release.wait, 5)
+    queued = results.start("queued", Counter(), 1)
+    assert results.take("queued") is None and queued.cancelled()
+    release.set()
+
+    assert isinstance(results.start("broken", lambda: 1 / 0).exception(), ZeroDivisionError)
+    assert results.take("broken") is None
+    assert results.take("never-started") is None
+
+
+def test_oldest_entries_are_dropped_past_the_limit():
+    results = SpeculativeResults(max_entries=2)
+    for number in range(3):
+        results.start(number, Counter(), number).result()
+    assert results.take(0) is None
+    assert (results.take(1), results.take(2)) == (1, 2)
+    results.shutdown()
+
+
+def _entities(res_date: str, res_time: str = "19:00", num_persons: int = 8) -> Entities:
+    return Entities(user_name="Ada", email_id="ada@example.com", num_persons=num_persons,
+                    res_date=res_date, res_time=res_time, reservation_type="dinner")
+
+
+def test_results_for_other_entities_are_not_used(monkeypatch, results):
+    monkeypatch.setattr(b_check_availibility, "speculative_results", results)
+    res_date = future_date(95)
+    speculate_availability(_entities(res_date))
+    time.sleep(0.05)  # finished, not queued
+
+    assert _speculated_availability(_entities(res_date, "20:00")) is None
+    assert _speculated_availability(_entities(res_date, num_persons=2)) is None
+    assert _speculated_availability(_entities(future_date(96))) is None
+    assert _speculated_availability(_entities(res_date, "19:30")) == (True, [])  # same hourly slot
+
+
+def test_results_overtaken_by_a_booking_are_dropped(monkeypatch, results):
+    monkeypatch.setattr(b_check_availibility, "speculative_results", results)
+    res_date = future_date(97)
+    speculate_availability(_entities(res_date))
+    time.sleep(0.05)  # let the lookup finish before the room fills up
+
+    while reserve_slot(_entities(res_date)) is not None:
+        pass
+    assert _speculated_availability(_entities(res_date)) is None
+    assert b_check_availibility._availability(res_date, "19:00", 8)[0] is False
@@ -0,0 +1,47 @@
+# tests/test_state.py
+import time
+
+import pytest
+
+from conftest import reply
+from d_reservation_flow import build_reservation_graph
+from pydantic_schemas import append_history, extend_history
+
+TURN = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+
+
+def _history(length: int) -> list:
+    return [{"user": f"message {i}"} if i % 2 == 0 else {"assistant": f"reply {i}"} for i in range(length)]
+
+
+def _append_seconds(reducer, length: int, writes: int = 200) -> float:
+    history = _history(length)
+    started = time.perf_counter()
+    for _ in range(writes):
+        history = reducer(history, TURN) if reducer is append_history else reducer(history, [TURN])
+    return time.perf_counter() - started
+
+
+@pytest.mark.parametrize("reducer", [append_history, extend_history])
+def test_history_writes_append_in_place(reducer):
+    history = _history(10)
+    result = reducer(history, TURN) if reducer is append_history else reducer(history, [TURN, TURN])
+    assert result is history
+    assert result[10:12] == TURN
+
+
+@pytest.mark.parametrize("reducer", [append_history, extend_history])
+def test_history_write_cost_does_not_grow_with_length(reducer):
+    short = min(_append_seconds(reducer, 100) for _ in range(3))
+    long = min(_append_seconds(reducer, 200_000) for _ in range(3))
+    # Copying 200k entries per write would make this hundreds of times slower.
+    assert long < short * 10 + 0.005
+
+
+def test_graph_leaves_the_callers_history_untouched(llm):
+    llm.register("hello there", reply("greeting", {}, "Hi! How can I help?"))
+    history = _history(4)
+    result = build_reservation_graph().invoke({"user_input": "hello there", "chat_history": history})
+    assert history == _history(4)
+    assert result["chat_history"][:4] == history
+    assert result["chat_history"][4:] == [{"user": "hello there"}, {"assistant": "Hi! How can I help?"}]
@@ -0,0 +1,76 @@
+# tests/test_table_inventory.py
+import pytest
+
+from table_inventory import DayAllocation, SlotAllocation, parse_hours, parse_layout, slot_key
+
+TABLES = [("T1", 2), ("T2", 4), ("T3", 6)]
+
+
+def test_layout_hours_and_slot_keys_parse():
+    assert parse_layout("2x2, 4x1") == [("T1", 2), ("T2", 2), ("T3", 4)]
+    assert parse_hours("12-15,18-20") == ["12:00", "13:00", "14:00", "18:00", "19:00"]
+    assert [slot_key(time) for time in ("19:00:00", "7:30", "25:00", None)] == ["19:00", "07:00", "25:00", ""]
+
+
+@pytest.mark.parametrize("persons, table", [(1, "T1"), (2, "T1"), (3, "T2"), (4, "T2"), (5, "T3"), (6, "T3")])
+def test_party_gets_the_smallest_table_that_fits(persons, table):
+    assert SlotAllocation(TABLES).allocate("r1", persons) == [table]
+
+
+def test_large_parties_join_the_largest_free_tables():
+    slot = SlotAllocation(TABLES)
+    assert slot.allocate("big", 9) == ["T3", "T2"]
+    assert slot.free_seats == 2 and slot.covers == 9
+    assert slot.allocate("too-big", 3) is None
+    assert slot.allocate("pair", 2) == ["T1"]
+    assert not slot.can_seat(1)
+
+
+def test_release_returns_tables_and_copies_are_independent():
+    slot = SlotAllocation(TABLES)
+    slot.allocate("r1", 4)
+    clone = slot.copy()
+    assert clone.release("r1") and not clone.release("r1")
+    assert clone.allocate("r2", 10) == ["T3", "T2"]
+    assert slot.assignments == {"r1": (4, [(4, "T2")])}
+    assert slot.free == [(2, "T1"), (6, "T3")]
+
+
+def test_cover_limit_caps_guests_per_slot():
+    slot = SlotAllocation(TABLES, cover_limit=6)
+    assert slot.allocate("r1", 4) == ["T2"]
+    assert not slot.can_seat(3)
+    assert slot.allocate("r2", 2) == ["T1"]
+
+
+def test_rebuild_packs_largest_parties_first():
+    bookings = [("a", "19:00", 2), ("b", "19:00:00", 3), ("c", "19:30", 7)]
+    day = DayAllocation.from_bookings("2030-01-01", bookings, tables=TABLES)
+    slot = day.slot("19:00")
+    assert {rid: tables for rid, (_, tables) in slot.assignments.items()} == \
+        {"c": [(6, "T3"), (4, "T2")], "a": [(2, "T1")], "b": []}
+    assert slot.overflow == 1 and day.occupancy() == {"19:00": 12}
+
+    rebuilt = DayAllocation.from_bookings("2030-01-01", reversed(bookings), tables=TABLES)
+    assert rebuilt.slot("19:00").assignments == slot.assignments  # whatever order they were booked in
+
+
+def test_bookings_that_no_longer_fit_are_forced():
+    day = DayAllocation.from_bookings("2030-01-01", [("a", "19:00", 6), ("b", "19:00", 6), ("c", "19:00", 4)],
+                                      tables=TABLES)
+    slot = day.slot("19:00")
+    assert slot.assignments["b"][1] == [(4, "T2"), (2, "T1")]
+    assert slot.assignments["c"] == (4, [])
+    assert (slot.overflow, slot.covers, slot.free_seats) == (1, 16, 0)
+    assert day.release("c", "19:00")
+    assert (slot.overflow, slot.covers) == (0, 12)
+
+
+def test_can_seat_ignores_the_excluded_reservation():
+    day = DayAllocation("2030-01-01", tables=[("T1", 4)])
+    day.book("r1", "19:00", 4)
+    assert not day.can_seat("19:00", 4)
+    assert day.can_seat("19:00", 4, exclude_reservation_id="r1")  # r1 moving within its own slot
+    assert not day.can_seat("19:00", 4, exclude_reservation_id="other")
+    assert not day.can_seat("19:00", 4)  # the check did not release r1
+    assert day.can_seat("20:00", 4)
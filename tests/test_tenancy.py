@@ -0,0 +1,44 @@
+# tests/test_tenancy.py
+import os
+
+import pytest
+
+import db_pool
+import tenancy
+from tenancy import UnknownRestaurantError, open_tenant, route_restaurant_id, tenant_scope
+
+
+def _shard(restaurant_id: str) -> str:
+    return os.path.join(os.path.dirname(db_pool.router.default_path), "restaurants", f"{restaurant_id}.db")
+
+
+def test_requests_cannot_pick_a_restaurant_without_an_allow_list(monkeypatch):
+    monkeypatch.setattr(tenancy, "RESTAURANT_IDS", set())
+    with pytest.raises(UnknownRestaurantError):
+        route_restaurant_id("downtown")
+
+
+def test_requests_only_reach_allow_listed_restaurants(monkeypatch):
+    monkeypatch.setattr(tenancy, "RESTAURANT_IDS", {"downtown"})
+    assert route_restaurant_id("downtown") == "downtown"
+    with pytest.raises(UnknownRestaurantError):
+        route_restaurant_id("uptown")
+
+
+def test_open_tenant_never_creates_a_shard():
+    with pytest.raises(UnknownRestaurantError):
+        open_tenant("never-provisioned")
+    assert not os.path.exists(_shard("never-provisioned"))
+
+
+def test_provisioned_shards_are_separate_databases():
+    assert tenancy.main(["provision", "harbour", "hill"]) == 0
+    assert os.path.exists(_shard("harbour")) and os.path.exists(_shard("hill"))
+    open_tenant("harbour")
+
+    with tenant_scope("harbour"), db_pool.connection() as conn:
+        conn.execute("INSERT INTO reservations (user_name, res_date, res_time, num_persons, status) "
+                     "VALUES ('Ada', '2030-01-01', '19:00', 2, 'confirmed')")
+        conn.commit()
+    with tenant_scope("hill"), db_pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM reservations").fetchone()[0] == 0
@@ -0,0 +1,35 @@
+# tracing.py
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def tracing_configured() -> bool:
+    """True when LangSmith tracing is switched on and has an API key to send runs with."""
+    flag = os.getenv("LANGSMITH_TRACING", os.getenv("LANGCHAIN_TRACING_V2", "")).strip().lower()
+    api_key = os.getenv("LANGSMITH_API_KEY") or os.getenv("LANGCHAIN_API_KEY")
+    return flag in ("1", "true", "yes") and bool(api_key)
+
+
+_langsmith_traceable = None
+if tracing_configured():
+    try:
+        from langsmith import traceable as _langsmith_traceable
+    except ImportError:  # optional: nodes run untraced without langsmith
+        _langsmith_traceable = None
+
+TRACING_ENABLED = _langsmith_traceable is not None
+
+
+def traceable(*args, **kwargs):
+    """
+    Same as langsmith.traceable when tracing is configured. Otherwise the
+    decorated function is returned unchanged, so untraced runs pay nothing.
+    """
+    if _langsmith_traceable is not None:
+        return _langsmith_traceable(*args, **kwargs)
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return args[0]
+    return lambda func: func